@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+benchmark_render.py
+
+Benchmarks reproducibles del pipeline de render con params sintéticos que
+escalan una dimensión a la vez, a partir de una figura base (A5, x, x**2, x**3):
+ - samples:   n_curve_samples (muestreo uniforme)
+ - functions: número de funciones
+ - ticks:     densidad de la rejilla (tick_step)
+ - labels:    número y longitud de las braille_labels
+ - plate:     placa A5 vs A4
+
+Por escenario y etapa se mide el tiempo de pared (mejor de --repeat), el pico de
+memoria (tracemalloc, en una pasada aparte para no falsear el tiempo) y los bytes
+de salida. Etapas:
+ - sampling:          curvas con el curve_sampling del escenario
+ - adaptive_sampling: curvas con muestreo adaptativo (curve_sampling="adaptive")
+ - markers:           posiciones de los marcadores
+ - svg, svg_stream, dxf, stl: cada backend completo
+ - frame:             marco con ejes de generarmarcos (SVG + DXF + STL) del tamaño de la placa
+
+Con --save-baseline se guarda el resultado en benchmark_baseline.json; sin él se
+compara contra ese archivo y el script termina con código 1 si alguna etapa
+empeora más allá de las tolerancias (pensado para correr antes de regenerar el libro).
+
+Uso:
+    python benchmark_render.py                      # compara contra la línea base
+    python benchmark_render.py --save-baseline      # guarda una nueva línea base
+    python benchmark_render.py --only labels --repeat 5 --json resultados.json
+"""
+
+import sys
+import io
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from pathlib import Path
+
+from generate_svg_from_params import curve_polylines, marker_positions, build_svg_from_params
+from generate_dxf_from_params import build_dxf_from_params
+from generate_stl_from_params import build_stl_from_params
+from generarmarcos import config_a5, marco_a5_con_ejes
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+
+# Tolerancias de regresión respecto a la línea base (cociente nuevo / base)
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.25
+BYTES_TOLERANCE = 1.10
+# Diferencias de tiempo menores que esta se consideran ruido de medición
+MIN_TIME_DELTA_S = 0.02
+
+A5_PLATE_MM = [173.0, 113.0]
+A4_PLATE_MM = [245.0, 160.0]
+
+FUNCTION_POOL = ["x", "x**2", "x**3", "np.sin(x)*3", "np.cos(x)*3", "np.tan(x)", "1/x", "np.exp(x/3)"]
+SHAPE_POOL = ["o", "s", "^"]
+LABEL_TEXTS = {"short": "Figura 1", "long": "la curva cubica crece mas rapido que la cuadratica"}
+
+# -----------------------
+# FIXTURES SINTÉTICOS
+# -----------------------
+
+def base_params():
+    """Figura base: igual que params.json (A5, tres funciones, una etiqueta)."""
+    return {
+        "fig_size_mm": list(A5_PLATE_MM),
+        "xlim": [-7.0, 7.0],
+        "ylim": [-7.0, 7.0],
+        "tick_step": 0.5,
+        "marker_shapes": ["o", "s", "^"],
+        "marker_sizes_mm": [3.0, 3.0, 3.5],
+        "functions": ["x", "x**2", "x**3"],
+        "curve_styles": ["solid", "dash", "dot"],
+        "curve_sampling": "adaptive",
+        "marker_xs": "auto",
+        "braille_labels": [make_label("short", 0)],
+    }
+
+def make_label(kind, i):
+    return {"text": LABEL_TEXTS[kind], "position_mm": [-80.0, 50.0 - 4.5 * (i % 22)]}
+
+def with_functions(params, n):
+    params["functions"] = [FUNCTION_POOL[i % len(FUNCTION_POOL)] for i in range(n)]
+    params["marker_shapes"] = [SHAPE_POOL[i % len(SHAPE_POOL)] for i in range(n)]
+    params["marker_sizes_mm"] = [3.0] * n
+    params["curve_styles"] = ["solid"] * n
+    return params
+
+def scenarios():
+    """Lista de (nombre, params) con una dimensión escalada por escenario."""
+    out = [("base", base_params())]
+    for n in (800, 3200, 12800):
+        p = base_params()
+        p.update(curve_sampling="uniform", n_curve_samples=n)
+        out.append((f"samples_{n}", p))
+    for n in (1, 4, 8):
+        out.append((f"functions_{n}", with_functions(base_params(), n)))
+    for step in (1.0, 0.25, 0.1):
+        p = base_params()
+        p["tick_step"] = step
+        out.append((f"ticks_{step:g}", p))
+    for n in (10, 40):
+        for kind in ("short", "long"):
+            p = base_params()
+            p["braille_labels"] = [make_label(kind, i) for i in range(n)]
+            out.append((f"labels_{n}_{kind}", p))
+    for name, size in (("a5", A5_PLATE_MM), ("a4", A4_PLATE_MM)):
+        p = base_params()
+        p["fig_size_mm"] = list(size)
+        out.append((f"plate_{name}", p))
+    return out
+
+# -----------------------
+# ETAPAS
+# -----------------------
+
+def _file_size(path):
+    return Path(path).stat().st_size
+
+def stage_sampling(params, out_dir):
+    curve_polylines(params)
+    return 0
+
+def stage_adaptive_sampling(params, out_dir):
+    curve_polylines(dict(params, curve_sampling="adaptive"))
+    return 0
+
+def stage_markers(params, out_dir):
+    marker_positions(params)
+    return 0
+
+def stage_svg(params, out_dir):
+    params = dict(params, output_svg=str(out_dir / "bench.svg"), svg_writer="svgwrite")
+    build_svg_from_params(params)
+    return _file_size(params["output_svg"])
+
+def stage_svg_stream(params, out_dir):
+    params = dict(params, output_svg=str(out_dir / "bench_stream.svg"), svg_writer="stream")
+    build_svg_from_params(params)
+    return _file_size(params["output_svg"])
+
+def stage_dxf(params, out_dir):
+    path, _ = build_dxf_from_params(params, str(out_dir / "bench.dxf"))
+    return _file_size(path)
+
+def stage_stl(params, out_dir):
+    path, _ = build_stl_from_params(params, str(out_dir / "bench.stl"))
+    return _file_size(path)
+
+def stage_frame(params, out_dir):
+    cfg = dict(config_a5, a5_size_mm=tuple(params["fig_size_mm"]), output_filename=str(out_dir / "bench_frame.svg"))
+    marco_a5_con_ejes(cfg, dxf=True, stl=True)
+    return sum(_file_size(out_dir / f"bench_frame.{ext}") for ext in ("svg", "dxf", "stl"))
+
+STAGES = [
+    ("sampling", stage_sampling),
+    ("adaptive_sampling", stage_adaptive_sampling),
+    ("markers", stage_markers),
+    ("svg", stage_svg),
+    ("svg_stream", stage_svg_stream),
+    ("dxf", stage_dxf),
+    ("stl", stage_stl),
+    ("frame", stage_frame),
+]
+
+def measure(stage, params, out_dir, repeat):
+    """(mejor tiempo en s, pico de memoria en bytes, bytes de salida) de una etapa."""
+    best = float("inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            nbytes = stage(params, out_dir)
+            best = min(best, time.perf_counter() - t0)
+        tracemalloc.start()
+        try:
+            stage(params, out_dir)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak, nbytes
+
+def run_benchmarks(only=None, repeat=3):
+    """Resultados {escenario: {etapa: {time_s, peak_bytes, output_bytes}}}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        for name, params in scenarios():
+            if only and not any(o in name for o in only):
+                continue
+            results[name] = {}
+            for stage_name, stage in STAGES:
+                t, peak, nbytes = measure(stage, params, out_dir, repeat)
+                results[name][stage_name] = {"time_s": round(t, 5), "peak_bytes": peak,
+                                             "output_bytes": nbytes}
+    return results
+
+# -----------------------
+# INFORME Y LÍNEA BASE
+# -----------------------
+
+def print_results(results):
+    print(f"{'escenario':<20} {'etapa':<17} {'tiempo':>10} {'pico mem':>12} {'salida':>12}")
+    for name, stages in results.items():
+        for stage_name, r in stages.items():
+            print(f"{name:<20} {stage_name:<17} {r['time_s'] * 1000:>8.1f}ms "
+                  f"{r['peak_bytes'] / 1024:>9.0f}KiB {r['output_bytes']:>11,d}B")
+
+def compare_to_baseline(results, baseline):
+    """Lista de textos con cada regresión encontrada (vacía si no hay)."""
+    regressions = []
+    for name, stages in results.items():
+        for stage_name, r in stages.items():
+            base = baseline.get(name, {}).get(stage_name)
+            if base is None:
+                continue
+            if (r["time_s"] > base["time_s"] * TIME_TOLERANCE
+                    and r["time_s"] - base["time_s"] > MIN_TIME_DELTA_S):
+                regressions.append(f"{name}/{stage_name}: tiempo {base['time_s']:.4f}s -> {r['time_s']:.4f}s")
+            if r["peak_bytes"] > base["peak_bytes"] * MEMORY_TOLERANCE:
+                regressions.append(f"{name}/{stage_name}: memoria {base['peak_bytes']:,d}B -> {r['peak_bytes']:,d}B")
+            if r["output_bytes"] > base["output_bytes"] * BYTES_TOLERANCE:
+                regressions.append(f"{name}/{stage_name}: salida {base['output_bytes']:,d}B -> {r['output_bytes']:,d}B")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline SVG/DXF/STL con params sintéticos")
+    parser.add_argument("--only", nargs="+", default=None,
+                        help="solo escenarios cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por etapa (se toma la mejor)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="archivo de línea base")
+    parser.add_argument("--save-baseline", action="store_true", help="guardar los resultados como línea base")
+    parser.add_argument("--json", default=None, help="guardar también los resultados en este JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, max(1, args.repeat))
+    print_results(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        # al guardar un subconjunto (--only) se conservan los demás escenarios
+        stored = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+        stored.update(results)
+        baseline_path.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Baseline saved to: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path} (use --save-baseline).")
+        return 0
+    regressions = compare_to_baseline(results, json.loads(baseline_path.read_text(encoding="utf-8")))
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regression(s) against {baseline_path.name}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+book_build.py
+
+Construye todas las figuras de un capítulo o libro descrito en un manifiesto JSON:
+valores comunes en "defaults" y, por figura, solo lo que cambia.
+
+    {
+      "name": "Cálculo I - capítulo 3",
+      "out_dir": "salida/cap3",
+      "outputs": ["svg", "dxf", "stl"],
+      "defaults": {"fig_size_mm": [173, 113], "xlim": [-3, 3], "ylim": [-2, 2], "tick_step": 1},
+      "figures": [
+        {"name": "fig3_1", "params": {"functions": ["x**2"]}},
+        {"name": "fig3_2", "params_file": "fig3_2.json", "params": {"ylim": [-8, 8]}}
+      ]
+    }
+
+Params efectivos de cada figura: defaults, luego params_file (relativo al manifiesto)
+y luego params, mezclados por clave de primer nivel. Las salidas van a
+out_dir/<name>.svg|.dxf|.stl (el output_* de los params se ignora).
+
+- Lo que comparten las figuras se calcula una vez para todo el libro: las capas SVG
+  de fondo (Plate, Grid, Axes, Ticks) salen de una MemoryLayerCache común, respaldada
+  por out_dir/.book_cache entre ejecuciones, y la geometría de rejilla, ejes y marcas
+  que usan el DXF y el STL sale de una FrameGeometry por marco distinto.
+- Build incremental: out_dir/.book_state.json guarda por figura un hash de sus params
+  efectivos y de las salidas pedidas; si no cambió y las salidas existen, la figura
+  se salta. Una figura que falla no se registra y se reintenta en la próxima ejecución.
+
+Uso:
+    python book_build.py libro.json
+    python book_build.py libro.json --outputs svg dxf     # solo estas salidas
+    python book_build.py libro.json --force               # reconstruir todo
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+import tempfile
+from pathlib import Path
+
+from render_cache import LayerCache, MemoryLayerCache, content_key
+from generate_svg_from_params import (
+    LAYER_RENDER_VERSION, FRAME_GEOMETRY_KEYS, FrameGeometry, ParamsError, load_params,
+    validate_params, build_svg_from_params,
+)
+from generate_dxf_from_params import build_dxf_from_params
+from generate_stl_from_params import build_stl_from_params
+
+# Cambiar al modificar cómo se construye una figura (invalida el estado guardado)
+BOOK_BUILD_VERSION = 1
+
+OUTPUT_FORMATS = ("svg", "dxf", "stl")
+BOOK_STATE_FILE = ".book_state.json"
+BOOK_CACHE_DIR = ".book_cache"
+
+# -----------------------
+# MANIFIESTO
+# -----------------------
+
+def load_manifest(path):
+    """Lee y valida el manifiesto; lanza ParamsError con el primer problema encontrado."""
+    manifest = load_params(path)
+    if not isinstance(manifest, dict):
+        raise ParamsError(f"{path}: el manifiesto debe ser un objeto JSON")
+    if not isinstance(manifest.get("defaults", {}), dict):
+        raise ParamsError("defaults debe ser un objeto")
+    outputs = manifest.get("outputs", ["svg"])
+    if not isinstance(outputs, list) or not outputs or any(o not in OUTPUT_FORMATS for o in outputs):
+        raise ParamsError(f"outputs debe ser una lista con valores de {', '.join(OUTPUT_FORMATS)}, no {outputs!r}")
+    figures = manifest.get("figures")
+    if not isinstance(figures, list) or not figures:
+        raise ParamsError("figures debe ser una lista no vacía")
+    names = set()
+    for fig in figures:
+        name = fig.get("name") if isinstance(fig, dict) else None
+        if not isinstance(name, str) or not name:
+            raise ParamsError(f"figures: figura sin name {fig!r}")
+        if name in names:
+            raise ParamsError(f"figures: name repetido {name!r}")
+        names.add(name)
+        if not isinstance(fig.get("params", {}), dict):
+            raise ParamsError(f"figures: params de {name!r} debe ser un objeto")
+    return manifest
+
+def figure_params(manifest, figure, base_dir="."):
+    """Params efectivos de una figura: defaults < params_file < params."""
+    params = dict(manifest.get("defaults", {}))
+    if "params_file" in figure:
+        params.update(load_params(Path(base_dir) / figure["params_file"]))
+    params.update(figure.get("params", {}))
+    return params
+
+def figure_key(params, outputs):
+    """Hash de todo lo que determina las salidas de una figura."""
+    return content_key({"params": params, "outputs": sorted(outputs),
+                        "layers": LAYER_RENDER_VERSION, "book": BOOK_BUILD_VERSION})
+
+def load_state(path):
+    """Estado del último build ({name: {"key": ...}}); vacío si no existe o está corrupto."""
+    try:
+        with open(path, "r", encoding="utf8") as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return state.get("figures", {}) if isinstance(state, dict) else {}
+
+def save_state(path, figures):
+    """Escritura atómica del estado (un build interrumpido no lo deja a medias)."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as fh:
+            json.dump({"version": BOOK_BUILD_VERSION, "figures": figures}, fh, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# -----------------------
+# BUILD
+# -----------------------
+
+class BookBuilder:
+    """
+    Construye las figuras de un manifiesto compartiendo caché de capas y geometría
+    de marco entre todas ellas. outputs y out_dir, si se dan, reemplazan a los del
+    manifiesto; force=True ignora el estado guardado.
+    """
+
+    def __init__(self, manifest_path, out_dir=None, outputs=None, force=False, log=print):
+        self.manifest_path = Path(manifest_path)
+        self.manifest = load_manifest(manifest_path)
+        base_dir = self.manifest_path.parent
+        self.base_dir = base_dir
+        self.out_dir = Path(out_dir or base_dir / self.manifest.get("out_dir", "."))
+        self.outputs = list(outputs or self.manifest.get("outputs", ["svg"]))
+        self.force = force
+        self.log = log
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path = self.out_dir / BOOK_STATE_FILE
+        self.cache = MemoryLayerCache(backing=LayerCache(self.out_dir / BOOK_CACHE_DIR))
+        self.frames = {}
+
+    def output_paths(self, name):
+        return {fmt: self.out_dir / f"{name}.{fmt}" for fmt in self.outputs}
+
+    def frame(self, params):
+        """FrameGeometry compartida por todas las figuras con el mismo marco."""
+        key = content_key({k: params.get(k) for k in FRAME_GEOMETRY_KEYS})
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = self.frames[key] = FrameGeometry(params)
+        return frame
+
+    def build_figure(self, params, paths):
+        """Escribe las salidas pedidas de una figura (sin los prints de cada backend)."""
+        for path in paths.values():
+            path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if "svg" in paths:
+                build_svg_from_params(dict(params, output_svg=str(paths["svg"])), cache=self.cache)
+            if "dxf" in paths:
+                build_dxf_from_params(params, str(paths["dxf"]), frame=self.frame(params))
+            if "stl" in paths:
+                build_stl_from_params(params, str(paths["stl"]), frame=self.frame(params))
+
+    def run(self):
+        """Construye el libro; retorna lista de (name, status, error) con status built|skipped|failed."""
+        previous = load_state(self.state_path)
+        state = {}
+        results = []
+        for figure in self.manifest["figures"]:
+            name = figure["name"]
+            paths = self.output_paths(name)
+            try:
+                params = figure_params(self.manifest, figure, self.base_dir)
+                validate_params(params)
+                key = figure_key(params, self.outputs)
+            except (OSError, ValueError) as exc:  # params_file ausente, JSON inválido o ParamsError
+                results.append((name, "failed", f"{type(exc).__name__}: {exc}"))
+                self.log(f"[FAIL]  {name}: {type(exc).__name__}: {exc}")
+                continue
+            up_to_date = previous.get(name, {}).get("key") == key and all(p.exists() for p in paths.values())
+            if up_to_date and not self.force:
+                state[name] = previous[name]
+                results.append((name, "skipped", None))
+                self.log(f"[SKIP]  {name}")
+                continue
+            t0 = time.perf_counter()
+            try:
+                self.build_figure(params, paths)
+            except Exception as exc:  # una figura que falla no detiene el libro
+                results.append((name, "failed", f"{type(exc).__name__}: {exc}"))
+                self.log(f"[FAIL]  {name}: {type(exc).__name__}: {exc}")
+                continue
+            state[name] = {"key": key, "outputs": sorted(str(p) for p in paths.values())}
+            save_state(self.state_path, dict(previous, **state))
+            results.append((name, "built", None))
+            self.log(f"[BUILD] {name} -> {', '.join(p.name for p in paths.values())} "
+                     f"({time.perf_counter() - t0:.2f}s)")
+        # figuras quitadas del manifiesto salen del estado
+        save_state(self.state_path, state)
+        return results
+
+def print_book_summary(builder, results):
+    """Imprime totales del build y el reuso de la base compartida; retorna número de fallos."""
+    counts = {"built": 0, "skipped": 0, "failed": 0}
+    for _, status, _ in results:
+        counts[status] += 1
+    print(f"{counts['built']} built, {counts['skipped']} up to date, {counts['failed']} failed, "
+          f"{len(results)} total")
+    print(f"Shared base: {len(builder.frames)} frame(s), layer cache "
+          f"{builder.cache.hits} hits / {builder.cache.misses} misses")
+    return counts["failed"]
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Construye las figuras de un libro descrito en un manifiesto JSON")
+    parser.add_argument("manifest", help="manifiesto JSON del capítulo o libro")
+    parser.add_argument("--out-dir", default=None, help="directorio de salida (por defecto out_dir del manifiesto)")
+    parser.add_argument("--outputs", nargs="+", choices=OUTPUT_FORMATS, default=None,
+                        help="salidas a generar (por defecto outputs del manifiesto)")
+    parser.add_argument("--force", action="store_true", help="reconstruir todas las figuras")
+    args = parser.parse_args(argv)
+
+    try:
+        builder = BookBuilder(args.manifest, out_dir=args.out_dir, outputs=args.outputs, force=args.force)
+    except (OSError, ValueError) as exc:
+        print(f"{args.manifest}: {type(exc).__name__}: {exc}")
+        return 1
+    results = builder.run()
+    return 1 if print_book_summary(builder, results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
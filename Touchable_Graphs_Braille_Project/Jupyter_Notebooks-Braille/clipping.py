@@ -0,0 +1,92 @@
+"""
+clipping.py
+
+Recorte vectorizado de geometría al rectángulo de la placa (en mm), antes de
+serializar a SVG / DXF / STL.
+
+- clip_segments: Liang–Barsky sobre arrays de segmentos (todos a la vez).
+- clip_polyline: recorta una polilínea y la parte en tramos visibles,
+  insertando las intersecciones exactas con el borde.
+- points_inside: máscara de puntos (p. ej. centros de marcadores) dentro del
+  rectángulo, con margen opcional.
+"""
+
+import numpy as np
+
+def clip_segments(x1, y1, x2, y2, rect):
+    """
+    Liang–Barsky vectorizado. rect = (xmin, ymin, xmax, ymax).
+    Retorna (keep, cx1, cy1, cx2, cy2, t0, t1): máscara de segmentos que tocan el
+    rectángulo, extremos recortados y parámetros de entrada/salida en [0, 1].
+    """
+    x1, y1, x2, y2 = (np.asarray(a, dtype=float) for a in (x1, y1, x2, y2))
+    xmin, ymin, xmax, ymax = rect
+    dx = x2 - x1
+    dy = y2 - y1
+    # cuatro bordes: p * t <= q
+    p = np.stack([-dx, dx, -dy, dy])
+    q = np.stack([x1 - xmin, xmax - x1, y1 - ymin, ymax - y1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = q / p
+    parallel = p == 0
+    entering = p < 0
+    leaving = p > 0
+    # paralelo y fuera de algún borde -> descartado
+    outside_parallel = np.any(parallel & (q < 0), axis=0)
+
+    t0 = np.max(np.where(entering, r, 0.0), axis=0)
+    t1 = np.min(np.where(leaving, r, 1.0), axis=0)
+    keep = ~outside_parallel & (t0 <= t1) & np.isfinite(x1) & np.isfinite(y1) & np.isfinite(x2) & np.isfinite(y2)
+
+    cx1 = x1 + t0 * dx
+    cy1 = y1 + t0 * dy
+    cx2 = x1 + t1 * dx
+    cy2 = y1 + t1 * dy
+    return keep, cx1, cy1, cx2, cy2, t0, t1
+
+def clip_polyline(sx, sy, rect):
+    """
+    Recorta la polilínea (sx, sy) al rectángulo y la divide donde sale de él.
+    Retorna lista de tramos (sx, sy) con al menos 2 puntos.
+    """
+    sx = np.asarray(sx, dtype=float)
+    sy = np.asarray(sy, dtype=float)
+    if sx.size < 2:
+        return []
+    keep, ax, ay, bx, by, t0, t1 = clip_segments(sx[:-1], sy[:-1], sx[1:], sy[1:], rect)
+    if not keep.any():
+        return []
+    # un tramo nuevo empieza si el segmento entra desde fuera o el anterior salió / fue descartado
+    prev_keep = np.concatenate([[False], keep[:-1]])
+    prev_exit = np.concatenate([[True], t1[:-1] < 1.0])
+    starts = keep & (~prev_keep | prev_exit | (t0 > 0.0))
+
+    idx = np.flatnonzero(keep)
+    new_piece = starts[idx]
+    # cada segmento aporta su extremo final; el inicial solo si abre tramo
+    px = np.column_stack((ax[idx], bx[idx])).ravel()
+    py = np.column_stack((ay[idx], by[idx])).ravel()
+    take = np.column_stack((new_piece, np.ones_like(new_piece))).ravel()
+    px, py = px[take], py[take]
+    # posiciones (en la salida) donde empieza cada tramo
+    out_starts = np.flatnonzero(np.column_stack((new_piece, np.zeros_like(new_piece))).ravel()[take])
+    bounds = list(out_starts) + [len(px)]
+    pieces = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if b - a >= 2:
+            pieces.append((px[a:b], py[a:b]))
+    return pieces
+
+def clip_segment_arrays(x1, y1, x2, y2, rect):
+    """Recorta segmentos sueltos (rejilla, marcas, ejes); descarta los que quedan fuera."""
+    keep, cx1, cy1, cx2, cy2, _, _ = clip_segments(x1, y1, x2, y2, rect)
+    return cx1[keep], cy1[keep], cx2[keep], cy2[keep]
+
+def points_inside(sx, sy, rect, margin_mm=0.0):
+    """Máscara de puntos dentro de rect reducido en margin_mm por cada lado."""
+    xmin, ymin, xmax, ymax = rect
+    sx = np.asarray(sx, dtype=float)
+    sy = np.asarray(sy, dtype=float)
+    return ((sx >= xmin + margin_mm) & (sx <= xmax - margin_mm)
+            & (sy >= ymin + margin_mm) & (sy <= ymax - margin_mm))
@@ -0,0 +1,112 @@
+"""
+curve_sampling.py
+
+Muestreo de curvas en mm de placa.
+
+adaptive_curve_pieces() sustituye al np.linspace fijo de n_curve_samples:
+ - parte de una malla uniforme gruesa y subdivide (por lotes vectorizados)
+   solo los intervalos cuyo error de cuerda en mm supera la tolerancia;
+ - ignora los tramos que caen fuera de la placa (no se imprimen);
+ - corta la polilínea en valores no finitos (log, sqrt fuera de dominio) y en
+   saltos/polos (1/x, tan) detectados como intervalos que, a máxima
+   profundidad, siguen teniendo una cuerda más larga que jump_mm.
+
+Una recta queda con los puntos de la malla inicial; las zonas de mucha
+curvatura reciben puntos hasta cumplir tolerance_mm.
+"""
+
+import numpy as np
+
+ADAPTIVE_INITIAL_SAMPLES = 65
+ADAPTIVE_TOLERANCE_MM = 0.02
+ADAPTIVE_MAX_DEPTH = 14
+ADAPTIVE_MAX_POINTS = 20000
+# Cuerda mínima (a profundidad máxima) para considerar un salto/polo
+ADAPTIVE_JUMP_MM = 1.0
+
+def _to_mm(f, xs, to_svg):
+    ys = np.broadcast_to(f(xs), np.shape(xs))
+    return to_svg(xs, ys)
+
+def _overlaps_plate(xs, ys, width_mm, height_mm, margin_mm):
+    """Intervalos cuya caja envolvente (de los puntos dados) toca la placa."""
+    with np.errstate(invalid="ignore"):
+        x_lo, x_hi = np.fmin.reduce(xs), np.fmax.reduce(xs)
+        y_lo, y_hi = np.fmin.reduce(ys), np.fmax.reduce(ys)
+        return ((x_hi >= -margin_mm) & (x_lo <= width_mm + margin_mm)
+                & (y_hi >= -margin_mm) & (y_lo <= height_mm + margin_mm))
+
+def split_at_breaks(sx, sy, breaks=None):
+    """
+    Divide la polilínea (sx, sy) en tramos continuos: elimina puntos no finitos y
+    corta después de cada índice i con breaks[i] True (intervalo i..i+1 roto).
+    Retorna lista de (sx, sy) con al menos 2 puntos.
+    """
+    sx = np.asarray(sx, dtype=float)
+    sy = np.asarray(sy, dtype=float)
+    finite = np.isfinite(sx) & np.isfinite(sy)
+    cut = ~(finite[:-1] & finite[1:])
+    if breaks is not None:
+        cut |= breaks
+    # etiqueta de tramo: aumenta en cada intervalo cortado
+    piece_id = np.concatenate([[0], np.cumsum(cut)])
+    pieces = []
+    for pid in np.unique(piece_id[finite]):
+        idx = np.flatnonzero((piece_id == pid) & finite)
+        if idx.size >= 2:
+            pieces.append((sx[idx], sy[idx]))
+    return pieces
+
+def adaptive_curve_pieces(f, xlim, to_svg, width_mm, height_mm,
+                          tolerance_mm=ADAPTIVE_TOLERANCE_MM,
+                          initial_samples=ADAPTIVE_INITIAL_SAMPLES,
+                          max_depth=ADAPTIVE_MAX_DEPTH,
+                          max_points=ADAPTIVE_MAX_POINTS,
+                          jump_mm=ADAPTIVE_JUMP_MM):
+    """
+    Muestrea f en xlim refinando donde el error de cuerda (mm de placa) supera
+    tolerance_mm. to_svg(xs, ys) -> (sx, sy) mapea datos a mm.
+    Retorna lista de tramos (sx, sy), ya cortados en polos y valores no finitos.
+    """
+    xs = np.linspace(xlim[0], xlim[1], initial_samples)
+    sx, sy = _to_mm(f, xs, to_svg)
+    margin = max(tolerance_mm, jump_mm)
+    jumps = None
+
+    for depth in range(max_depth + 1):
+        xm = 0.5 * (xs[:-1] + xs[1:])
+        mx, my = _to_mm(f, xm, to_svg)
+        finite0 = np.isfinite(sx[:-1]) & np.isfinite(sy[:-1])
+        finite1 = np.isfinite(sx[1:]) & np.isfinite(sy[1:])
+        finitem = np.isfinite(mx) & np.isfinite(my)
+
+        # error de cuerda: distancia del punto medio real al punto medio de la cuerda
+        with np.errstate(invalid="ignore", over="ignore"):
+            err = np.hypot(mx - 0.5 * (sx[:-1] + sx[1:]), my - 0.5 * (sy[:-1] + sy[1:]))
+            chord = np.hypot(sx[1:] - sx[:-1], sy[1:] - sy[:-1])
+        # un polo puede unir +inf y -inf "por encima" y "por debajo": se usa la caja del intervalo
+        visible = _overlaps_plate([sx[:-1], sx[1:], mx], [sy[:-1], sy[1:], my], width_mm, height_mm, margin)
+        all_finite = finite0 & finite1 & finitem
+        # refinar: error grande en zona visible, o borde de dominio (finito/no finito)
+        refine = (all_finite & visible & (err > tolerance_mm)) | ((finite0 | finite1 | finitem) & ~all_finite)
+
+        if depth == max_depth:
+            # lo que sigue pidiendo refinamiento a máxima profundidad con cuerda larga es un salto/polo
+            jumps = refine & all_finite & (chord > jump_mm)
+            break
+        if not refine.any() or len(xs) + refine.sum() > max_points:
+            break
+
+        # insertar los puntos medios de los intervalos marcados (xs sigue ordenado)
+        pos = np.flatnonzero(refine) + 1
+        xs = np.insert(xs, pos, xm[refine])
+        sx = np.insert(sx, pos, mx[refine])
+        sy = np.insert(sy, pos, my[refine])
+
+    return split_at_breaks(sx, sy, jumps)
+
+def uniform_curve_pieces(f, xlim, to_svg, n_samples):
+    """Muestreo uniforme clásico (n_samples puntos), cortado en valores no finitos."""
+    xs = np.linspace(xlim[0], xlim[1], n_samples)
+    sx, sy = _to_mm(f, xs, to_svg)
+    return split_at_breaks(sx, sy)
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+dxf_check.py
+
+Lectura en streaming de DXF y conciliación contra params.json: comprueba si un
+DXF (los de Inkscape-Braille/DXF, retocados a mano, o los de
+generate_dxf_from_params.py) sigue correspondiendo a la figura que describe params.
+
+- Lectura en una pasada por pares código/valor, sin cargar el archivo ni crear un
+  objeto por entidad: LINE, CIRCLE, LWPOLYLINE y SPLINE se acumulan por capa en
+  arrays NumPy (polilíneas y splines en formato CSR: vértices + inicios).
+- Formas cerradas, sea cual sea la capa (Inkscape lo deja todo en Layer_1):
+  CIRCLE, cadenas de SPLINE que se cierran (Inkscape parte cada círculo en 8) y
+  LWPOLYLINE cerrados de 3 o 4 vértices distintos (Inkscape repite los vértices).
+- Conciliación: los marcadores y los puntos Braille de params (llevados a
+  coordenadas DXF, y hacia arriba) se emparejan con las formas de su tipo y
+  tamaño; se ajusta escala y desplazamiento por eje con las parejas y se informa
+  de marcadores que faltan, etiquetas Braille que faltan o se movieron y deriva
+  de escala (p. ej. los 90/96 ppp de versiones viejas de Inkscape).
+
+Uso:
+    python dxf_check.py dibujo.dxf                          # inventario por capa
+    python dxf_check.py dibujo.dxf --params params.json      # conciliación, código 1 si no cuadra
+    python dxf_check.py --batch libro/ [--json informe.json] # cada params con su .dxf (el de --batch --dxf)
+    python dxf_check.py --batch libro/ --out-dir salida      # idem si se generó con --out-dir
+"""
+
+import sys
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+from generate_svg_from_params import (
+    load_params, plot_frame, marker_positions, braille_label_specs, batch_jobs, ParamsError,
+)
+
+# -----------------------
+# PARÁMETROS POR DEFECTO
+# -----------------------
+
+# Radio de búsqueda al emparejar (mm, tras la alineación inicial con la placa)
+SEARCH_MM = 2.0
+# Desplazamiento residual a partir del cual un marcador o etiqueta se considera movido
+MOVE_TOL_MM = 0.3
+# Rondas del ajuste de escala (cada una descarta las parejas que se alejan)
+FIT_ROUNDS = 3
+# Deriva de escala admitida (fracción) y desplazamiento global admitido (mm)
+SCALE_TOL = 0.002
+OFFSET_TOL_MM = 0.5
+# Tolerancia de tamaño al comparar formas: máx(absoluta, relativa)
+SIZE_TOL_MM = 0.3
+SIZE_TOL_REL = 0.15
+# Coordenadas iguales (vértices repetidos, cadenas de splines)
+SAME_POINT_MM = 1e-3
+
+# Tipos de forma cerrada y forma de marcador que les corresponde
+CIRCLE, TRIANGLE, QUAD = range(3)
+SHAPE_NAMES = ("circle", "triangle", "quad")
+MARKER_SHAPE_KIND = {"o": CIRCLE, "^": TRIANGLE, "s": QUAD}
+
+# -----------------------
+# LECTURA EN STREAMING
+# -----------------------
+
+class DxfLayer:
+    """Entidades de una capa, acumuladas en listas y congeladas en arrays con freeze()."""
+
+    def __init__(self):
+        self.lines = []              # (x1, y1, x2, y2)
+        self.circles = []            # (cx, cy, r)
+        self.poly_xy = []            # vértices de todas las LWPOLYLINE
+        self.poly_start = [0]
+        self.poly_closed = []
+        self.spline_xy = []          # puntos de control de todas las SPLINE
+        self.spline_start = [0]
+        self.other = 0
+
+    def freeze(self):
+        self.lines = np.array(self.lines, dtype=float).reshape(-1, 4)
+        self.circles = np.array(self.circles, dtype=float).reshape(-1, 3)
+        self.poly_xy = np.array(self.poly_xy, dtype=float).reshape(-1, 2)
+        self.poly_start = np.array(self.poly_start, dtype=np.int64)
+        self.poly_closed = np.array(self.poly_closed, dtype=bool)
+        self.spline_xy = np.array(self.spline_xy, dtype=float).reshape(-1, 2)
+        self.spline_start = np.array(self.spline_start, dtype=np.int64)
+        return self
+
+    def polylines(self):
+        """(vértices (k, 2), cerrada) de cada LWPOLYLINE."""
+        for i, closed in enumerate(self.poly_closed):
+            yield self.poly_xy[self.poly_start[i]:self.poly_start[i + 1]], bool(closed)
+
+    def splines(self):
+        """Puntos de control (k, 2) de cada SPLINE, en orden de archivo."""
+        for i in range(len(self.spline_start) - 1):
+            yield self.spline_xy[self.spline_start[i]:self.spline_start[i + 1]]
+
+    def counts(self):
+        return {"LINE": len(self.lines), "CIRCLE": len(self.circles),
+                "LWPOLYLINE": len(self.poly_closed), "SPLINE": len(self.spline_start) - 1,
+                "other": self.other}
+
+class DxfEntities:
+    """Resultado de read_dxf: capas por nombre (en orden de aparición) y $INSUNITS."""
+
+    def __init__(self, path, layers, units):
+        self.path = str(path)
+        self.layers = layers
+        self.units = units
+
+def _pairs(fh):
+    """(código, valor) de un DXF de texto, línea a línea."""
+    for code in fh:
+        value = next(fh, "")
+        yield int(code), value.strip()
+
+def read_dxf(path):
+    """Lee las entidades de un DXF en una sola pasada; retorna DxfEntities."""
+    layers = {}
+    units = None
+    section = None
+    kind, layer, xs, ys, x2, y2, radius, flags = None, "0", [], [], [], [], 0.0, 0
+    var = None
+
+    def flush():
+        if kind is None or section != "ENTITIES":
+            return
+        target = layers.get(layer)
+        if target is None:
+            target = layers[layer] = DxfLayer()
+        if kind == "LINE" and xs and x2:
+            target.lines.append((xs[0], ys[0], x2[0], y2[0]))
+        elif kind == "CIRCLE" and xs:
+            target.circles.append((xs[0], ys[0], radius))
+        elif kind == "LWPOLYLINE":
+            target.poly_xy.extend(zip(xs, ys))
+            target.poly_start.append(len(target.poly_xy))
+            target.poly_closed.append(bool(flags & 1))
+        elif kind == "SPLINE":
+            target.spline_xy.extend(zip(xs, ys))
+            target.spline_start.append(len(target.spline_xy))
+        else:
+            target.other += 1
+
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        pairs = _pairs(fh)
+        for code, value in pairs:
+            if code == 0:
+                flush()
+                kind = None
+                if value == "SECTION":
+                    _, section = next(pairs)
+                elif value == "ENDSEC":
+                    section = None
+                elif value == "EOF":
+                    break
+                elif section == "ENTITIES":
+                    kind, layer, xs, ys, x2, y2, radius, flags = value, "0", [], [], [], [], 0.0, 0
+            elif section == "HEADER":
+                if code == 9:
+                    var = value
+                elif var == "$INSUNITS" and code == 70:
+                    units = int(value)
+            elif kind is None:
+                continue
+            elif code == 8:
+                layer = value
+            elif code == 10:
+                xs.append(float(value))
+            elif code == 20:
+                ys.append(float(value))
+            elif code == 11:
+                x2.append(float(value))
+            elif code == 21:
+                y2.append(float(value))
+            elif code == 40 and kind == "CIRCLE":
+                radius = float(value)
+            elif code == 70:
+                flags = int(value)
+        flush()
+    return DxfEntities(path, {name: target.freeze() for name, target in layers.items()}, units)
+
+# -----------------------
+# FORMAS CERRADAS
+# -----------------------
+
+def _distinct_vertices(xy):
+    """Vértices sin repetidos (Inkscape duplica el contorno de las formas con relleno)."""
+    keys = np.round(xy / SAME_POINT_MM).astype(np.int64)
+    _, first = np.unique(keys, axis=0, return_index=True)
+    return xy[np.sort(first)]
+
+def _spline_loops(layer):
+    """Cadenas de SPLINE consecutivas que se cierran: puntos inicial/final de cada tramo."""
+    chain = []
+    for ctrl in layer.splines():
+        if len(ctrl) < 2:
+            continue
+        if chain and np.hypot(*(ctrl[0] - chain[-1][1])) > SAME_POINT_MM:
+            chain = []
+        chain.append((ctrl[0], ctrl[-1]))
+        if len(chain) > 2 and np.hypot(*(chain[0][0] - ctrl[-1])) <= SAME_POINT_MM:
+            yield np.array([start for start, _ in chain])
+            chain = []
+
+def closed_shapes(entities):
+    """
+    Formas cerradas de todas las capas: dict de arrays kind, cx, cy, size y w, h
+    (size = diámetro del círculo o lado medio del polígono; w, h = caja).
+    """
+    rows = []
+    for layer in entities.layers.values():
+        for cx, cy, r in layer.circles:
+            rows.append((CIRCLE, cx, cy, 2 * r, 2 * r, 2 * r))
+        for points in _spline_loops(layer):
+            center = points.mean(axis=0)
+            dist = np.hypot(*(points - center).T)
+            if dist.mean() > 0 and dist.std() <= 0.05 * dist.mean():
+                rows.append((CIRCLE, center[0], center[1], 2 * dist.mean(), 2 * dist.mean(), 2 * dist.mean()))
+        for xy, closed in layer.polylines():
+            if not closed:
+                continue
+            xy = _distinct_vertices(xy)
+            if len(xy) not in (3, 4):
+                continue
+            sides = np.hypot(*(np.roll(xy, -1, axis=0) - xy).T)
+            w, h = np.ptp(xy, axis=0)
+            center = xy.mean(axis=0)
+            rows.append((TRIANGLE if len(xy) == 3 else QUAD, center[0], center[1], sides.mean(), w, h))
+    table = np.array(rows, dtype=float).reshape(-1, 6)
+    return {"kind": table[:, 0].astype(int), "cx": table[:, 1], "cy": table[:, 2],
+            "size": table[:, 3], "w": table[:, 4], "h": table[:, 5]}
+
+# -----------------------
+# CONCILIACIÓN
+# -----------------------
+
+def expected_features(params):
+    """
+    Marcadores y puntos Braille de params en coordenadas DXF (mm, y hacia arriba):
+    dict de arrays kind, cx, cy, size, label (-1 en marcadores) y la lista de textos.
+    """
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    kind, cx, cy, size, label = [], [], [], [], []
+    for sx, sy, shape, size_mm in marker_positions(params):
+        n = len(sx)
+        kind.append(np.full(n, MARKER_SHAPE_KIND.get(shape, CIRCLE)))
+        cx.append(np.asarray(sx, dtype=float))
+        cy.append(fig_h_mm - np.asarray(sy, dtype=float))
+        size.append(np.full(n, float(size_mm)))
+        label.append(np.full(n, -1))
+    texts = []
+    for i, spec in enumerate(braille_label_specs(params)):
+        n = len(spec["cx"])
+        kind.append(np.full(n, CIRCLE))
+        cx.append(np.asarray(spec["cx"], dtype=float))
+        cy.append(fig_h_mm - np.asarray(spec["cy"], dtype=float))
+        size.append(np.full(n, spec["dot_diameter_mm"]))
+        label.append(np.full(n, i))
+        texts.append(spec["text"])
+
+    def cat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+    return {"kind": cat(kind, int), "cx": cat(cx, float), "cy": cat(cy, float),
+            "size": cat(size, float), "label": cat(label, int)}, texts
+
+def plate_alignment(shapes, fig_w_mm, fig_h_mm):
+    """
+    Alineación inicial (sx, tx, sy, ty) desde el mayor cuadrilátero cerrado (el
+    contorno de la placa); identidad si no lo hay o no se parece a la placa.
+    Retorna (alineación, índice de la forma usada o None).
+    """
+    quads = np.flatnonzero(shapes["kind"] == QUAD)
+    if len(quads):
+        i = quads[np.argmax(shapes["w"][quads] * shapes["h"][quads])]
+        sx, sy = shapes["w"][i] / fig_w_mm, shapes["h"][i] / fig_h_mm
+        if 0.5 < sx < 2.0 and 0.5 < sy < 2.0:
+            return (float(sx), float(shapes["cx"][i] - sx * fig_w_mm / 2.0),
+                    float(sy), float(shapes["cy"][i] - sy * fig_h_mm / 2.0)), int(i)
+    return (1.0, 0.0, 1.0, 0.0), None
+
+def neighbour_pairs(ax, ay, bx, by, cell):
+    """
+    Pares (i, j) de puntos a y b en celdas vecinas de una rejilla de lado cell
+    (superconjunto de los pares a distancia <= cell), con searchsorted sobre las
+    claves de celda ordenadas de b: sin matriz de distancias completa.
+    """
+    aix, aiy = np.floor(ax / cell).astype(np.int64), np.floor(ay / cell).astype(np.int64)
+    bix, biy = np.floor(bx / cell).astype(np.int64), np.floor(by / cell).astype(np.int64)
+    x0 = min(aix.min(), bix.min()) - 1
+    y0 = min(aiy.min(), biy.min()) - 1
+    stride = max(aiy.max(), biy.max()) - y0 + 2
+    b_key = (bix - x0) * stride + (biy - y0)
+    order = np.argsort(b_key, kind="stable")
+    sorted_key = b_key[order]
+    pairs_a, pairs_b = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = (aix + dx - x0) * stride + (aiy + dy - y0)
+            lo = np.searchsorted(sorted_key, key, side="left")
+            count = np.searchsorted(sorted_key, key, side="right") - lo
+            a = np.repeat(np.arange(len(ax)), count)
+            # posición dentro del tramo [lo, lo + count) de cada a
+            within = np.arange(len(a)) - np.repeat(np.cumsum(count) - count, count)
+            pairs_a.append(a)
+            pairs_b.append(order[np.repeat(lo, count) + within])
+    return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+def match_features(expected, shapes, alignment, radius=SEARCH_MM):
+    """
+    Empareja cada elemento esperado con una forma del mismo tipo y tamaño dentro de
+    radius (tras la alineación), de más cercano a más lejano y sin repetir formas.
+    Retorna el índice de forma por elemento esperado (-1 si no la hay).
+    """
+    sx, tx, sy, ty = alignment
+    ex = expected["cx"] * sx + tx
+    ey = expected["cy"] * sy + ty
+    esize = expected["size"] * (sx + sy) / 2.0
+    match = np.full(len(ex), -1)
+    if len(ex) == 0 or len(shapes["cx"]) == 0:
+        return match
+    e, s = neighbour_pairs(ex, ey, shapes["cx"], shapes["cy"], radius)
+    d = np.hypot(ex[e] - shapes["cx"][s], ey[e] - shapes["cy"][s])
+    ok = ((d <= radius) & (expected["kind"][e] == shapes["kind"][s])
+          & (np.abs(esize[e] - shapes["size"][s]) <= np.maximum(SIZE_TOL_MM, SIZE_TOL_REL * esize[e])))
+    e, s, d = e[ok], s[ok], d[ok]
+    taken = np.zeros(len(shapes["cx"]), dtype=bool)
+    for i in np.argsort(d, kind="stable"):
+        if match[e[i]] < 0 and not taken[s[i]]:
+            match[e[i]] = s[i]
+            taken[s[i]] = True
+    return match
+
+def fit_axis(expected, found, fallback):
+    """found ≈ scale * expected + offset por mínimos cuadrados; fallback si no hay dispersión."""
+    if len(expected) < 2 or np.ptp(expected) < 1.0:
+        return fallback
+    scale, offset = np.polyfit(expected, found, 1)
+    return float(scale), float(offset)
+
+def reconcile(params, entities):
+    """Informe de conciliación del DXF leído contra la geometría regenerada desde params."""
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    shapes = closed_shapes(entities)
+    expected, texts = expected_features(params)
+    alignment, plate_shape = plate_alignment(shapes, fig_w_mm, fig_h_mm)
+    match = match_features(expected, shapes, alignment)
+    hit = match >= 0
+
+    # escala y desplazamiento por eje. Cada marcador y cada etiqueta Braille (la
+    # media de sus puntos) es una observación; el ajuste se repite descartando las
+    # que se alejan, así una etiqueta movida a mano no pasa por deriva de escala
+    found_x = np.where(hit, shapes["cx"][match], np.nan)
+    found_y = np.where(hit, shapes["cy"][match], np.nan)
+    group = np.where(expected["label"] >= 0, expected["label"], -1 - np.arange(len(match)))
+    _, obs = np.unique(group[hit], return_inverse=True)
+    obs = obs.reshape(-1)
+    n_obs = int(obs.max()) + 1 if len(obs) else 0
+    weight = np.bincount(obs, minlength=n_obs)
+
+    def obs_mean(values):
+        return np.bincount(obs, weights=values[hit], minlength=n_obs) / np.maximum(weight, 1)
+
+    ex, ey, fx, fy = (obs_mean(v) for v in (expected["cx"], expected["cy"], found_x, found_y))
+    inliers = np.ones(n_obs, dtype=bool)
+    for _ in range(FIT_ROUNDS):
+        sx, tx = fit_axis(ex[inliers], fx[inliers], alignment[:2])
+        sy, ty = fit_axis(ey[inliers], fy[inliers], alignment[2:])
+        if n_obs == 0:
+            break
+        residual = np.hypot(fx - (ex * sx + tx), fy - (ey * sy + ty))
+        inliers = residual <= max(MOVE_TOL_MM, 3.0 * float(np.median(residual)))
+    rx = found_x - (expected["cx"] * sx + tx)
+    ry = found_y - (expected["cy"] * sy + ty)
+
+    report = {
+        "path": entities.path,
+        "units": entities.units,
+        "layers": {name: layer.counts() for name, layer in entities.layers.items()},
+        "shapes": {name: int(np.sum(shapes["kind"] == k)) for k, name in enumerate(SHAPE_NAMES)},
+        "scale": [round(sx, 5), round(sy, 5)],
+        "offset_mm": [round(tx, 4) + 0.0, round(ty, 4) + 0.0],
+    }
+    report["scale_drift"] = bool(abs(sx - 1.0) > SCALE_TOL or abs(sy - 1.0) > SCALE_TOL
+                                 or abs(tx) > OFFSET_TOL_MM or abs(ty) > OFFSET_TOL_MM)
+
+    markers = np.flatnonzero(expected["label"] < 0)
+    report["markers_expected"] = len(markers)
+    report["missing_markers"] = [
+        {"shape": SHAPE_NAMES[expected["kind"][i]], "at_mm": [round(float(expected["cx"][i]), 3),
+                                                              round(float(expected["cy"][i]), 3)]}
+        for i in markers if not hit[i]]
+    report["moved_markers"] = [
+        {"shape": SHAPE_NAMES[expected["kind"][i]], "at_mm": [round(float(expected["cx"][i]), 3),
+                                                              round(float(expected["cy"][i]), 3)],
+         "offset_mm": [round(float(rx[i]), 3), round(float(ry[i]), 3)]}
+        for i in markers if hit[i] and np.hypot(rx[i], ry[i]) > MOVE_TOL_MM]
+
+    report["braille_expected"] = len(texts)
+    report["missing_braille"], report["moved_braille"] = [], []
+    for i, text in enumerate(texts):
+        dots = np.flatnonzero(expected["label"] == i)
+        found = dots[hit[dots]]
+        entry = {"text": text, "at_mm": [round(float(expected["cx"][dots].min()), 3),
+                                         round(float(expected["cy"][dots].max()), 3)],
+                 "dots": len(dots), "found": len(found)}
+        if len(found) * 2 < len(dots):
+            report["missing_braille"].append(entry)
+            continue
+        shift = np.array([np.median(rx[found]), np.median(ry[found])])
+        if np.hypot(*shift) > MOVE_TOL_MM:
+            entry["offset_mm"] = [round(float(v), 3) for v in shift]
+            report["moved_braille"].append(entry)
+    # el contorno de la placa ya se usó para alinear: no es una forma sobrante
+    plate_used = plate_shape is not None and plate_shape not in match[hit]
+    report["unmatched_shapes"] = int(len(shapes["cx"]) - hit.sum() - plate_used)
+    report["ok"] = not (report["scale_drift"] or report["missing_markers"] or report["moved_markers"]
+                        or report["missing_braille"] or report["moved_braille"])
+    return report
+
+def print_inventory(entities):
+    print(f"{entities.path} ($INSUNITS {entities.units})")
+    for name, layer in entities.layers.items():
+        counts = ", ".join(f"{k} {v}" for k, v in layer.counts().items() if v)
+        print(f"       {name:<12} {counts}")
+    shapes = closed_shapes(entities)
+    print("       closed shapes: " + ", ".join(f"{name} {int(np.sum(shapes['kind'] == k))}"
+                                                for k, name in enumerate(SHAPE_NAMES)))
+
+def print_report(report):
+    status = "[OK]  " if report["ok"] else "[FAIL]"
+    print(f"{status} {report['path']}")
+    print(f"       scale {report['scale'][0]} x {report['scale'][1]}, offset {report['offset_mm']} mm"
+          + (" (DRIFT)" if report["scale_drift"] else ""))
+    print(f"       markers: {report['markers_expected']} expected, {len(report['missing_markers'])} missing, "
+          f"{len(report['moved_markers'])} moved")
+    for m in report["missing_markers"][:10]:
+        print(f"         missing {m['shape']} at {m['at_mm']}")
+    for m in report["moved_markers"][:10]:
+        print(f"         moved {m['shape']} at {m['at_mm']} by {m['offset_mm']} mm")
+    print(f"       Braille labels: {report['braille_expected']} expected, "
+          f"{len(report['missing_braille'])} missing, {len(report['moved_braille'])} moved")
+    for b in report["missing_braille"]:
+        print(f"         missing {b['text']!r} at {b['at_mm']} ({b['found']}/{b['dots']} dots)")
+    for b in report["moved_braille"]:
+        print(f"         moved {b['text']!r} at {b['at_mm']} by {b['offset_mm']} mm")
+    print(f"       unmatched closed shapes: {report['unmatched_shapes']}")
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lee DXF en streaming y los concilia con params.json")
+    parser.add_argument("paths", nargs="+", help="archivos DXF (o directorios/globs de params con --batch)")
+    parser.add_argument("--params", default=None, help="params.json con el que conciliar los DXF")
+    parser.add_argument("--batch", action="store_true",
+                        help="conciliar cada params de los directorios/globs con su .dxf (salida de --batch --dxf)")
+    parser.add_argument("--out-dir", default=None,
+                        help="con --batch: el --out-dir con el que se generaron los DXF")
+    parser.add_argument("--json", default=None, help="guardar los informes en este JSON")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        try:
+            # misma disposición de salida que generate_svg_from_params --batch
+            jobs = [(load_params(p), out) for p, out in batch_jobs(args.paths, args.out_dir, suffix=".dxf")]
+        except ParamsError as exc:
+            print(f"ParamsError: {exc}")
+            return 1
+    else:
+        params = load_params(args.params) if args.params else None
+        jobs = [(params, Path(p)) for p in args.paths]
+
+    reports = []
+    failures = 0
+    for params, dxf_path in jobs:
+        if not dxf_path.exists():
+            print(f"[FAIL] {dxf_path}: not found")
+            failures += 1
+            continue
+        entities = read_dxf(dxf_path)
+        if params is None:
+            print_inventory(entities)
+            continue
+        report = reconcile(params, entities)
+        print_report(report)
+        reports.append(report)
+        failures += not report["ok"]
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(reports, fh, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
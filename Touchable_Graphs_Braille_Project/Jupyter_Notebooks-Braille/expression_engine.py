@@ -0,0 +1,122 @@
+"""
+expression_engine.py
+
+Compila las expresiones de params["functions"] (p. ej. "x**2", "np.sin(x)/x")
+una sola vez a un código Python restringido y vectorizado sobre arrays NumPy.
+
+- El texto se analiza con ast y solo se aceptan: números, la variable x,
+  operadores aritméticos/comparaciones, y llamadas a funciones matemáticas
+  de la lista permitida (como np.sin(x) o sin(x)).
+- Cualquier otra construcción (atributos arbitrarios, __import__, lambdas,
+  subíndices, strings...) lanza ExpressionError antes de evaluar nada.
+- Al compilar, la expresión se evalúa una vez sobre una muestra de x: lo que solo
+  falla al evaluar (~x o x & 1 sobre floats, where(x) que no da un valor por cada x)
+  también lanza ExpressionError. &, | y ~ sirven sobre comparaciones, como
+  "where((x > 0) & (x < 1), x, 0)".
+- La compilación se cachea por texto de la expresión: un lote de figuras que
+  comparten "x**2" o "x**3" solo paga el análisis una vez por proceso.
+
+Uso:
+    f = compile_expression("np.sin(x) / x")
+    ys = f(np.linspace(-7, 7, 800))
+"""
+
+import ast
+import functools
+import types
+import numpy as np
+import render_profile
+
+# Funciones y constantes de NumPy permitidas (accesibles como np.<nombre> o <nombre>)
+ALLOWED_FUNCTIONS = (
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2",
+    "sinh", "cosh", "tanh", "arcsinh", "arccosh", "arctanh",
+    "exp", "expm1", "log", "log10", "log2", "log1p", "sqrt", "cbrt", "square",
+    "abs", "absolute", "sign", "floor", "ceil", "round", "power", "hypot",
+    "maximum", "minimum", "where", "clip", "heaviside", "sinc", "deg2rad", "rad2deg",
+)
+ALLOWED_CONSTANTS = ("pi", "e", "inf")
+
+# Muestra sobre la que se prueba cada expresión al compilarla
+_TRIAL_X = np.linspace(-2.0, 2.0, 5)
+
+# Nodos AST aceptados
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load,
+    ast.Attribute, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.FloorDiv,
+    ast.UAdd, ast.USub, ast.BitAnd, ast.BitOr, ast.Invert,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+# Espacio de nombres de evaluación: solo lo permitido, sin builtins
+_SAFE_NP = types.SimpleNamespace(**{name: getattr(np, name) for name in ALLOWED_FUNCTIONS + ALLOWED_CONSTANTS})
+_SAFE_GLOBALS = {"__builtins__": {}, "np": _SAFE_NP}
+_SAFE_GLOBALS.update(vars(_SAFE_NP))
+
+class ExpressionError(ValueError):
+    """Expresión con sintaxis inválida o con construcciones no permitidas."""
+
+class CompiledExpression:
+    """Expresión ya validada y compilada; se llama como f(x) con x escalar o array."""
+
+    def __init__(self, source, code):
+        self.source = source
+        self._code = code
+
+    def __call__(self, x):
+        with render_profile.stage("evaluate"):
+            return self.evaluate(x)
+
+    def evaluate(self, x):
+        """Como f(x), sin medirlo en el perfil activo."""
+        # polos (1/x, tan) y dominios (log, sqrt) dan inf/nan sin avisos: se tratan aguas abajo
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return np.asarray(eval(self._code, _SAFE_GLOBALS, {"x": x}), dtype=float)
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+_ALLOWED_NAMES = ("x",) + ALLOWED_FUNCTIONS + ALLOWED_CONSTANTS
+
+def _validate(tree, source):
+    """Recorre el AST y lanza ExpressionError ante cualquier construcción fuera de la lista."""
+    # 'np' solo es válido como base de np.<nombre permitido>
+    np_bases = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id == "np"
+                    and node.attr in ALLOWED_FUNCTIONS + ALLOWED_CONSTANTS):
+                raise ExpressionError(f"atributo no permitido {ast.unparse(node)!r} en {source!r}")
+            np_bases.add(id(node.value))
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ExpressionError(f"construcción no permitida ({type(node).__name__}) en {source!r}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool)
+                                               or not isinstance(node.value, (int, float))):
+            raise ExpressionError(f"constante no numérica {node.value!r} en {source!r}")
+        if isinstance(node, ast.Name) and id(node) not in np_bases and node.id not in _ALLOWED_NAMES:
+            raise ExpressionError(f"nombre desconocido {node.id!r} en {source!r}")
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+            if node.keywords or name not in ALLOWED_FUNCTIONS:
+                raise ExpressionError(f"llamada no permitida {ast.unparse(node)!r} en {source!r}")
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(source):
+    """Valida y compila source (cacheado por texto). Lanza ExpressionError si no es segura."""
+    source = str(source).strip()
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as exc:
+        raise ExpressionError(f"sintaxis inválida en {source!r}: {exc.msg}") from None
+    _validate(tree, source)
+    compiled = CompiledExpression(source, compile(tree, f"<expr {source}>", "eval"))
+    try:
+        # como en curve_polylines: un valor (o un escalar) por cada x
+        np.broadcast_to(compiled.evaluate(_TRIAL_X), _TRIAL_X.shape)
+    except Exception as exc:  # tipos, argumentos o forma inválidos: TypeError, ValueError...
+        raise ExpressionError(f"no se puede evaluar {source!r}: {type(exc).__name__}: {exc}") from None
+    return compiled
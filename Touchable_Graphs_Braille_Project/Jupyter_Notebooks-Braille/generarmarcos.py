@@ -1,70 +1,239 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, FancyArrow
-
-# Conversión mm → pulgadas
-def mm2in(mm):
-    return mm / 25.4  # conversión real para el lienzo físico
-
-def mm2pt(mm):
-    return mm * 2.83465
-
-def marco_a5_con_ejes(cfg):
-    # Crear figura del tamaño físico del A5
-    fig_w_in = mm2in(cfg['a5_size_mm'][0])
-    fig_h_in = mm2in(cfg['a5_size_mm'][1])
-    fig, ax = plt.subplots(figsize=(fig_w_in, fig_h_in), dpi=cfg['dpi'])
-
-    # Configurar ejes en mm reales
-    ax.set_xlim(0, cfg['a5_size_mm'][0])
-    ax.set_ylim(0, cfg['a5_size_mm'][1])
-    ax.set_aspect('equal')
-
-    # Quitar ticks y etiquetas
-    ax.axis('off')
-
-    # Marco A5
-    marco_lw_pt = mm2pt(cfg['frame_linewidth_mm'])
-    rect = Rectangle((0, 0),
-                     cfg['a5_size_mm'][0], cfg['a5_size_mm'][1],
-                     fill=False, linewidth=marco_lw_pt, edgecolor='black')
-    ax.add_patch(rect)
-
-    # Eje X con flecha
-    ax.add_patch(FancyArrow(0, cfg['a5_size_mm'][1] / 2,
-                            cfg['a5_size_mm'][0] + cfg['axis_extension_mm'], 0,
-                            width=0.5,
-                            head_width=3,
-                            head_length=5,
-                            linewidth=mm2pt(cfg['axis_linewidth_mm']),
-                            color='black',
-                            length_includes_head=True))
-
-    # Eje Y con flecha
-    ax.add_patch(FancyArrow(cfg['a5_size_mm'][0] / 2, 0,
-                            0, cfg['a5_size_mm'][1] + cfg['axis_extension_mm'],
-                            width=0.5,
-                            head_width=3,
-                            head_length=5,
-                            linewidth=mm2pt(cfg['axis_linewidth_mm']),
-                            color='black',
-                            length_includes_head=True))
-
-    # Forzar a ocupar todo el lienzo sin recorte
-    ax.set_position([0, 0, 1, 1])
-
-    # Guardar sin recortar nada
-    plt.savefig(cfg['output_filename'], format='svg', bbox_inches=None)
-    plt.show()
-
-
-# Configuración
+#!/usr/bin/env python3
+"""
+generarmarcos.py
+
+Marco de placa con ejes X/Y en flecha, calculado directamente en mm (sin matplotlib
+ni ventana): el rectángulo del marco y cada flecha son polígonos exactos que se
+escriben con los mismos backends que build_svg_from_params.
+
+- SVG: StreamingDrawing (svg_stream) con viewBox en mm, capas Frame y Axes.
+- DXF: DxfWriter de generate_dxf_from_params (mismas capas, y hacia arriba).
+- STL: placa + crestas del marco + flechas con las primitivas de generate_stl_from_params.
+
+Las flechas siguen la forma de FancyArrow (length_includes_head=True): tallo de
+arrow_width_mm y punta de arrow_head_width_mm x arrow_head_length_mm. Sobresalen
+axis_extension_mm del marco; el lienzo (y la placa del STL) se amplía para
+contenerlas en lugar de recortarlas. El trazo del borde (axis_linewidth_mm) ya va
+incluido en el contorno, desplazado hacia fuera con esquinas en inglete, así que el
+SVG las rellena sin trazo y los tres backends comparten el mismo polígono.
+
+Todo está en mm (ancho de líneas incluido), así que no hay conversión a pt ni a
+pulgadas. Solo se importa svg_stream; NumPy y los backends DXF/STL se cargan
+cuando se piden esas salidas.
+
+Uso:
+    python generarmarcos.py                              # marco_a5_flechas.svg (config_a5)
+    python generarmarcos.py --size 297 210 -o marco_a4.svg --dxf --stl
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+from svg_stream import StreamingDrawing, XML_DECLARATION
+
+# Configuración por defecto (A5 horizontal)
 config_a5 = {
     'a5_size_mm': (210, 148.5),  # A5 horizontal
-    'dpi': 96,
     'frame_linewidth_mm': 0.6,
     'axis_linewidth_mm': 0.6,
-    'axis_extension_mm': 10,  # cuanto sobresale la flecha
+    'axis_extension_mm': 10,     # cuanto sobresale la flecha
+    'arrow_width_mm': 0.5,       # ancho del tallo
+    'arrow_head_width_mm': 3,
+    'arrow_head_length_mm': 5,
     'output_filename': 'marco_a5_flechas.svg'
 }
 
-marco_a5_con_ejes(config_a5)
+# Capas (id/label SVG y nombre DXF) y color ACI
+FRAME_LAYERS = [
+    ("Frame", 8),
+    ("Axes", 7),
+]
+
+# -----------------------
+# GEOMETRÍA (mm, y hacia abajo como el SVG)
+# -----------------------
+
+def arrow_outline(x, y, dx, dy, width, head_width, head_length):
+    """
+    Contorno de una flecha de (x, y) a (x + dx, y + dy) con la punta incluida en la
+    longitud: 7 vértices (tallo y punta), en el orden de FancyArrow.
+    """
+    length = (dx * dx + dy * dy) ** 0.5
+    ux, uy = dx / length, dy / length
+    nx, ny = -uy, ux
+    head_length = min(head_length, length)
+    shaft = length - head_length
+
+    def at(along, across):
+        return (x + ux * along + nx * across, y + uy * along + ny * across)
+
+    w, hw = width / 2.0, head_width / 2.0
+    return [at(0.0, w), at(shaft, w), at(shaft, hw), at(length, 0.0),
+            at(shaft, -hw), at(shaft, -w), at(0.0, -w)]
+
+def offset_outline(points, distance):
+    """
+    Contorno desplazado distance hacia fuera con esquinas en inglete (lo que cubre
+    un trazo de 2 * distance con stroke-linejoin="miter"); sirve también en las
+    esquinas cóncavas del arranque de la punta.
+    """
+    area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]))
+    sign = 1.0 if area > 0 else -1.0
+    normals = []
+    for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+        length = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5
+        normals.append((sign * (y1 - y0) / length, -sign * (x1 - x0) / length))
+    result = []
+    for (x, y), (ax, ay), (bx, by) in zip(points, normals[-1:] + normals[:-1], normals):
+        scale = distance / (1.0 + ax * bx + ay * by)
+        result.append((x + (ax + bx) * scale, y + (ay + by) * scale))
+    return result
+
+def arrow_parts(outline):
+    """Tallo (cuadrilátero) y punta (triángulo) de arrow_outline, ambos convexos."""
+    tail_a, base_a, head_a, tip, head_b, base_b, tail_b = outline
+    return [tail_a, base_a, base_b, tail_b], [head_a, tip, head_b]
+
+def frame_geometry(cfg):
+    """
+    Geometría del marco en mm: {"frame": rectángulo (4 vértices), "arrows": [eje X, eje Y]
+    con el trazo incluido, "bounds": (x0, y0, x1, y1) que contiene todo, trazos incluidos}.
+    Misma disposición que el marco original: eje X a media altura de izquierda a
+    derecha, eje Y a media anchura de abajo hacia arriba.
+    """
+    w, h = (float(v) for v in cfg['a5_size_mm'])
+    ext = float(cfg['axis_extension_mm'])
+    arrow = (float(cfg['arrow_width_mm']), float(cfg['arrow_head_width_mm']),
+             float(cfg['arrow_head_length_mm']))
+    frame = [(0.0, 0.0), (w, 0.0), (w, h), (0.0, h)]
+    stroke = float(cfg['axis_linewidth_mm']) / 2.0
+    arrows = [offset_outline(arrow_outline(0.0, h / 2.0, w + ext, 0.0, *arrow), stroke),
+              offset_outline(arrow_outline(w / 2.0, h, 0.0, -(h + ext), *arrow), stroke)]
+
+    # el rectángulo lleva trazo (esquinas de 90°: medio trazo basta); las flechas no
+    pad = float(cfg['frame_linewidth_mm']) / 2.0
+    xs = [x for x, _ in frame] + [x for a in arrows for x, _ in a]
+    ys = [y for _, y in frame] + [y for a in arrows for _, y in a]
+    pads = [pad] * len(frame) + [0.0] * (len(xs) - len(frame))
+    bounds = (min(x - p for x, p in zip(xs, pads)), min(y - p for y, p in zip(ys, pads)),
+              max(x + p for x, p in zip(xs, pads)), max(y + p for y, p in zip(ys, pads)))
+    return {"frame": frame, "arrows": arrows, "bounds": bounds}
+
+# -----------------------
+# BACKENDS
+# -----------------------
+
+def write_frame_svg(cfg, output_svg, geometry=None):
+    """SVG con viewBox en mm (coordenadas exactas, sin conversión de unidades)."""
+    geometry = geometry or frame_geometry(cfg)
+    x0, y0, x1, y1 = (round(v, 4) for v in geometry["bounds"])
+    w, h = round(x1 - x0, 4), round(y1 - y0, 4)
+    dwg = StreamingDrawing(f"{w}mm", f"{h}mm", viewbox=f"{x0} {y0} {w} {h}")
+    with open(output_svg, "w", encoding="utf8") as fh:
+        fh.write(XML_DECLARATION)
+        fh.write(dwg.header())
+        layer = dwg.open_layer(fh, "Frame", "Frame", fill="none", stroke="#000000",
+                               stroke_width=float(cfg['frame_linewidth_mm']))
+        layer.add(dwg.polygon(geometry["frame"]))
+        layer.close()
+        layer = dwg.open_layer(fh, "Axes", "Axes", fill="#000000", stroke="none")
+        for outline in geometry["arrows"]:
+            layer.add(dwg.polygon(outline))
+        layer.close()
+        fh.write(dwg.footer())
+    print(f"SVG saved to: {output_svg}")
+    return output_svg
+
+def write_frame_dxf(cfg, output_dxf, geometry=None):
+    """DXF con polilíneas cerradas (y hacia arriba, origen en la esquina inferior del marco)."""
+    # import diferido: el backend DXF carga NumPy y el generador SVG completo
+    from generate_dxf_from_params import DxfWriter
+    geometry = geometry or frame_geometry(cfg)
+    h = float(cfg['a5_size_mm'][1])
+    with DxfWriter(output_dxf, layers=FRAME_LAYERS) as writer:
+        for layer, outlines in (("Frame", [geometry["frame"]]), ("Axes", geometry["arrows"])):
+            for outline in outlines:
+                writer.lwpolyline(layer, [x for x, _ in outline], [h - y for _, y in outline], closed=True)
+    print(f"DXF saved to: {output_dxf} ({writer.entity_count} entities)")
+    return output_dxf
+
+def write_frame_stl(cfg, output_stl, geometry=None):
+    """
+    STL: placa del tamaño del lienzo, marco como crestas de frame_linewidth_mm y flechas
+    como prismas (tallo + punta), con las alturas de ejes de generate_stl_from_params.
+    """
+    import numpy as np
+    from generate_stl_from_params import (StlWriter, write_prisms, segment_outlines,
+                                          PLATE_THICKNESS_MM, AXIS_HEIGHT_MM)
+    geometry = geometry or frame_geometry(cfg)
+    x0, y0, x1, y1 = geometry["bounds"]
+    h = float(cfg['a5_size_mm'][1])
+    base = float(cfg.get('plate_thickness_mm', PLATE_THICKNESS_MM))
+    top = base + float(cfg.get('axis_height_mm', AXIS_HEIGHT_MM))
+
+    def flip(outlines):
+        # SVG (y hacia abajo) -> STL (y hacia arriba), como el DXF
+        outlines = np.array(outlines, dtype=float)
+        outlines[..., 1] = h - outlines[..., 1]
+        return outlines
+
+    # lados del marco alargados medio trazo para cerrar las esquinas
+    stroke = float(cfg['frame_linewidth_mm'])
+    corners = geometry["frame"]
+    sx1, sy1, sx2, sy2 = [], [], [], []
+    for (ax, ay), (bx, by) in zip(corners, corners[1:] + corners[:1]):
+        length = ((bx - ax) ** 2 + (by - ay) ** 2) ** 0.5
+        ex, ey = (bx - ax) / length * stroke / 2.0, (by - ay) / length * stroke / 2.0
+        sx1.append(ax - ex)
+        sy1.append(ay - ey)
+        sx2.append(bx + ex)
+        sy2.append(by + ey)
+    ridges = segment_outlines(sx1, sy1, sx2, sy2, stroke)
+    parts = [arrow_parts(outline) for outline in geometry["arrows"]]
+
+    with StlWriter(output_stl, header=b"generarmarcos") as writer:
+        write_prisms(writer, flip([[(x0, y0), (x1, y0), (x1, y1), (x0, y1)]]), 0.0, base)
+        write_prisms(writer, flip(ridges), base, top)
+        write_prisms(writer, flip([shaft for shaft, _ in parts]), base, top)
+        write_prisms(writer, flip([head for _, head in parts]), base, top)
+    print(f"STL saved to: {output_stl} ({writer.count} triangles)")
+    return output_stl
+
+def marco_a5_con_ejes(cfg, dxf=False, stl=False):
+    """Escribe el SVG de cfg['output_filename'] y, si se piden, el DXF y el STL junto a él."""
+    geometry = frame_geometry(cfg)
+    output_svg = cfg['output_filename']
+    write_frame_svg(cfg, output_svg, geometry)
+    if dxf:
+        write_frame_dxf(cfg, str(Path(output_svg).with_suffix(".dxf")), geometry)
+    if stl:
+        write_frame_stl(cfg, str(Path(output_svg).with_suffix(".stl")), geometry)
+    return geometry
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un marco con ejes en flecha (SVG/DXF/STL) en mm exactos")
+    parser.add_argument("--size", nargs=2, type=float, default=None, metavar=("W", "H"),
+                        help="tamaño del marco en mm (por defecto A5 horizontal)")
+    parser.add_argument("--extension", type=float, default=None,
+                        help="mm que sobresalen las flechas del marco")
+    parser.add_argument("-o", "--output", default=None, help="ruta del SVG")
+    parser.add_argument("--dxf", action="store_true", help="exportar también el DXF junto al SVG")
+    parser.add_argument("--stl", action="store_true", help="exportar también el STL junto al SVG")
+    args = parser.parse_args(argv)
+
+    cfg = dict(config_a5)
+    if args.size is not None:
+        cfg['a5_size_mm'] = tuple(args.size)
+    if args.extension is not None:
+        cfg['axis_extension_mm'] = args.extension
+    if args.output is not None:
+        cfg['output_filename'] = args.output
+    marco_a5_con_ejes(cfg, dxf=args.dxf, stl=args.stl)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+generate_cws_from_params.py
+
+Lamina la placa directamente desde params.json y empaqueta un trabajo de resina
+.cws (zip con una máscara PNG por capa y el G-code de exposición), sin pasar por
+el STL ni por CHITUBOX. Usa los mismos prismas que el STL (plate_prisms).
+
+- Cada grupo de prismas con la misma cota (placa, crestas, marcadores de cada
+  forma, puntos Braille) se rasteriza una sola vez con NumPy (prueba de
+  semiplanos sobre los centros de píxel, por lotes de polígonos de tamaño
+  parecido); la máscara de cada capa es la unión de los grupos que la cruzan.
+- Las capas con el mismo conjunto de grupos (toda la base, cada tramo de relieve)
+  son idénticas: su PNG se codifica una sola vez y se reutiliza.
+- Máscaras binarias de 8 bits (0/255) a la resolución de la máquina, con la placa
+  centrada en la plataforma y en la orientación de la vista superior (como el SVG).
+
+Máquina y exposición por defecto: las de los trabajos de CHITUBOX de
+Resin_3D_Printer_Braille_Project/CWS-Braille (NOVA3D Bene6, 2560x1600, 0.08 mm);
+se sobreescriben con params["resin"], p. ej. {"layer_height_mm": 0.1, "exposure_ms": 12000}.
+
+Uso:
+    python generate_cws_from_params.py params.json [-o trabajo.cws] [--layer-height 0.1]
+"""
+
+import io
+import sys
+import zlib
+import math
+import struct
+import zipfile
+import argparse
+import datetime
+import numpy as np
+from pathlib import Path
+
+from generate_svg_from_params import ParamsError, load_params, validate_params, plot_frame
+from generate_stl_from_params import plate_prisms
+
+# -----------------------
+# PARÁMETROS POR DEFECTO
+# -----------------------
+
+# Valores de los trabajos de referencia en CWS-Braille (cabecera de chitubox.gcode)
+RESIN_DEFAULTS = {
+    "machine_name": "NOVA3D Bene6",
+    "resin_name": "NOVASTAN",
+    "resolution_px": [2560, 1600],
+    "platform_mm": [192.0, 120.0, 200.0],
+    "layer_height_mm": 0.08,
+    "exposure_ms": 14000,
+    "bottom_exposure_ms": 45000,
+    "bottom_layers": 6,
+    "transition_layers": 10,
+    "light_off_ms": 2000,
+    "bottom_light_off_ms": 1900,
+    "lift_mm": 5.0,
+    "bottom_lift_mm": 6.0,
+    "lift_feed_mm_min": 120.0,
+    "retract_feed_mm_min": 120.0,
+    "end_lift_mm": 94.0,
+    "flip_x": True,
+    "flip_y": True,
+    "resin_density_g_ml": 1.1,
+}
+
+# Área máxima (px) de la caja de un polígono para rasterizarlo por lotes; los
+# mayores (placa, ejes, tramos largos) se rasterizan de uno en uno
+BATCH_BOX_PX = 64 * 64
+# Píxeles por lote (acota la memoria de las pruebas de semiplanos)
+BATCH_PIXELS = 4_000_000
+
+def resin_settings(params):
+    """RESIN_DEFAULTS con params["resin"] encima, validado."""
+    overrides = params.get("resin", {})
+    if not isinstance(overrides, dict):
+        raise ParamsError("resin debe ser un objeto {clave: valor}")
+    unknown = sorted(set(overrides) - set(RESIN_DEFAULTS))
+    if unknown:
+        raise ParamsError(f"resin: claves desconocidas {unknown}")
+    settings = dict(RESIN_DEFAULTS, **overrides)
+    for key in ("layer_height_mm", "exposure_ms", "bottom_exposure_ms", "lift_feed_mm_min",
+                "retract_feed_mm_min"):
+        value = settings[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ParamsError(f"resin.{key} debe ser un número > 0, no {value!r}")
+    if settings["lift_mm"] <= settings["layer_height_mm"] or settings["bottom_lift_mm"] <= settings["layer_height_mm"]:
+        raise ParamsError("resin: lift_mm y bottom_lift_mm deben superar layer_height_mm")
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    platform_w, platform_h = settings["platform_mm"][:2]
+    if fig_w_mm > platform_w or fig_h_mm > platform_h:
+        raise ParamsError(f"la placa {fig_w_mm}x{fig_h_mm} mm no cabe en la plataforma "
+                          f"{platform_w}x{platform_h} mm de {settings['machine_name']}")
+    return settings
+
+# -----------------------
+# RASTERIZADO VECTORIZADO
+# -----------------------
+
+def rasterize_convex(mask, polygons):
+    """
+    Marca en mask (bool, alto x ancho) los píxeles cuyo centro cae dentro de algún
+    polígono convexo de polygons (N, k, 2), en coordenadas de píxel.
+    """
+    polygons = np.asarray(polygons, dtype=float)
+    if polygons.size == 0:
+        return mask
+    height, width = mask.shape
+    # sentido antihorario (área con signo positiva): dentro = a la izquierda de cada arista
+    x, y = polygons[..., 0], polygons[..., 1]
+    area2 = np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)
+    polygons = np.where((area2 < 0)[:, None, None], polygons[:, ::-1], polygons)
+
+    # caja de píxeles (índices de centro) de cada polígono, recortada a la imagen
+    x0 = np.clip(np.ceil(polygons[..., 0].min(axis=1) - 0.5), 0, width).astype(int)
+    x1 = np.clip(np.floor(polygons[..., 0].max(axis=1) - 0.5) + 1, 0, width).astype(int)
+    y0 = np.clip(np.ceil(polygons[..., 1].min(axis=1) - 0.5), 0, height).astype(int)
+    y1 = np.clip(np.floor(polygons[..., 1].max(axis=1) - 0.5) + 1, 0, height).astype(int)
+    bw, bh = x1 - x0, y1 - y0
+    visible = (bw > 0) & (bh > 0)
+    area = bw * bh
+    small = np.flatnonzero(visible & (area <= BATCH_BOX_PX))
+    large = np.flatnonzero(visible & (area > BATCH_BOX_PX))
+
+    # polígonos pequeños por lotes, ordenados por tamaño de caja para no rellenar de más
+    small = small[np.argsort(area[small], kind="stable")]
+    start = 0
+    while start < len(small):
+        box = max(int(area[small[start]]), 1)
+        stop = min(len(small), start + max(1, BATCH_PIXELS // box))
+        # dentro del lote todas las cajas se amplían a la mayor
+        while stop > start + 1 and int(bw[small[start:stop]].max()) * int(bh[small[start:stop]].max()) * (stop - start) > BATCH_PIXELS:
+            stop = start + (stop - start) // 2
+        _rasterize_batch(mask, polygons[small[start:stop]], x0[small[start:stop]], y0[small[start:stop]],
+                         int(bw[small[start:stop]].max()), int(bh[small[start:stop]].max()))
+        start = stop
+    for i in large:
+        _rasterize_batch(mask, polygons[i:i + 1], x0[i:i + 1], y0[i:i + 1], int(bw[i]), int(bh[i]))
+    return mask
+
+def _rasterize_batch(mask, polygons, x0, y0, box_w, box_h):
+    """Prueba de semiplanos de n polígonos sobre cajas de box_w x box_h píxeles desde (x0, y0)."""
+    height, width = mask.shape
+    px = x0[:, None, None] + np.arange(box_w)[None, None, :]
+    py = y0[:, None, None] + np.arange(box_h)[None, :, None]
+    cx = px + 0.5
+    cy = py + 0.5
+    inside = np.ones((len(polygons), box_h, box_w), dtype=bool)
+    ax, ay = polygons[..., 0], polygons[..., 1]
+    bx, by = np.roll(ax, -1, axis=1), np.roll(ay, -1, axis=1)
+    for e in range(polygons.shape[1]):
+        ex = (bx[:, e] - ax[:, e])[:, None, None]
+        ey = (by[:, e] - ay[:, e])[:, None, None]
+        inside &= ex * (cy - ay[:, e, None, None]) - ey * (cx - ax[:, e, None, None]) >= 0
+    inside &= (px < width) & (py < height)
+    n, yy, xx = np.nonzero(inside)
+    mask[y0[n] + yy, x0[n] + xx] = True
+
+# -----------------------
+# CAPAS
+# -----------------------
+
+def plate_to_pixels(params, settings):
+    """Transformación mm de placa -> píxeles: (escala x, escala y, desplazamiento x, y) con la placa centrada."""
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    res_x, res_y = settings["resolution_px"]
+    platform_w, platform_h = settings["platform_mm"][:2]
+    sx = res_x / platform_w
+    sy = res_y / platform_h
+    return sx, sy, (res_x - fig_w_mm * sx) / 2.0, (res_y - fig_h_mm * sy) / 2.0
+
+def prism_groups(params, settings):
+    """
+    Rasteriza los prismas agrupados por cotas. Retorna lista de (z0, z1, máscara)
+    con una máscara bool por cada par de cotas distinto.
+    """
+    res_x, res_y = settings["resolution_px"]
+    sx, sy, ox, oy = plate_to_pixels(params, settings)
+    masks = {}
+    for outlines, z0, z1 in plate_prisms(params):
+        if len(outlines) == 0:
+            continue
+        key = (round(float(z0), 6), round(float(z1), 6))
+        mask = masks.get(key)
+        if mask is None:
+            mask = masks[key] = np.zeros((res_y, res_x), dtype=bool)
+        pixels = np.empty_like(outlines, dtype=float)
+        pixels[..., 0] = outlines[..., 0] * sx + ox
+        pixels[..., 1] = outlines[..., 1] * sy + oy
+        rasterize_convex(mask, pixels)
+    return [(z0, z1, mask) for (z0, z1), mask in sorted(masks.items())]
+
+def layer_groups(groups, layer_height_mm):
+    """Por capa, tupla de índices de los grupos que cruzan su cota central."""
+    top = max(z1 for _, z1, _ in groups)
+    n_layers = int(math.ceil(top / layer_height_mm - 1e-9))
+    layers = []
+    for k in range(n_layers):
+        zc = (k + 0.5) * layer_height_mm
+        layers.append(tuple(i for i, (z0, z1, _) in enumerate(groups) if z0 <= zc < z1))
+    return layers
+
+def encode_png(mask):
+    """PNG en escala de grises de 8 bits (0/255) de una máscara bool, sin dependencias."""
+    height, width = mask.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)  # byte de filtro 0 por fila
+    raw[:, 1:] = mask.astype(np.uint8) * 255
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+            + chunk(b"IEND", b""))
+
+# -----------------------
+# G-CODE
+# -----------------------
+
+def layer_exposures_ms(n_layers, settings):
+    """Exposición por capa: base, rampa de transición (como CHITUBOX) y normal."""
+    bottom = settings["bottom_layers"]
+    transition = settings["transition_layers"]
+    step = (settings["bottom_exposure_ms"] - settings["exposure_ms"]) / (transition + bottom + 1)
+    exposures = []
+    for k in range(n_layers):
+        if k < bottom:
+            exposures.append(int(settings["bottom_exposure_ms"]))
+        elif k < bottom + transition:
+            exposures.append(int(settings["bottom_exposure_ms"] - (k - bottom + 1) * step))
+        else:
+            exposures.append(int(settings["exposure_ms"]))
+    return exposures
+
+def lift_wait_ms(lift_mm, layer_height_mm, light_off_ms, settings):
+    """Espera tras el despegue: subida + bajada a sus velocidades + luz apagada, redondeada a 100 ms."""
+    travel_s = (lift_mm / (settings["lift_feed_mm_min"] / 60.0)
+                + (lift_mm - layer_height_mm) / (settings["retract_feed_mm_min"] / 60.0))
+    return int(round((travel_s * 1000.0 + light_off_ms) / 100.0)) * 100
+
+def build_gcode(n_layers, settings, volume_ml):
+    h = settings["layer_height_mm"]
+    res_x, res_y = settings["resolution_px"]
+    platform_w, platform_h, platform_z = settings["platform_mm"]
+    stamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    header = [
+        f"; create by generate_cws_from_params {stamp}",
+        ";(****Build and Slicing Parameters****)",
+        f";(Pix per mm X             = {res_x / platform_w:.3f} )",
+        f";(Pix per mm Y             = {res_y / platform_h:.3f} )",
+        f";(X Resolution             = {res_x} )",
+        f";(Y Resolution             = {res_y} )",
+        f";(Layer Thickness          = {h:.6f} mm )",
+        f";(Layer Time               = {settings['exposure_ms']:.6f} ms )",
+        ";(Render Outlines          = False",
+        f";(Bottom Layers Time       = {settings['bottom_exposure_ms']} ms )",
+        f";(lightOffTime             = {settings['light_off_ms']} ms",
+        f";(bottomLightOffTime       = {settings['bottom_light_off_ms']} ms",
+        f";(transitionLayerCount     = {settings['transition_layers']}",
+        f";(Number of Bottom Layers  = {settings['bottom_layers']} )",
+        ";(Build Direction          = Bottom_Up)",
+        f";(Bottom Lift Distance     = {settings['bottom_lift_mm']:.6f} mm )",
+        f";(Lift Distance            = {settings['lift_mm']:.6f} mm )",
+        f";(Z Lift Feed Rate         = {settings['lift_feed_mm_min']:.6f} mm/s ) ",
+        f";(Z Bottom Lift Feed Rate  = {settings['lift_feed_mm_min']:.6f} mm/s ) ",
+        f";(Z Lift Retract Rate      = {settings['retract_feed_mm_min']:.6f} mm/s ) ",
+        f";(Flip X                   = {settings['flip_x']})",
+        f";(Flip Y                   = {settings['flip_y']})",
+        f";Number of Slices          = {n_layers}",
+        f";volume                    = {volume_ml:.6f} ml",
+        f";resin                     = {settings['resin_name']}",
+        f";weight                    = {volume_ml * settings['resin_density_g_ml']:.6f} g",
+        f";machineName               = {settings['machine_name']}",
+        ";(****Machine Configuration ******)",
+        f";(Platform X Size          = {platform_w:.6f}mm )",
+        f";(Platform Y Size          = {platform_h:.6f}mm )",
+        f";(Platform Z Size          = {platform_z:.6f}mm )",
+        ";(Machine Type             = UV_LCD)",
+        "",
+        "G28",
+        "G21 ;Set units to be mm",
+        "G91 ;Relative Positioning",
+        "M17 ;Enable motors",
+        "<Slice> Blank",
+        "M106 S0",
+        "",
+    ]
+    out = ["\n".join(header)]
+    bottom_wait = lift_wait_ms(settings["bottom_lift_mm"], h, settings["bottom_light_off_ms"], settings)
+    normal_wait = lift_wait_ms(settings["lift_mm"], h, settings["light_off_ms"], settings)
+    for k, exposure in enumerate(layer_exposures_ms(n_layers, settings)):
+        is_bottom = k < settings["bottom_layers"]
+        lift = settings["bottom_lift_mm"] if is_bottom else settings["lift_mm"]
+        out.append(f";<Slice> {k}\nM106 S255\n;<Delay> {exposure}\nM106 S0\n;<Slice> Blank\n"
+                   f"G1 Z{lift:.3f} F{settings['lift_feed_mm_min']:g}\n"
+                   f"G1 Z-{lift - h:.3f} F{settings['retract_feed_mm_min']:g}\n"
+                   f";<Delay> {bottom_wait if is_bottom else normal_wait}\n")
+    out.append(f"M18 ;Disable Motors\nM106 S0\nG1 Z{settings['end_lift_mm']:g}\n;<Completed>\n")
+    return "\n".join(out)
+
+# -----------------------
+# TRABAJO .cws
+# -----------------------
+
+def default_cws_path(params):
+    return str(Path(params.get("output_svg", "output.svg")).with_suffix(".cws"))
+
+def build_cws_from_params(params, output_cws=None, layer_height_mm=None):
+    """Genera el .cws de params; retorna (ruta, número de capas, número de máscaras distintas)."""
+    validate_params(params)
+    if layer_height_mm is not None:
+        params = dict(params, resin=dict(params.get("resin", {}), layer_height_mm=layer_height_mm))
+    settings = resin_settings(params)
+    output_cws = output_cws or params.get("output_cws") or default_cws_path(params)
+    prefix = Path(output_cws).stem.replace(" ", "_") or "slice"
+    h = settings["layer_height_mm"]
+
+    groups = prism_groups(params, settings)
+    layers = layer_groups(groups, h)
+    res_x, res_y = settings["resolution_px"]
+    platform_w, platform_h = settings["platform_mm"][:2]
+    pixel_area_mm2 = (platform_w / res_x) * (platform_h / res_y)
+
+    # una máscara (y un PNG) por conjunto distinto de grupos
+    encoded = {}
+    volume_mm3 = 0.0
+    with zipfile.ZipFile(output_cws, "w", compression=zipfile.ZIP_STORED) as zf:
+        for k, active in enumerate(layers):
+            png = encoded.get(active)
+            if png is None:
+                mask = np.zeros((res_y, res_x), dtype=bool)
+                for i in active:
+                    mask |= groups[i][2]
+                png = encoded[active] = (encode_png(mask), int(mask.sum()))
+            zf.writestr(f"{prefix}{k:04d}.png", png[0])
+            volume_mm3 += png[1] * pixel_area_mm2 * h
+        zf.writestr(f"{prefix}.gcode", build_gcode(len(layers), settings, volume_mm3 / 1000.0))
+    print(f"CWS saved to: {output_cws} ({len(layers)} layers, {len(encoded)} distinct masks)")
+    return output_cws, len(layers), len(encoded)
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lamina params.json en un trabajo de resina .cws (PNG + G-code)")
+    parser.add_argument("params", help="params.json")
+    parser.add_argument("-o", "--output", default=None, help="ruta del .cws (por defecto output_cws o output_svg.cws)")
+    parser.add_argument("--layer-height", type=float, default=None,
+                        help=f"altura de capa en mm (por defecto {RESIN_DEFAULTS['layer_height_mm']})")
+    args = parser.parse_args(argv)
+    build_cws_from_params(load_params(args.params), args.output, args.layer_height)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
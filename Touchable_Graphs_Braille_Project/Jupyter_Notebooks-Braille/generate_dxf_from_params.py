@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+generate_dxf_from_params.py
+
+Escribe un DXF (AutoCAD 2000, unidades mm) directamente desde params.json, con la
+misma geometría que el SVG y sin el paso manual "Guardar como DXF R14" de Inkscape.
+
+Una capa DXF por capa SVG (Plate, Grid, Axes, Curves, Markers, Ticks, Braille):
+ - Curves: un LWPOLYLINE por tramo continuo de cada función (línea central del trazo)
+ - Markers circulares y puntos Braille: CIRCLE
+ - Markers cuadrados/triangulares y placa: LWPOLYLINE cerrado
+ - Grid, Axes y Ticks: LINE (merge_segments es solo del SVG: una LWPOLYLINE no
+   puede saltar entre segmentos disjuntos, así que aquí se ignora)
+
+Las entidades se formatean por bloques y se escriben en streaming al archivo.
+
+Requisitos:
+    pip install svgwrite numpy
+
+Uso:
+    python generate_dxf_from_params.py params.json [-o salida.dxf]
+"""
+
+import io
+import sys
+import argparse
+import numpy as np
+from pathlib import Path
+
+from generate_svg_from_params import (
+    load_params, plot_frame, curve_polylines, marker_positions, braille_label_specs,
+    triangle_vertices, format_numbers, FrameGeometry, write_sink,
+)
+
+# Nombre (igual que el inkscape:label de la capa SVG) y color ACI de cada capa
+DXF_LAYERS = [
+    ("Plate", 8),
+    ("Grid", 9),
+    ("Axes", 7),
+    ("Curves", 1),
+    ("Markers", 5),
+    ("Ticks", 7),
+    ("Braille", 3),
+]
+
+# Decimales en mm (0.0001 mm, muy por debajo de la resolución de cualquier impresora)
+DXF_PRECISION = 4
+
+# -----------------------
+# ESCRITOR DXF EN STREAMING
+# -----------------------
+
+def _interleave(*columns):
+    """Intercala columnas de strings (misma longitud) en una lista plana, sin bucle Python."""
+    return np.column_stack([np.asarray(c, dtype=object) for c in columns]).ravel().tolist()
+
+class DxfWriter:
+    """
+    DXF mínimo AC1015: HEADER (versión y unidades), TABLES (LTYPE y LAYER) y
+    ENTITIES escritas por bloques. Cada entidad lleva su handle.
+    """
+
+    def __init__(self, path, layers=DXF_LAYERS, precision=DXF_PRECISION):
+        # path: ruta del archivo u objeto de texto con write (p. ej. io.StringIO), que no se cierra
+        self.precision = precision
+        self.entity_count = 0
+        self._handle = 0x100  # handles bajos reservados para las tablas
+        self._owns_fh = not hasattr(path, "write")
+        self.path = Path(path) if self._owns_fh else None
+        self._fh = self.path.open("w", encoding="ascii", newline="\n") if self._owns_fh else path
+        self._closed = False
+        self._write_header(layers)
+
+    # --- estructura del archivo ---
+
+    def _write_header(self, layers):
+        out = self._fh.write
+        out("0\nSECTION\n2\nHEADER\n"
+            "9\n$ACADVER\n1\nAC1015\n"
+            "9\n$INSUNITS\n70\n4\n"        # 4 = milímetros
+            "9\n$MEASUREMENT\n70\n1\n"     # métrico
+            "0\nENDSEC\n")
+        out("0\nSECTION\n2\nTABLES\n"
+            "0\nTABLE\n2\nLTYPE\n5\n5\n100\nAcDbSymbolTable\n70\n1\n"
+            "0\nLTYPE\n5\n14\n100\nAcDbSymbolTableRecord\n100\nAcDbLinetypeTableRecord\n"
+            "2\nCONTINUOUS\n70\n0\n3\nSolid line\n72\n65\n73\n0\n40\n0.0\n"
+            "0\nENDTAB\n")
+        out(f"0\nTABLE\n2\nLAYER\n5\n2\n100\nAcDbSymbolTable\n70\n{len(layers)}\n")
+        for i, (name, color) in enumerate(layers):
+            out(f"0\nLAYER\n5\n{0x20 + i:X}\n100\nAcDbSymbolTableRecord\n100\nAcDbLayerTableRecord\n"
+                f"2\n{name}\n70\n0\n62\n{color}\n6\nCONTINUOUS\n")
+        out("0\nENDTAB\n0\nENDSEC\n")
+        out("0\nSECTION\n2\nENTITIES\n")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._fh.write("0\nENDSEC\n0\nEOF\n")
+        if self._owns_fh:
+            self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- helpers ---
+
+    def _handles(self, n):
+        handles = (("%X\n" * n) % tuple(range(self._handle, self._handle + n))).split("\n")[:-1]
+        self._handle += n
+        self.entity_count += n
+        return handles
+
+    def _num(self, values):
+        return format_numbers(values, precision=self.precision)
+
+    # --- entidades (coordenadas ya en el sistema DXF, y hacia arriba) ---
+
+    def lines(self, layer, x1, y1, x2, y2):
+        n = len(x1)
+        if n == 0:
+            return
+        template = ("0\nLINE\n5\n%s\n100\nAcDbEntity\n8\n" + layer + "\n100\nAcDbLine\n"
+                    "10\n%s\n20\n%s\n30\n0.0\n11\n%s\n21\n%s\n31\n0.0\n")
+        values = _interleave(self._handles(n), self._num(x1), self._num(y1), self._num(x2), self._num(y2))
+        self._fh.write((template * n) % tuple(values))
+
+    def circles(self, layer, cx, cy, r):
+        n = len(cx)
+        if n == 0:
+            return
+        r = np.broadcast_to(np.asarray(r, dtype=float), (n,))
+        template = ("0\nCIRCLE\n5\n%s\n100\nAcDbEntity\n8\n" + layer + "\n100\nAcDbCircle\n"
+                    "10\n%s\n20\n%s\n30\n0.0\n40\n%s\n")
+        values = _interleave(self._handles(n), self._num(cx), self._num(cy), self._num(r))
+        self._fh.write((template * n) % tuple(values))
+
+    def lwpolyline(self, layer, xs, ys, closed=False):
+        n = len(xs)
+        if n < 2:
+            return
+        handle = self._handles(1)[0]
+        self._fh.write(f"0\nLWPOLYLINE\n5\n{handle}\n100\nAcDbEntity\n8\n{layer}\n100\nAcDbPolyline\n"
+                       f"90\n{n}\n70\n{1 if closed else 0}\n43\n0.0\n")
+        self._fh.write(("10\n%s\n20\n%s\n" * n) % tuple(_interleave(self._num(xs), self._num(ys))))
+
+    def polygons(self, layer, outlines):
+        """Polígonos cerrados: outlines es un array (N, k, 2)."""
+        for outline in outlines:
+            self.lwpolyline(layer, outline[:, 0], outline[:, 1], closed=True)
+
+# -----------------------
+# DXF DESDE PARAMS
+# -----------------------
+
+def write_plate_dxf(params, writer, frame=None):
+    """
+    Escribe en writer todas las capas de params (coordenadas en mm, y hacia arriba).
+    frame: FrameGeometry ya calculada para este marco (por defecto se calcula).
+    """
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    frame = frame if frame is not None else FrameGeometry(params)
+
+    def flip(y):
+        # SVG (y hacia abajo) -> DXF (y hacia arriba)
+        return fig_h_mm - np.asarray(y, dtype=float)
+
+    def seg_lines(layer, x1, y1, x2, y2):
+        writer.lines(layer, x1, flip(y1), x2, flip(y2))
+
+    writer.lwpolyline("Plate", [0.0, fig_w_mm, fig_w_mm, 0.0], [0.0, 0.0, fig_h_mm, fig_h_mm], closed=True)
+
+    for seg in frame.grid:
+        seg_lines("Grid", *seg)
+    seg_lines("Axes", *frame.axes)
+
+    for pieces in curve_polylines(params):
+        for sx, sy in pieces:
+            writer.lwpolyline("Curves", sx, flip(sy))
+
+    for sx, sy, shape, size_mm in marker_positions(params):
+        if shape == 's':
+            h = size_mm / 2.0
+            corners_x = np.column_stack((sx - h, sx + h, sx + h, sx - h))
+            corners_y = np.column_stack((sy - h, sy - h, sy + h, sy + h))
+            writer.polygons("Markers", np.stack([corners_x, flip(corners_y)], axis=2))
+        elif shape == '^':
+            vx, vy = triangle_vertices(sx, sy, size_mm)
+            writer.polygons("Markers", np.stack([vx, flip(vy)], axis=2))
+        else:
+            writer.circles("Markers", sx, flip(sy), size_mm / 2.0)
+
+    seg_lines("Ticks", *frame.ticks)
+
+    for spec in braille_label_specs(params):
+        writer.circles("Braille", spec["cx"], flip(spec["cy"]), spec["dot_diameter_mm"] / 2.0)
+
+def default_dxf_path(params):
+    return str(Path(params.get("output_svg", "output.svg")).with_suffix(".dxf"))
+
+def render_dxf(params, sink=None, frame=None):
+    """
+    DXF de params en memoria: retorna los bytes, sin archivos intermedios ni prints.
+    Con sink (ruta u objeto binario con write) el resultado se copia allí.
+    """
+    buf = io.StringIO()
+    with DxfWriter(buf) as writer:
+        write_plate_dxf(params, writer, frame)
+    data = buf.getvalue().encode("ascii")
+    if sink is not None:
+        write_sink(sink, data)
+    return data
+
+def build_dxf_from_params(params, output_dxf=None, frame=None):
+    """Genera el DXF de params; retorna (ruta, número de entidades)."""
+    output_dxf = output_dxf or params.get("output_dxf") or default_dxf_path(params)
+    with DxfWriter(output_dxf) as writer:
+        write_plate_dxf(params, writer, frame)
+    print(f"DXF saved to: {output_dxf} ({writer.entity_count} entities)")
+    return output_dxf, writer.entity_count
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un DXF con capas desde params.json")
+    parser.add_argument("params", help="params.json")
+    parser.add_argument("-o", "--output", default=None, help="ruta del DXF (por defecto output_dxf o output_svg.dxf)")
+    args = parser.parse_args(argv)
+    build_dxf_from_params(load_params(args.params), args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+generate_stl_from_params.py
+
+Genera directamente un STL binario (placa + relieves) desde params.json, sin pasar
+por Inkscape → DXF → Onshape. Usa la misma geometría en mm que el generador SVG.
+
+Relieves sobre la placa (alturas en mm, sobre la cara superior):
+ - Grid, Axes, Ticks y Curves como crestas de sección rectangular (ancho = stroke),
+   recortadas al borde de la placa (el STL mide exactamente fig_size_mm)
+ - Markers como prismas macizos; altura según la jerarquía de Instructions.md:
+   círculo < cuadrado < triángulo
+ - Braille como cilindros de dot_diameter_mm y dot_height_mm de cada etiqueta
+
+Los sólidos se solapan en lugar de unirse con una booleana (los slicers de
+resina/FDM los funden al laminar). Los triángulos se generan por lotes con NumPy
+y se escriben en streaming, así que la memoria no crece con el tamaño de la placa.
+
+Parámetros opcionales en params.json (valores por defecto entre paréntesis):
+    plate_thickness_mm (2.5), grid_height_mm (0.2), axis_height_mm (0.5),
+    curve_height_mm (0.4), marker_heights_mm ({"o": 0.6, "s": 0.8, "^": 1.0}),
+    circle_segments (24), output_stl (output_svg con extensión .stl)
+
+Requisitos:
+    pip install svgwrite numpy
+
+Con --engine heightfield la malla sale de un mapa de alturas (heightfield_mesh.py):
+un único sólido estanco, sin solapes, listo para laminar sin la unión en Onshape.
+
+Uso:
+    python generate_stl_from_params.py params.json [-o salida.stl]
+    python generate_stl_from_params.py params.json --engine heightfield [--resolution 0.05]
+"""
+
+import io
+import sys
+import struct
+import argparse
+import numpy as np
+from pathlib import Path
+
+from generate_svg_from_params import (
+    load_params, plot_frame, curve_polylines, marker_positions, braille_label_specs,
+    triangle_vertices, FrameGeometry, write_sink,
+)
+
+# -----------------------
+# PARÁMETROS POR DEFECTO
+# -----------------------
+
+PLATE_THICKNESS_MM = 2.5
+GRID_HEIGHT_MM = 0.2
+AXIS_HEIGHT_MM = 0.5
+CURVE_HEIGHT_MM = 0.4
+# Jerarquía de alturas de Instructions.md: círculo < cuadrado < triángulo
+MARKER_HEIGHTS_MM = {"o": 0.6, "s": 0.8, "^": 1.0}
+CIRCLE_SEGMENTS = 24
+
+# Prismas por lote: acota la memoria de cada bloque de triángulos
+BATCH_SIZE = 4096
+
+# Registro binario STL: normal, 3 vértices, atributo (50 bytes, sin padding)
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+# Cabecera de las mallas de heightfield_mesh (se revisan con stl_check.py --strict)
+HEIGHTFIELD_STL_HEADER = b"generate_stl_from_params heightfield"
+
+# -----------------------
+# ESCRITOR STL EN STREAMING
+# -----------------------
+
+class StlWriter:
+    """
+    Escribe un STL binario por bloques. El número de triángulos de la cabecera
+    se completa al cerrar, así que no hace falta conocerlo de antemano.
+    """
+
+    def __init__(self, path, header=b"generate_stl_from_params"):
+        # path: ruta del archivo u objeto binario con write y seek (p. ej. io.BytesIO), que no se cierra
+        self.count = 0
+        self._owns_fh = not hasattr(path, "write")
+        self.path = Path(path) if self._owns_fh else None
+        self._fh = self.path.open("wb") if self._owns_fh else path
+        self._start = self._fh.tell()
+        self._closed = False
+        self._fh.write(header[:80].ljust(80, b"\0"))
+        self._fh.write(struct.pack("<I", 0))
+
+    def write(self, triangles):
+        """triangles: array (N, 3, 3) en mm. Calcula normales y escribe el bloque."""
+        triangles = np.asarray(triangles, dtype=np.float64)
+        if triangles.size == 0:
+            return
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        records = np.zeros(len(triangles), dtype=STL_RECORD)
+        records["normal"] = normals
+        records["vertices"] = triangles
+        self._fh.write(records.tobytes())
+        self.count += len(triangles)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        end = self._fh.tell()
+        self._fh.seek(self._start + 80)
+        self._fh.write(struct.pack("<I", self.count))
+        if self._owns_fh:
+            self._fh.close()
+        else:
+            self._fh.seek(end)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# -----------------------
+# PRIMITIVAS VECTORIZADAS
+# -----------------------
+
+def prism_triangles(outlines, z0, z1):
+    """
+    Triángulos de N prismas rectos de base poligonal convexa.
+    outlines: array (N, k, 2) con los vértices de cada base (en cualquier sentido).
+    z0, z1: escalares o arrays (N,) con la cota inferior y superior.
+    Retorna array (N * (4k - 4), 3, 3) orientado hacia fuera.
+    """
+    outlines = np.asarray(outlines, dtype=float)
+    n, k, _ = outlines.shape
+    if n == 0:
+        return np.empty((0, 3, 3))
+    # forzar sentido antihorario (área con signo positiva) para que las normales salgan hacia fuera
+    x, y = outlines[..., 0], outlines[..., 1]
+    area2 = np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)
+    outlines = np.where((area2 < 0)[:, None, None], outlines[:, ::-1], outlines)
+
+    z0 = np.broadcast_to(np.asarray(z0, dtype=float), (n,))[:, None, None]
+    z1 = np.broadcast_to(np.asarray(z1, dtype=float), (n,))[:, None, None]
+    bottom = np.concatenate([outlines, np.broadcast_to(z0, (n, k, 1))], axis=2)
+    top = np.concatenate([outlines, np.broadcast_to(z1, (n, k, 1))], axis=2)
+
+    # tapas en abanico desde el vértice 0
+    i1 = np.arange(1, k - 1)
+    i2 = np.arange(2, k)
+    top_tris = np.stack([np.repeat(top[:, :1], k - 2, axis=1), top[:, i1], top[:, i2]], axis=2)
+    bottom_tris = np.stack([np.repeat(bottom[:, :1], k - 2, axis=1), bottom[:, i2], bottom[:, i1]], axis=2)
+
+    # laterales: dos triángulos por arista
+    a0, b0 = bottom, np.roll(bottom, -1, axis=1)
+    a1, b1 = top, np.roll(top, -1, axis=1)
+    side1 = np.stack([a0, b0, b1], axis=2)
+    side2 = np.stack([a0, b1, a1], axis=2)
+
+    tris = np.concatenate([top_tris, bottom_tris, side1, side2], axis=1)
+    return tris.reshape(-1, 3, 3)
+
+def segment_outlines(x1, y1, x2, y2, width):
+    """Rectángulos (N, 4, 2) de ancho width alrededor de cada segmento; descarta longitud cero."""
+    x1, y1, x2, y2 = (np.asarray(a, dtype=float) for a in (x1, y1, x2, y2))
+    dx, dy = x2 - x1, y2 - y1
+    length = np.hypot(dx, dy)
+    keep = length > 1e-9
+    x1, y1, x2, y2, dx, dy, length = (a[keep] for a in (x1, y1, x2, y2, dx, dy, length))
+    nx = -dy / length * (width / 2.0)
+    ny = dx / length * (width / 2.0)
+    return np.stack([
+        np.column_stack((x1 - nx, y1 - ny)),
+        np.column_stack((x2 - nx, y2 - ny)),
+        np.column_stack((x2 + nx, y2 + ny)),
+        np.column_stack((x1 + nx, y1 + ny)),
+    ], axis=1)
+
+def clip_outlines(outlines, width, height):
+    """
+    Lleva los vértices de outlines (N, k, 2) al rectángulo [0, width] x [0, height]
+    y descarta los polígonos que quedan sin área. Exacto para rectángulos alineados
+    con los ejes; en los oblicuos (tramos de curva) el borde recortado queda sobre
+    el de la placa, apenas por dentro del recorte exacto.
+    """
+    outlines = np.asarray(outlines, dtype=float).copy()
+    np.clip(outlines[..., 0], 0.0, width, out=outlines[..., 0])
+    np.clip(outlines[..., 1], 0.0, height, out=outlines[..., 1])
+    x, y = outlines[..., 0], outlines[..., 1]
+    area2 = np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)
+    return outlines[np.abs(area2) > 1e-9]
+
+def circle_outlines(cx, cy, diameter, segments=CIRCLE_SEGMENTS):
+    """Polígonos regulares (N, segments, 2) que aproximan círculos."""
+    ang = np.linspace(0.0, 2.0 * np.pi, segments, endpoint=False)
+    r = np.asarray(diameter, dtype=float) / 2.0
+    cx = np.asarray(cx, dtype=float)[:, None]
+    cy = np.asarray(cy, dtype=float)[:, None]
+    r = np.broadcast_to(r, cx.shape[:1])[:, None]
+    return np.stack([cx + r * np.cos(ang), cy + r * np.sin(ang)], axis=2)
+
+def square_outlines(cx, cy, size):
+    """Cuadrados (N, 4, 2) de lado size centrados en (cx, cy)."""
+    h = size / 2.0
+    cx = np.asarray(cx, dtype=float)
+    cy = np.asarray(cy, dtype=float)
+    return np.stack([
+        np.column_stack((cx - h, cy - h)),
+        np.column_stack((cx + h, cy - h)),
+        np.column_stack((cx + h, cy + h)),
+        np.column_stack((cx - h, cy + h)),
+    ], axis=1)
+
+def write_prisms(writer, outlines, z0, z1):
+    """Escribe prismas por lotes de BATCH_SIZE (memoria acotada)."""
+    for start in range(0, len(outlines), BATCH_SIZE):
+        writer.write(prism_triangles(outlines[start:start + BATCH_SIZE], z0, z1))
+
+# -----------------------
+# MALLA DESDE PARAMS
+# -----------------------
+
+def plate_prisms(params, frame=None):
+    """
+    Genera (outlines, z0, z1) de la placa y de todos los relieves descritos por params:
+    outlines (N, k, 2) en mm de placa con y hacia abajo (como el SVG), cotas en mm.
+    Lo consumen la malla STL y el laminado de resina (generate_cws_from_params).
+    frame: FrameGeometry ya calculada para este marco (por defecto se calcula).
+    """
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    frame = frame if frame is not None else FrameGeometry(params)
+    base = float(params.get("plate_thickness_mm", PLATE_THICKNESS_MM))
+    marker_heights = dict(MARKER_HEIGHTS_MM)
+    marker_heights.update(params.get("marker_heights_mm", {}))
+    segments = int(params.get("circle_segments", CIRCLE_SEGMENTS))
+
+    def ridges(x1, y1, x2, y2, width, height):
+        # la geometría compartida ya llega recortada a la placa; el medio trazo que
+        # sobresale de los segmentos del borde se recorta aquí
+        outlines = clip_outlines(segment_outlines(x1, y1, x2, y2, width), fig_w_mm, fig_h_mm)
+        return outlines, base, base + height
+
+    # 1) placa
+    plate = np.array([[[0.0, 0.0], [fig_w_mm, 0.0], [fig_w_mm, fig_h_mm], [0.0, fig_h_mm]]])
+    yield plate, 0.0, base
+
+    # 2) rejilla, ejes y marcas
+    grid_stroke_mm = params.get("grid_stroke_mm", 0.25)
+    grid_height = float(params.get("grid_height_mm", GRID_HEIGHT_MM))
+    if grid_height > 0:
+        for seg in frame.grid:
+            yield ridges(*seg, grid_stroke_mm, grid_height)
+    axis_stroke_mm = params.get("axis_stroke_mm", 0.6)
+    axis_height = float(params.get("axis_height_mm", AXIS_HEIGHT_MM))
+    yield ridges(*frame.axes, axis_stroke_mm, axis_height)
+    yield ridges(*frame.ticks, axis_stroke_mm, axis_height)
+
+    # 3) curvas: cada tramo de la polilínea es una cresta
+    curve_stroke_mm = params.get("curve_stroke_mm", 0.9)
+    curve_height = float(params.get("curve_height_mm", CURVE_HEIGHT_MM))
+    for pieces in curve_polylines(params):
+        for sx, sy in pieces:
+            yield ridges(sx[:-1], sy[:-1], sx[1:], sy[1:], curve_stroke_mm, curve_height)
+
+    # 4) marcadores macizos con altura según su forma
+    for sx, sy, shape, size_mm in marker_positions(params):
+        if shape == 's':
+            outlines = square_outlines(sx, sy, size_mm)
+        elif shape == '^':
+            vx, vy = triangle_vertices(sx, sy, size_mm)
+            outlines = np.stack([vx, vy], axis=2)
+        else:
+            outlines = circle_outlines(sx, sy, size_mm, segments)
+        height = float(marker_heights.get(shape, marker_heights["o"]))
+        yield outlines, base, base + height
+
+    # 5) puntos Braille
+    for spec in braille_label_specs(params):
+        outlines = circle_outlines(spec["cx"], spec["cy"], spec["dot_diameter_mm"], segments)
+        yield outlines, base, base + spec["dot_height_mm"]
+
+def write_plate_mesh(params, writer, frame=None):
+    """Escribe en writer la placa y todos los relieves descritos por params."""
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    for outlines, z0, z1 in plate_prisms(params, frame):
+        # SVG (y hacia abajo) -> STL (y hacia arriba), misma escala en mm
+        outlines = outlines.copy()
+        outlines[..., 1] = fig_h_mm - outlines[..., 1]
+        write_prisms(writer, outlines, z0, z1)
+
+def default_stl_path(params):
+    return str(Path(params.get("output_svg", "output.svg")).with_suffix(".stl"))
+
+def render_stl(params, sink=None, frame=None):
+    """
+    STL binario de params en memoria: retorna los bytes, sin archivos intermedios ni prints.
+    Con sink (ruta u objeto binario con write) el resultado se copia allí.
+    """
+    buf = io.BytesIO()
+    with StlWriter(buf) as writer:
+        write_plate_mesh(params, writer, frame)
+    data = buf.getvalue()
+    if sink is not None:
+        write_sink(sink, data)
+    return data
+
+def build_stl_from_params(params, output_stl=None, frame=None):
+    """Genera el STL binario de params; retorna (ruta, número de triángulos)."""
+    output_stl = output_stl or params.get("output_stl") or default_stl_path(params)
+    with StlWriter(output_stl) as writer:
+        write_plate_mesh(params, writer, frame)
+    print(f"STL saved to: {output_stl} ({writer.count} triangles)")
+    return output_stl, writer.count
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un STL binario de la placa táctil desde params.json")
+    parser.add_argument("params", help="params.json")
+    parser.add_argument("-o", "--output", default=None, help="ruta del STL (por defecto output_stl o output_svg.stl)")
+    parser.add_argument("--engine", choices=("prisms", "heightfield"), default="prisms",
+                        help="prismas solapados (por defecto) o sólido estanco por mapa de alturas")
+    parser.add_argument("--resolution", type=float, default=None,
+                        help="lado del píxel del mapa de alturas en mm (solo --engine heightfield)")
+    args = parser.parse_args(argv)
+    params = load_params(args.params)
+    if args.engine == "heightfield":
+        # import diferido: heightfield_mesh importa este módulo
+        from heightfield_mesh import build_heightfield_stl
+        build_heightfield_stl(params, args.output, args.resolution)
+    else:
+        build_stl_from_params(params, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,14 +16,45 @@ Requisitos:
 
 Uso:
     python generate_svg_from_params.py params.json
+    python generate_svg_from_params.py --batch figuras/ "libro/**/*.json" --out-dir salida --workers 4
+    python generate_svg_from_params.py params.json --cache-dir .render_cache   # reutiliza capas sin cambios
+    python generate_svg_from_params.py params.json --dxf                       # SVG + DXF (sin Inkscape)
+    python generate_svg_from_params.py params.json --flatten                   # sin <use> (un elemento por punto)
+    python generate_svg_from_params.py params.json --stream                    # escritor en streaming (memoria plana)
+    python generate_svg_from_params.py params.json --viewbox                   # viewBox en mm, números sin unidad
+    python generate_svg_from_params.py params.json --merge-segments            # un <path> por estilo en Grid/Axes/Ticks
+    python generate_svg_from_params.py params.json --profile perfil.json       # tiempos/elementos/bytes por capa
+    python generate_svg_from_params.py params.json --watch                     # re-render incremental al guardar
+    python generate_svg_from_params.py --batch libro/ --check                  # sin render si falla tactile_check
+
+    # como biblioteca (notebook, servicio, lotes de variantes): bytes en memoria, sin disco ni prints
+    from generate_svg_from_params import render_svg
+    svg_bytes = render_svg(params)                    # o render_svg(params, sink="figura.svg")
 """
 
+import io
+import os
 import sys
+import glob
 import json
 import math
+import re
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import svgwrite
+from svgwrite.container import Defs
+from svgwrite.extensions import Inkscape
 from pathlib import Path
+import render_profile
+from render_cache import LayerCache, content_key
+from svg_stream import StreamingDrawing, TeeSink, XML_DECLARATION
+from render_profile import RenderProfile, ProfiledSink, aggregate_profiles
+from expression_engine import compile_expression
+from curve_sampling import adaptive_curve_pieces, uniform_curve_pieces, ADAPTIVE_TOLERANCE_MM
+from clipping import clip_polyline, clip_segment_arrays, points_inside
+from marker_placement import (place_markers_along_curves, MARKER_SPACING_MM,
+                              MARKER_OVERLAP_SPACING_MM, MARKER_CLEARANCE_MM)
 
 # -----------------------
 # UTILIDADES / BRAILLE
@@ -75,19 +106,140 @@ def text_to_cells(text):
 # GEOM → SVG helpers
 # -----------------------
 
+# Unidad de usuario SVG sin viewBox = px CSS (96 px por pulgada, 25.4 mm reales por pulgada).
+# Se usa para trayectos/polígonos, cuyos puntos no admiten sufijo "mm".
+PX_PER_MM = 96.0 / 25.4
+
 def data_to_svg_coords(x, y, xlim, ylim, width_mm, height_mm):
     """
     Mapea (x,y) en datos a coordenadas SVG en mm.
     Sistema de datos mapeado linealmente al rectángulo físico [0,width_mm]x[0,height_mm].
+    Acepta escalares o arrays NumPy (se transforman todos los puntos de una vez).
     """
     x0, x1 = xlim
     y0, y1 = ylim
-    fx = (x - x0) / (x1 - x0)
-    fy = (y - y0) / (y1 - y0)
-    sx = fx * width_mm
-    sy = (1 - fy) * height_mm
+    with render_profile.stage("transform"):
+        fx = (np.asarray(x, dtype=float) - x0) / (x1 - x0)
+        fy = (np.asarray(y, dtype=float) - y0) / (y1 - y0)
+        sx = fx * width_mm
+        sy = (1 - fy) * height_mm
     return sx, sy
 
+def format_numbers(values, precision=6, suffix=""):
+    """Formatea un array de números en una sola operación; devuelve lista de strings."""
+    values = np.asarray(values, dtype=float).ravel()
+    if values.size == 0:
+        return []
+    fmt = f"%.{precision}f{suffix}\n" * values.size
+    return (fmt % tuple(values.tolist())).split("\n")[:-1]
+
+def format_points(sx, sy, precision=4):
+    """Serializa arrays de coordenadas (en unidades de usuario) como 'x,y x,y ...'."""
+    pts = np.column_stack((np.ravel(sx), np.ravel(sy))).ravel()
+    if pts.size == 0:
+        return ""
+    fmt = f"%.{precision}f,%.{precision}f " * (pts.size // 2)
+    return (fmt % tuple(pts.tolist())).rstrip()
+
+def polyline_path_data(pieces, precision=4):
+    """Trayecto SVG 'M x,y x,y ... M x,y ...' (px de usuario): un subtrayecto por tramo (sx, sy) en mm."""
+    return " ".join("M" + format_points(sx * PX_PER_MM, sy * PX_PER_MM, precision)
+                    for sx, sy in pieces)
+
+# Ceros sobrantes tras el punto decimal ("12.50" -> "12.5", "3.00" -> "3")
+_TRAILING_ZEROS = re.compile(r"(\.\d*?[1-9])0+(?=[\n, ]|$)|\.0+(?=[\n, ]|$)")
+
+def compact_numbers(values, decimals=2):
+    """Como format_numbers pero sin unidad y sin ceros sobrantes (modo viewBox)."""
+    values = np.round(np.asarray(values, dtype=float).ravel(), decimals) + 0.0  # sin "-0"
+    if values.size == 0:
+        return []
+    text = (f"%.{decimals}f\n" * values.size) % tuple(values.tolist())
+    return _TRAILING_ZEROS.sub(lambda m: m.group(1) or "", text).split("\n")[:-1]
+
+def compact_points(sx, sy, decimals=2):
+    """Como format_points pero sin ceros sobrantes: 'x,y x,y ...' en mm de usuario."""
+    pts = compact_numbers(np.column_stack((np.ravel(sx), np.ravel(sy))).ravel(), decimals)
+    return " ".join(f"{x},{y}" for x, y in zip(pts[0::2], pts[1::2]))
+
+SVG_UNITS = ("mm", "viewbox")
+# Resolución por defecto del modo viewBox (mm): de sobra para relieve táctil
+SVG_PRECISION_MM = 0.01
+
+class SvgUnits:
+    """
+    Cómo se escriben coordenadas, longitudes y estilos.
+
+    svg_units="mm" (por defecto): cada valor lleva sufijo mm y trayectos/polígonos van
+    en px de usuario (PX_PER_MM), como siempre.
+    svg_units="viewbox": la raíz declara viewBox en mm (1 unidad de usuario = 1 mm, con
+    width/height físicos exactos, sin factores de calibración), los números van sin
+    unidad redondeados a svg_precision_mm y los estilos repetidos pasan al <g> de la capa.
+    """
+
+    def __init__(self, params):
+        self.viewbox = params.get("svg_units", "mm") == "viewbox"
+        precision_mm = float(params.get("svg_precision_mm", SVG_PRECISION_MM))
+        self.decimals = max(0, math.ceil(-math.log10(precision_mm) - 1e-9))
+
+    def coords(self, values, precision=6):
+        """Coordenadas en mm (array) como strings para atributos."""
+        if self.viewbox:
+            return compact_numbers(values, self.decimals)
+        return format_numbers(values, precision, suffix="mm")
+
+    def length(self, value, fmt="{}"):
+        """Un valor en mm: fmt.format(value) + "mm", o el número compacto sin unidad."""
+        if self.viewbox:
+            return compact_numbers([value], self.decimals)[0]
+        return fmt.format(value) + "mm"
+
+    def path_data(self, pieces):
+        if self.viewbox:
+            return " ".join("M" + compact_points(sx, sy, self.decimals) for sx, sy in pieces)
+        return polyline_path_data(pieces)
+
+    def segments_path_data(self, x1, y1, x2, y2):
+        """Segmentos sueltos (arrays de extremos en mm) como un solo trayecto 'Mx,y x,y M...'."""
+        n = len(x1)
+        if n == 0:
+            return ""
+        ends = np.column_stack((x1, y1, x2, y2)).ravel()
+        if self.viewbox:
+            return ("M%s,%s %s,%s " * n % tuple(compact_numbers(ends, self.decimals))).rstrip()
+        return ("M%.4f,%.4f %.4f,%.4f " * n % tuple((ends * PX_PER_MM).tolist())).rstrip()
+
+    def polygon_points(self, vx, vy):
+        """Vértices en mm -> lista de (x, y) en unidades de usuario."""
+        if self.viewbox:
+            return list(zip(*(np.round(v, self.decimals) + 0.0 for v in (vx, vy))))
+        return list(zip((vx * PX_PER_MM).tolist(), (vy * PX_PER_MM).tolist()))
+
+    def translate(self, ox, oy):
+        """translate() no admite unidades: px de usuario, o mm bajo el viewBox."""
+        if self.viewbox:
+            x, y = compact_numbers([ox, oy], self.decimals)
+            return f"translate({x},{y})"
+        return f"translate({ox * PX_PER_MM:.4f},{oy * PX_PER_MM:.4f})"
+
+    def dash(self, dash):
+        """Los patrones de svg_stroke_dash están en px: bajo el viewBox se pasan a mm."""
+        if not dash or not self.viewbox:
+            return dash
+        return ",".join(compact_numbers([float(v) / PX_PER_MM for v in dash.split(",")], self.decimals))
+
+    def layer_style(self, style):
+        """Estilo que va en el <g> de la capa (solo en modo viewBox)."""
+        return dict(style) if self.viewbox else {}
+
+    def element_style(self, style):
+        """Estilo que va en cada elemento (solo en modo mm, como siempre)."""
+        return {} if self.viewbox else dict(style)
+
+    def viewbox_value(self, width_mm, height_mm):
+        """Valor del atributo viewBox tal como lo escribe svgwrite."""
+        return f"0,0,{width_mm},{height_mm}"
+
 def svg_stroke_dash(style_name):
     if style_name == "solid": return None
     if style_name == "dash": return "6,3"
@@ -98,41 +250,79 @@ def svg_stroke_dash(style_name):
 # RENDER BRAILLE TO SVG
 # -----------------------
 
+# Fila de cada punto de la celda (0 arriba .. 2 abajo) y columna (0 izq, 1 der)
+DOT_ROW = {1:0, 2:1, 3:2, 4:0, 5:1, 6:2}
+DOT_COL = {1:0, 2:0, 3:0, 4:1, 5:1, 6:1}
+
+def dot_row_offset(row, dot_spacing_mm=2.5):
+    """Desplazamiento vertical en mm (y hacia abajo) de la fila row respecto al centro de la celda."""
+    # fila 0 (puntos 1 y 4) arriba: y SVG menor
+    return (row - 1) * dot_spacing_mm
+
+def cell_mask(cell):
+    """Celda (tupla de puntos 1..6) -> máscara de 6 bits (bit d-1 = punto d): 64 celdas posibles."""
+    mask = 0
+    for d in cell:
+        mask |= 1 << (d - 1)
+    return mask
+
+def cell_dot_offsets(mask, dot_spacing_mm=2.5):
+    """Centros (cx, cy) en mm de los puntos de la celda mask, relativos al origen de la celda."""
+    dots = [d for d in range(1, 7) if mask & (1 << (d - 1))]
+    cxs = [(DOT_COL[d] - 0.5) * dot_spacing_mm for d in dots]
+    cys = [dot_row_offset(DOT_ROW[d], dot_spacing_mm) for d in dots]
+    return cxs, cys
+
+def braille_cell_layout(text, char_spacing_mm=3.0, line_spacing_mm=4.0):
+    """Por celda no vacía de text: (máscara, x, y) del origen de la celda en mm, y hacia abajo."""
+    cells = []
+    cursor_y = 0.0
+    for line in text.split('\n'):
+        cursor_x = 0.0
+        for cell in text_to_cells(line):
+            mask = cell_mask(cell)
+            if mask:
+                cells.append((mask, cursor_x, cursor_y))
+            cursor_x += char_spacing_mm
+        cursor_y += line_spacing_mm
+    return cells
+
+def braille_dot_offsets(text, dot_spacing_mm=2.5, char_spacing_mm=3.0, line_spacing_mm=4.0):
+    """
+    Centros (cx, cy) en mm de todos los puntos de text, relativos al origen de la
+    etiqueta y con y hacia abajo (como en SVG). Retorna dos arrays NumPy.
+    """
+    cxs = []
+    cys = []
+    cursor_y = 0.0
+    for line in text.split('\n'):
+        cursor_x = 0.0
+        for cell in text_to_cells(line):
+            for d in cell:
+                cxs.append(cursor_x + (DOT_COL[d] - 0.5) * dot_spacing_mm)
+                cys.append(cursor_y + dot_row_offset(DOT_ROW[d], dot_spacing_mm))
+            cursor_x += char_spacing_mm
+        cursor_y += line_spacing_mm
+    return np.array(cxs, dtype=float), np.array(cys, dtype=float)
+
 def render_braille_to_group(dwg, text, origin_mm, dot_diameter_mm=1.5, dot_spacing_mm=2.5,
-                            char_spacing_mm=3.0, line_spacing_mm=4.0, fill_color="#000000"):
+                            char_spacing_mm=3.0, line_spacing_mm=4.0, fill_color="#000000", units=None):
     """
     Devuelve un grupo (svgwrite container) con los círculos que representan el Braille.
     origin_mm está en coordenadas centradas (-w/2..w/2, -h/2..h/2) y la función convertirá
     a coordenadas SVG en mm cuando lo insertemos.
     """
     g = dwg.g()
-    ox, oy = origin_mm
     # NOTE: caller must translate el grupo a coordenadas svg adecuadas (alternativa: calcular en caller)
     # Aquí dibujamos en coordenadas relativas: (0,0) corresponde al origin_mm en el sistema centrado.
-    lines = text.split('\n')
-    cursor_y = 0.0
-    for line in lines:
-        cells = text_to_cells(line)
-        cursor_x = 0.0
-        for cell in cells:
-            if cell == SPACE:
-                cursor_x += char_spacing_mm
-                continue
-            for d in cell:
-                # map dot index -> offset
-                col = 0 if d in (1,2,3) else 1
-                row_map = {1:0,2:1,3:2,4:0,5:1,6:2}
-                row = row_map[d]
-                x_offset = (col - 0.5) * dot_spacing_mm
-                y_offset = (1 - row) * dot_spacing_mm  # row0 top, row2 bottom
-                cx = cursor_x + x_offset
-                cy = cursor_y + y_offset
-                # circle center at (cx, cy) in mm relative to origin
-                g.add(dwg.circle(center=(f"{cx}mm", f"{cy}mm"),
-                                 r=f"{dot_diameter_mm/2.0:.3f}mm",
-                                 fill=fill_color, stroke="none"))
-            cursor_x += char_spacing_mm
-        cursor_y += line_spacing_mm
+    cxs, cys = braille_dot_offsets(text, dot_spacing_mm, char_spacing_mm, line_spacing_mm)
+    render_profile.count(points=len(cxs))
+    units = units or SvgUnits({})
+    r = units.length(dot_diameter_mm/2.0, "{:.3f}")
+    style = units.element_style({"fill": fill_color, "stroke": "none"})
+    for cx, cy in zip(cxs.tolist(), cys.tolist()):
+        # circle center at (cx, cy) in mm relative to origin
+        g.add(dwg.circle(center=(units.length(cx), units.length(cy)), r=r, **style))
     # The group is drawn centered at (0,0) — caller should transform/translate to absolute svg coords.
     return g
 
@@ -141,7 +331,10 @@ def render_braille_to_group(dwg, text, origin_mm, dot_diameter_mm=1.5, dot_spaci
 # -----------------------
 
 def make_default_marker_xs(xlim):
-    """Muestreo adaptativo por defecto (similar al que usabas). Devuelve lista por función."""
+    """
+    Tablas hechas a mano para x, x², x³ en [-7, 7] (marker_xs="adaptive_default").
+    Se conservan para reproducir figuras antiguas; el modo por defecto es "auto".
+    """
     xs1 = np.linspace(xlim[0], xlim[1], 35)
     xs2 = np.concatenate([
         np.linspace(xlim[0], -3.0, 1),
@@ -170,191 +363,978 @@ def load_params(path):
     with p.open("r", encoding="utf8") as fh:
         return json.load(fh)
 
-def build_svg_from_params(params):
-    # read common params
+class ParamsError(ValueError):
+    """params.json con valores fuera del esquema esperado."""
+
+MARKER_SHAPES = ("o", "s", "^")
+CURVE_STYLES = ("solid", "dash", "dot")
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def _check_pair(params, key, increasing=False, positive=False):
+    value = params.get(key)
+    if value is None:
+        return
+    if not (isinstance(value, (list, tuple)) and len(value) == 2 and all(_is_number(v) for v in value)):
+        raise ParamsError(f"{key} debe ser una lista de 2 números, no {value!r}")
+    if increasing and not value[0] < value[1]:
+        raise ParamsError(f"{key} debe ser creciente, no {value!r}")
+    if positive and not (value[0] > 0 and value[1] > 0):
+        raise ParamsError(f"{key} debe ser positivo, no {value!r}")
+
+def _check_number(params, key, minimum=0.0, strict=False):
+    value = params.get(key)
+    if value is None:
+        return
+    if not _is_number(value) or value < minimum or (strict and value == minimum):
+        bound = ">" if strict else ">="
+        raise ParamsError(f"{key} debe ser un número {bound} {minimum}, no {value!r}")
+
+def _check_choices(values, key, choices):
+    for v in values:
+        if v not in choices:
+            raise ParamsError(f"{key}: valor {v!r} no admitido (opciones: {', '.join(choices)})")
+
+def validate_params(params):
+    """
+    Comprueba de una vez el esquema de params (tipos, rangos, opciones y expresiones).
+    Lo usa el escritor en streaming, que no valida atributo por atributo como svgwrite.
+    Lanza ParamsError (o ExpressionError) con el primer problema encontrado.
+    """
+    _check_pair(params, "fig_size_mm", positive=True)
+    _check_pair(params, "xlim", increasing=True)
+    _check_pair(params, "ylim", increasing=True)
+    _check_number(params, "tick_step", strict=True)
+    for key in ("grid_stroke_mm", "axis_stroke_mm", "curve_stroke_mm", "marker_edge_stroke_mm"):
+        _check_number(params, key)
+    functions = params.get("functions", ["x"])
+    if not isinstance(functions, list) or not all(isinstance(f, str) for f in functions):
+        raise ParamsError(f"functions debe ser una lista de strings, no {functions!r}")
+    build_functions(params)
+    _check_choices(params.get("marker_shapes", []), "marker_shapes", MARKER_SHAPES)
+    _check_choices(params.get("curve_styles", []), "curve_styles", CURVE_STYLES)
+    for size in params.get("marker_sizes_mm", []):
+        if not _is_number(size) or size <= 0:
+            raise ParamsError(f"marker_sizes_mm: tamaño inválido {size!r}")
+    _check_choices([params.get("curve_sampling", "adaptive")], "curve_sampling", ("adaptive", "uniform"))
+    marker_xs = params.get("marker_xs", "auto")
+    if not (marker_xs in ("auto", "adaptive_default") or (
+            isinstance(marker_xs, list)
+            and all(isinstance(xs, list) and all(_is_number(x) for x in xs) for xs in marker_xs))):
+        raise ParamsError(f'marker_xs debe ser "auto", "adaptive_default" o una lista de listas de números, '
+                          f'no {marker_xs!r}')
+    _check_choices([params.get("svg_instancing", "use")], "svg_instancing", ("use", "flatten"))
+    _check_choices([params.get("svg_writer", "svgwrite")], "svg_writer", ("svgwrite", "stream"))
+    _check_choices([params.get("svg_units", "mm")], "svg_units", SVG_UNITS)
+    if not isinstance(params.get("merge_segments", False), bool):
+        raise ParamsError(f"merge_segments debe ser true o false, no {params['merge_segments']!r}")
+    _check_number(params, "svg_precision_mm", strict=True)
+    for lbl in params.get("braille_labels", []):
+        if not isinstance(lbl, dict) or not isinstance(lbl.get("text", ""), str):
+            raise ParamsError(f"braille_labels: etiqueta inválida {lbl!r}")
+        _check_pair(lbl, "position_mm")
+        for key in ("dot_diameter_mm", "dot_spacing_mm", "char_spacing_mm", "line_spacing_mm"):
+            _check_number(lbl, key, strict=True)
+
+# -----------------------
+# GEOMETRÍA EN mm DE PLACA (compartida por los backends SVG / STL)
+# -----------------------
+# Todas las funciones devuelven arrays NumPy en mm con origen arriba-izquierda e y hacia
+# abajo (convención SVG). Los backends solo serializan estos arrays, ya recortados al
+# rectángulo de la placa (ver clipping): nada de lo que se emite cae fuera de ella.
+
+def plot_frame(params):
+    """Parámetros geométricos comunes a todas las capas: (ancho, alto, xlim, ylim, tick_step)."""
     fig_w_mm, fig_h_mm = params.get("fig_size_mm", [173.0, 113.0])
     xlim = tuple(params.get("xlim", [-7.0, 7.0]))
     ylim = tuple(params.get("ylim", [-7.0, 7.0]))
     tick_step = params.get("tick_step", 0.5)
-    output_svg = params.get("output_svg", "output.svg")
+    return fig_w_mm, fig_h_mm, xlim, ylim, tick_step
 
-    # create svgwrite drawing with physical mm size
-    dwg = svgwrite.Drawing(filename=output_svg, size=(f"{fig_w_mm}mm", f"{fig_h_mm}mm"), profile='tiny')
+def plate_rect(params):
+    """Rectángulo de recorte (xmin, ymin, xmax, ymax) en mm: la placa completa."""
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    return (0.0, 0.0, float(fig_w_mm), float(fig_h_mm))
 
-    # layers (groups) with inkscape-compatible attributes
-    # we will add groups and then fill them
-    inkscape_extra = {"inkscape:groupmode": "layer"}  # note: svgwrite won't add namespace by default but inkscape reads the attributes
-
-    # 1) plate (background)
-    plate = dwg.g(id="plate", **{"inkscape:groupmode":"layer", "inkscape:label":"Plate"})
-    plate.add(dwg.rect(insert=(0,0), size=(f"{fig_w_mm}mm", f"{fig_h_mm}mm"), fill="#ffffff"))
-    dwg.add(plate)
+def build_functions(params):
+    """
+    Callables vectorizados para los strings de params["functions"]. Cada expresión
+    se valida y compila una sola vez por proceso (ver expression_engine).
+    """
+    return [compile_expression(str(expr)) for expr in params.get("functions", ["x"])]
 
-    # 2) grid
-    layer_grid = dwg.g(id="grid", **{"inkscape:groupmode":"layer", "inkscape:label":"Grid"})
-    grid_stroke_mm = params.get("grid_stroke_mm", 0.25)
+def tick_values(params):
+    """Valores de dato de las divisiones en x e y."""
+    _, _, xlim, ylim, tick_step = plot_frame(params)
     xticks = np.arange(xlim[0], xlim[1] + 1e-9, tick_step)
     yticks = np.arange(ylim[0], ylim[1] + 1e-9, tick_step)
-    for xv in xticks:
-        sx1, sy1 = data_to_svg_coords(xv, ylim[0], xlim, ylim, fig_w_mm, fig_h_mm)
-        sx2, sy2 = data_to_svg_coords(xv, ylim[1], xlim, ylim, fig_w_mm, fig_h_mm)
-        layer_grid.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                                stroke="#e6e6e6", stroke_width=f"{grid_stroke_mm}mm"))
-    for yv in yticks:
-        sx1, sy1 = data_to_svg_coords(xlim[0], yv, xlim, ylim, fig_w_mm, fig_h_mm)
-        sx2, sy2 = data_to_svg_coords(xlim[1], yv, xlim, ylim, fig_w_mm, fig_h_mm)
-        layer_grid.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                                stroke="#f5f5f5", stroke_width=f"{grid_stroke_mm}mm"))
-    dwg.add(layer_grid)
-
-    # 3) axes
-    layer_axes = dwg.g(id="axes", **{"inkscape:groupmode":"layer", "inkscape:label":"Axes"})
-    axis_stroke_mm = params.get("axis_stroke_mm", 0.6)
-    sx1, sy1 = data_to_svg_coords(xlim[0], 0.0, xlim, ylim, fig_w_mm, fig_h_mm)
-    sx2, sy2 = data_to_svg_coords(xlim[1], 0.0, xlim, ylim, fig_w_mm, fig_h_mm)
-    layer_axes.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                            stroke="#000000", stroke_width=f"{axis_stroke_mm}mm"))
-    sx1, sy1 = data_to_svg_coords(0.0, ylim[0], xlim, ylim, fig_w_mm, fig_h_mm)
-    sx2, sy2 = data_to_svg_coords(0.0, ylim[1], xlim, ylim, fig_w_mm, fig_h_mm)
-    layer_axes.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                            stroke="#000000", stroke_width=f"{axis_stroke_mm}mm"))
-    dwg.add(layer_axes)
-
-    # 4) curves
-    layer_curves = dwg.g(id="curves", **{"inkscape:groupmode":"layer", "inkscape:label":"Curves"})
-    funcs_expr = params.get("functions", ["x"])
-    curve_styles = params.get("curve_styles", ["solid"]*len(funcs_expr))
+    return xticks, yticks
+
+def _segments(x1, y1, x2, y2):
+    """Normaliza extremos (escalares o arrays) a cuatro arrays de la misma longitud."""
+    return tuple(np.array(a, dtype=float) for a in np.broadcast_arrays(x1, y1, x2, y2))
+
+def _clipped_segments(params, x1, y1, x2, y2):
+    """Como _segments, pero recortados a la placa y sin los que quedan fuera."""
+    return clip_segment_arrays(*_segments(x1, y1, x2, y2), plate_rect(params))
+
+def grid_segments(params):
+    """Rejilla: (verticales, horizontales), cada una como (x1, y1, x2, y2)."""
+    fig_w_mm, fig_h_mm, xlim, ylim, _ = plot_frame(params)
+    xticks, yticks = tick_values(params)
+    # verticales (x constante) y horizontales (y constante), transformadas en bloque
+    gx1, gy1 = data_to_svg_coords(xticks, ylim[0], xlim, ylim, fig_w_mm, fig_h_mm)
+    gx2, gy2 = data_to_svg_coords(xticks, ylim[1], xlim, ylim, fig_w_mm, fig_h_mm)
+    vertical = _clipped_segments(params, gx1, gy1, gx2, gy2)
+    gx1, gy1 = data_to_svg_coords(xlim[0], yticks, xlim, ylim, fig_w_mm, fig_h_mm)
+    gx2, gy2 = data_to_svg_coords(xlim[1], yticks, xlim, ylim, fig_w_mm, fig_h_mm)
+    horizontal = _clipped_segments(params, gx1, gy1, gx2, gy2)
+    return vertical, horizontal
+
+def axes_segments(params):
+    """Ejes x e y (por el 0 de datos) como (x1, y1, x2, y2); sin el eje si el 0 cae fuera."""
+    fig_w_mm, fig_h_mm, xlim, ylim, _ = plot_frame(params)
+    sx1, sy1 = data_to_svg_coords([xlim[0], 0.0], [0.0, ylim[0]], xlim, ylim, fig_w_mm, fig_h_mm)
+    sx2, sy2 = data_to_svg_coords([xlim[1], 0.0], [0.0, ylim[1]], xlim, ylim, fig_w_mm, fig_h_mm)
+    return _clipped_segments(params, sx1, sy1, sx2, sy2)
+
+def tick_segments(params):
+    """Marcas sobre los ejes: primero las del eje y, luego las del eje x."""
+    fig_w_mm, fig_h_mm, xlim, ylim, _ = plot_frame(params)
+    xticks, yticks = tick_values(params)
+    tx1, ty1 = data_to_svg_coords(0.12, yticks, xlim, ylim, fig_w_mm, fig_h_mm)
+    tx2, ty2 = data_to_svg_coords(-0.12, yticks, xlim, ylim, fig_w_mm, fig_h_mm)
+    on_y = _clipped_segments(params, tx1, ty1, tx2, ty2)
+    tx1, ty1 = data_to_svg_coords(xticks, 0.12, xlim, ylim, fig_w_mm, fig_h_mm)
+    tx2, ty2 = data_to_svg_coords(xticks, -0.12, xlim, ylim, fig_w_mm, fig_h_mm)
+    on_x = _clipped_segments(params, tx1, ty1, tx2, ty2)
+    return tuple(np.concatenate([a, b]) for a, b in zip(on_y, on_x))
+
+# Claves de las que depende la geometría base (rejilla, ejes y marcas)
+FRAME_GEOMETRY_KEYS = ("fig_size_mm", "xlim", "ylim", "tick_step")
+
+class FrameGeometry:
+    """
+    Geometría base de una placa: rejilla, ejes y marcas en mm, tal como la dan
+    grid_segments, axes_segments y tick_segments. Es la misma en todas las figuras
+    con el mismo marco, así que un build de libro la calcula una vez (por key) y
+    la pasa a los backends DXF y STL.
+    """
+
+    def __init__(self, params):
+        self.key = content_key({k: params.get(k) for k in FRAME_GEOMETRY_KEYS})
+        self.grid = grid_segments(params)
+        self.axes = axes_segments(params)
+        self.ticks = tick_segments(params)
+
+def curve_polylines(params, funcs=None):
+    """
+    Por función, lista de tramos (sx, sy) en mm. Con curve_sampling="adaptive" (por
+    defecto) se refina según curve_tolerance_mm y se corta en polos/valores no finitos;
+    con "uniform" se usan n_curve_samples puntos equiespaciados. Los tramos se recortan
+    a la placa con las intersecciones exactas en el borde (x**3 no deja puntos a metros).
+    """
+    fig_w_mm, fig_h_mm, xlim, ylim, _ = plot_frame(params)
+    funcs = build_functions(params) if funcs is None else funcs
+    mode = params.get("curve_sampling", "adaptive")
+    tolerance_mm = float(params.get("curve_tolerance_mm", ADAPTIVE_TOLERANCE_MM))
     n_samples = params.get("n_curve_samples", 800)
 
-    # build callable functions from strings (evaluated safely with numpy)
-    funcs = []
-    for expr in funcs_expr:
-        expr_str = str(expr)
-        def make_func(expression):
-            def f(x):
-                return eval(expression, {"np": np, "x": x, "__builtins__": {}})
-            return f
-        funcs.append(make_func(expr_str))
-
-    x_cont = np.linspace(xlim[0], xlim[1], n_samples)
-    curve_stroke_mm = params.get("curve_stroke_mm", 0.9)
-    for i, f in enumerate(funcs):
-        ys = f(x_cont)
-        pts_svg = [ data_to_svg_coords(xv, yv, xlim, ylim, fig_w_mm, fig_h_mm) for xv, yv in zip(x_cont, ys) ]
-        pts_str = [ (f"{px:.6f}mm", f"{py:.6f}mm") for px,py in pts_svg ]
-        dash = svg_stroke_dash(curve_styles[i] if i < len(curve_styles) else "solid")
-        stroke_kwargs = {"stroke":"#222222", "fill":"none", "stroke_width":f"{curve_stroke_mm}mm"}
-        if dash:
-            stroke_kwargs["stroke_dasharray"] = dash
-        layer_curves.add(dwg.polyline(points=[(x,y) for x,y in pts_str], **stroke_kwargs))
-    dwg.add(layer_curves)
+    def to_svg(xs, ys):
+        return data_to_svg_coords(xs, ys, xlim, ylim, fig_w_mm, fig_h_mm)
 
-    # 5) markers
-    layer_markers = dwg.g(id="markers", **{"inkscape:groupmode":"layer", "inkscape:label":"Markers"})
+    rect = plate_rect(params)
+    polylines = []
+    for f in funcs:
+        if mode == "uniform":
+            pieces = uniform_curve_pieces(f, xlim, to_svg, n_samples)
+        else:
+            pieces = adaptive_curve_pieces(f, xlim, to_svg, fig_w_mm, fig_h_mm,
+                                           tolerance_mm=tolerance_mm)
+        polylines.append([clipped for sx, sy in pieces for clipped in clip_polyline(sx, sy, rect)])
+    return polylines
+
+def resolve_marker_xs(params):
+    """marker_xs: either "adaptive_default" or explicit list."""
+    _, _, xlim, _, _ = plot_frame(params)
+    marker_xs_param = params.get("marker_xs", "auto")
+    if marker_xs_param == "adaptive_default":
+        return make_default_marker_xs(xlim)
+    # expect a list of lists in params
+    return marker_xs_param
+
+def marker_positions(params, funcs=None):
+    """
+    Por función: (sx, sy, forma, tamaño_mm) con los centros de sus marcadores en mm.
+    marker_xs="auto" (por defecto) los reparte por longitud de arco sobre la curva
+    (ver marker_placement); "adaptive_default" o una lista de listas de x los fija a mano.
+    """
+    fig_w_mm, fig_h_mm, xlim, ylim, _ = plot_frame(params)
+    funcs = build_functions(params) if funcs is None else funcs
     marker_shapes = params.get("marker_shapes", ["o"])
     marker_sizes = params.get("marker_sizes_mm", [3.0])
-    # marker_xs: either "adaptive_default" or explicit list
-    marker_xs_param = params.get("marker_xs", "adaptive_default")
-    if marker_xs_param == "adaptive_default":
-        marker_xs = make_default_marker_xs(xlim)
-    else:
-        # expect a list of lists in params
-        marker_xs = marker_xs_param
+    shapes = [marker_shapes[i] if i < len(marker_shapes) else "o" for i in range(len(funcs))]
+    sizes = [marker_sizes[i] if i < len(marker_sizes) else 3.0 for i in range(len(funcs))]
 
-    marker_edge_stroke_mm = params.get("marker_edge_stroke_mm", 0.2)
+    if params.get("marker_xs", "auto") == "auto":
+        placed = place_markers_along_curves(
+            curve_polylines(params, funcs), sizes, fig_w_mm, fig_h_mm,
+            spacing_mm=float(params.get("marker_spacing_mm", MARKER_SPACING_MM)),
+            overlap_spacing_mm=float(params.get("marker_overlap_spacing_mm", MARKER_OVERLAP_SPACING_MM)),
+            clearance_mm=float(params.get("marker_clearance_mm", MARKER_CLEARANCE_MM)))
+        return [(sx, sy, shape, size_mm) for (sx, sy), shape, size_mm in zip(placed, shapes, sizes)]
+
+    marker_xs = resolve_marker_xs(params)
+    markers = []
     for i, f in enumerate(funcs):
-        xs = np.array(marker_xs[i]) if i < len(marker_xs) else np.array([])
-        ys = f(xs) if xs.size else np.array([])
-        shape = marker_shapes[i] if i < len(marker_shapes) else "o"
-        size_mm = marker_sizes[i] if i < len(marker_sizes) else 3.0
-        for xm, ym in zip(xs, ys):
-            sx, sy = data_to_svg_coords(float(xm), float(ym), xlim, ylim, fig_w_mm, fig_h_mm)
-            if shape == 'o':
-                layer_markers.add(dwg.circle(center=(f"{sx}mm", f"{sy}mm"),
-                                             r=f"{(size_mm/2.0):.3f}mm",
-                                             fill="#ffffff", stroke="#000000",
-                                             stroke_width=f"{marker_edge_stroke_mm}mm"))
-            elif shape == 's':
-                half = size_mm/2.0
-                x0 = sx - half
-                y0 = sy - half
-                layer_markers.add(dwg.rect(insert=(f"{x0}mm", f"{y0}mm"),
-                                           size=(f"{size_mm}mm", f"{size_mm}mm"),
-                                           fill="#ffffff", stroke="#000000",
-                                           stroke_width=f"{marker_edge_stroke_mm}mm"))
-            elif shape == '^':
-                a = size_mm
-                h = (math.sqrt(3)/2.0) * a
-                v1 = (sx, sy - 2*h/3.0)
-                v2 = (sx - a/2.0, sy + h/3.0)
-                v3 = (sx + a/2.0, sy + h/3.0)
-                layer_markers.add(dwg.polygon(points=[(f"{v1[0]}mm", f"{v1[1]}mm"),
-                                                      (f"{v2[0]}mm", f"{v2[1]}mm"),
-                                                      (f"{v3[0]}mm", f"{v3[1]}mm")],
-                                              fill="#ffffff", stroke="#000000", stroke_width=f"{marker_edge_stroke_mm}mm"))
-            else:
-                layer_markers.add(dwg.circle(center=(f"{sx}mm", f"{sy}mm"),
-                                             r=f"{(size_mm/2.0):.3f}mm",
-                                             fill="#ffffff", stroke="#000000",
-                                             stroke_width=f"{marker_edge_stroke_mm}mm"))
-    dwg.add(layer_markers)
-
-    # 6) ticks (small axis marks)
-    layer_ticks = dwg.g(id="ticks", **{"inkscape:groupmode":"layer", "inkscape:label":"Ticks"})
-    tick_len_mm = 0.8
-    for yv in yticks:
-        sx1, sy1 = data_to_svg_coords(0.12, yv, xlim, ylim, fig_w_mm, fig_h_mm)
-        sx2, sy2 = data_to_svg_coords(-0.12, yv, xlim, ylim, fig_w_mm, fig_h_mm)
-        layer_ticks.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                                 stroke="#000000", stroke_width=f"{axis_stroke_mm}mm"))
-    for xv in xticks:
-        sx1, sy1 = data_to_svg_coords(xv, 0.12, xlim, ylim, fig_w_mm, fig_h_mm)
-        sx2, sy2 = data_to_svg_coords(xv, -0.12, xlim, ylim, fig_w_mm, fig_h_mm)
-        layer_ticks.add(dwg.line(start=(f"{sx1}mm", f"{sy1}mm"), end=(f"{sx2}mm", f"{sy2}mm"),
-                                 stroke="#000000", stroke_width=f"{axis_stroke_mm}mm"))
-    dwg.add(layer_ticks)
-
-    # 7) braille labels: each label as sub-group (translated to absolute svg coords)
-    layer_braille = dwg.g(id="braille", **{"inkscape:groupmode":"layer", "inkscape:label":"Braille"})
+        xs = np.asarray(marker_xs[i], dtype=float) if i < len(marker_xs) else np.array([])
+        ys = np.broadcast_to(f(xs), xs.shape) if xs.size else np.array([])
+        sx, sy = data_to_svg_coords(xs, ys, xlim, ylim, fig_w_mm, fig_h_mm)
+        # sin marcadores en polos, fuera del dominio (1/x en 0, log de negativos...) ni
+        # fuera de la placa: solo los que caben enteros
+        keep = points_inside(sx, sy, plate_rect(params), sizes[i] / 2.0)
+        markers.append((sx[keep], sy[keep], shapes[i], sizes[i]))
+    return markers
+
+def braille_label_specs(params):
+    """
+    Por etiqueta: dict con texto, origen absoluto en mm (ox, oy), parámetros de
+    punto y centros absolutos de los puntos (cx, cy).
+    """
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    specs = []
     for lbl in params.get("braille_labels", []):
         text = lbl.get("text", "")
         pos = lbl.get("position_mm", [0.0, 0.0])  # coordenadas centradas (-w/2..w/2)
-        d_diam = float(lbl.get("dot_diameter_mm", 1.5))
-        d_sp = float(lbl.get("dot_spacing_mm", 2.5))
-        c_sp = float(lbl.get("char_spacing_mm", 3.0))
-        l_sp = float(lbl.get("line_spacing_mm", 4.0))
+        spec = {
+            "text": text,
+            # origin centered (-w/2..w/2) -> svg coord (y invertida)
+            "ox": pos[0] + fig_w_mm / 2.0,
+            "oy": fig_h_mm / 2.0 - pos[1],
+            "dot_diameter_mm": float(lbl.get("dot_diameter_mm", 1.5)),
+            "dot_height_mm": float(lbl.get("dot_height_mm", 0.8)),
+            "dot_spacing_mm": float(lbl.get("dot_spacing_mm", 2.5)),
+            "char_spacing_mm": float(lbl.get("char_spacing_mm", 3.0)),
+            "line_spacing_mm": float(lbl.get("line_spacing_mm", 4.0)),
+        }
+        dx, dy = braille_dot_offsets(text, spec["dot_spacing_mm"], spec["char_spacing_mm"],
+                                     spec["line_spacing_mm"])
+        spec["cx"] = dx + spec["ox"]
+        spec["cy"] = dy + spec["oy"]
+        specs.append(spec)
+    return specs
+
+# -----------------------
+# SVG helpers
+# -----------------------
+
+def add_segment_lines(dwg, group, sx1, sy1, sx2, sy2, units=None, **style):
+    """Añade al grupo un <line> por segmento a partir de arrays de extremos en mm."""
+    units = units or SvgUnits({})
+    x1s = units.coords(sx1)
+    y1s = units.coords(sy1)
+    x2s = units.coords(sx2)
+    y2s = units.coords(sy2)
+    render_profile.count(points=2 * len(x1s))
+    for a, b, c, d in zip(x1s, y1s, x2s, y2s):
+        group.add(dwg.line(start=(a, b), end=(c, d), **style))
+
+def merge_segments(params):
+    """True si los segmentos de un mismo estilo (Grid, Axes, Ticks) van en un solo <path> (merge_segments)."""
+    return bool(params.get("merge_segments", False))
+
+def add_segments(dwg, group, sx1, sy1, sx2, sy2, units=None, merge=False, **style):
+    """
+    Segmentos de un mismo estilo: un <line> por segmento o, con merge, un único <path>
+    con un subtrayecto 'M x1,y1 x2,y2' por segmento (mismo dibujo, un solo elemento).
+    """
+    if not merge:
+        add_segment_lines(dwg, group, sx1, sy1, sx2, sy2, units=units, **style)
+        return
+    units = units or SvgUnits({})
+    if len(sx1) == 0:
+        return
+    render_profile.count(points=2 * len(sx1))
+    group.add(dwg.path(d=units.segments_path_data(sx1, sy1, sx2, sy2), fill="none", **style))
+
+def make_layer(dwg, layer_id, label, **style):
+    """
+    Grupo <g> marcado como capa de Inkscape, con estilo opcional heredado por sus hijos
+    (en streaming, la capa de primer nivel escribe directo).
+    """
+    if isinstance(dwg, StreamingDrawing) and dwg.layer_sink is not None:
+        sink, dwg.layer_sink = dwg.layer_sink, None
+        return dwg.open_layer(sink, layer_id, label, **style)
+    return dwg.g(id=layer_id, **{"inkscape:groupmode":"layer", "inkscape:label":label}, **style)
+
+def new_defs(dwg):
+    """<defs> local a una capa, para svgwrite o para el escritor en streaming."""
+    return dwg.defs() if isinstance(dwg, StreamingDrawing) else Defs()
+
+def use_instancing(params):
+    """True si las capas repetitivas se emiten como <defs> + <use> (svg_instancing="use", por defecto)."""
+    return params.get("svg_instancing", "use") != "flatten"
+
+def def_id(*parts):
+    """
+    Id XML estable para un símbolo de <defs> (sin puntos ni signos). El punto decimal
+    pasa a "p" y el signo a "m" dentro de cada parte, así "_" solo separa partes y
+    parámetros distintos no pueden dar el mismo id (1.5, 2 -> 1p5_2; 1, 5.2 -> 1_5p2).
+    """
+    return "_".join((f"{p:g}" if isinstance(p, float) else str(p)).replace(".", "p").replace("-", "m")
+                    for p in parts)
+
+def add_uses(dwg, group, href, sx, sy, units=None):
+    """Un <use> de href por posición (arrays en mm)."""
+    units = units or SvgUnits({})
+    for x, y in zip(units.coords(sx), units.coords(sy)):
+        group.add(dwg.use(href, insert=(x, y)))
+
+# -----------------------
+# CAPAS (una función por capa; cada una devuelve su grupo)
+# -----------------------
+
+def triangle_vertices(sx, sy, size_mm):
+    """Vértices (arriba, abajo-izq, abajo-der) de triángulos equiláteros centrados en (sx, sy)."""
+    a = size_mm
+    h = (math.sqrt(3)/2.0) * a
+    vx = np.column_stack((sx, sx - a/2.0, sx + a/2.0))
+    vy = np.column_stack((sy - 2*h/3.0, sy + h/3.0, sy + h/3.0))
+    return vx, vy
+
+def build_plate_layer(dwg, params):
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    units = SvgUnits(params)
+    plate = make_layer(dwg, "plate", "Plate")
+    plate.add(dwg.rect(insert=(0,0), size=(units.length(fig_w_mm), units.length(fig_h_mm)), fill="#ffffff"))
+    return plate
+
+def build_grid_layer(dwg, params):
+    units = SvgUnits(params)
+    grid_stroke_mm = params.get("grid_stroke_mm", 0.25)
+    width = {"stroke_width": units.length(grid_stroke_mm)}
+    layer_grid = make_layer(dwg, "grid", "Grid", **units.layer_style(width))
+    vertical, horizontal = grid_segments(params)
+    merge = merge_segments(params)
+    for segments, color in ((vertical, "#e6e6e6"), (horizontal, "#f5f5f5")):
+        if merge:
+            # un <path> por color con todas sus líneas
+            add_segments(dwg, layer_grid, *segments, units=units, merge=True, stroke=color,
+                         **units.element_style(width))
+        elif units.viewbox:
+            # un sub-grupo por color; las líneas solo llevan coordenadas
+            group = dwg.g(stroke=color)
+            add_segment_lines(dwg, group, *segments, units=units)
+            layer_grid.add(group)
+        else:
+            add_segment_lines(dwg, layer_grid, *segments, units=units, stroke=color, **width)
+    return layer_grid
+
+def build_axes_layer(dwg, params):
+    units = SvgUnits(params)
+    axis_stroke_mm = params.get("axis_stroke_mm", 0.6)
+    style = {"stroke": "#000000", "stroke_width": units.length(axis_stroke_mm)}
+    layer_axes = make_layer(dwg, "axes", "Axes", **units.layer_style(style))
+    if merge_segments(params):
+        add_segments(dwg, layer_axes, *axes_segments(params), units=units, merge=True,
+                     **units.element_style(style))
+        return layer_axes
+    for sx1, sy1, sx2, sy2 in zip(*(a.tolist() for a in axes_segments(params))):
+        render_profile.count(points=2)
+        layer_axes.add(dwg.line(start=(units.length(sx1), units.length(sy1)),
+                                end=(units.length(sx2), units.length(sy2)), **units.element_style(style)))
+    return layer_axes
+
+def build_curves_layer(dwg, params):
+    units = SvgUnits(params)
+    curve_styles = params.get("curve_styles", ["solid"]*len(params.get("functions", ["x"])))
+    curve_stroke_mm = params.get("curve_stroke_mm", 0.9)
+    style = {"stroke":"#222222", "fill":"none", "stroke_width":units.length(curve_stroke_mm)}
+    layer_curves = make_layer(dwg, "curves", "Curves", **units.layer_style(style))
+    for i, pieces in enumerate(curve_polylines(params)):
+        if not pieces:
+            continue
+        # un único <path> por función (un subtrayecto por tramo), serializado desde los arrays
+        dash = units.dash(svg_stroke_dash(curve_styles[i] if i < len(curve_styles) else "solid"))
+        stroke_kwargs = units.element_style(style)
+        if dash:
+            stroke_kwargs["stroke_dasharray"] = dash
+        render_profile.count(points=sum(len(sx) for sx, _ in pieces))
+        layer_curves.add(dwg.path(d=units.path_data(pieces), **stroke_kwargs))
+    return layer_curves
+
+MARKER_SHAPE_NAMES = {'s': "square", '^': "triangle", 'o': "circle"}
+
+def marker_element(dwg, shape, size_mm, style, units=None):
+    """Marcador de forma/tamaño dados centrado en el origen (símbolo para <defs>)."""
+    units = units or SvgUnits({})
+    if shape == 's':
+        half = units.length(-size_mm/2.0)
+        return dwg.rect(insert=(half, half), size=(units.length(size_mm), units.length(size_mm)), **style)
+    if shape == '^':
+        vx, vy = triangle_vertices(np.zeros(1), np.zeros(1), size_mm)
+        return dwg.polygon(points=units.polygon_points(vx[0], vy[0]), **style)
+    return dwg.circle(center=(0, 0), r=units.length(size_mm/2.0, "{:.3f}"), **style)
+
+def build_markers_layer(dwg, params):
+    units = SvgUnits(params)
+    marker_edge_stroke_mm = params.get("marker_edge_stroke_mm", 0.2)
+    style = {"fill":"#ffffff", "stroke":"#000000",
+             "stroke_width":units.length(marker_edge_stroke_mm)}
+    layer_markers = make_layer(dwg, "markers", "Markers", **units.layer_style(style))
+    marker_style = units.element_style(style)
+    markers = marker_positions(params)
+    render_profile.count(points=sum(len(sx) for sx, _, _, _ in markers))
+    if use_instancing(params):
+        # cada forma/tamaño una sola vez en <defs>; los marcadores son <use> con su centro.
+        # <defs> se completa antes de añadirlo (el escritor en streaming serializa al añadir)
+        defs = new_defs(dwg)
+        symbol_ids = []
+        for sx, sy, shape, size_mm in markers:
+            shape = shape if shape in MARKER_SHAPE_NAMES else 'o'
+            symbol_id = def_id("marker", MARKER_SHAPE_NAMES[shape], float(size_mm))
+            if symbol_id not in symbol_ids:
+                symbol = dwg.g(id=symbol_id)
+                symbol.add(marker_element(dwg, shape, size_mm, marker_style, units))
+                defs.add(symbol)
+            symbol_ids.append(symbol_id)
+        layer_markers.add(defs)
+        for (sx, sy, _, _), symbol_id in zip(markers, symbol_ids):
+            add_uses(dwg, layer_markers, f"#{symbol_id}", sx, sy, units)
+        return layer_markers
+    for sx, sy, shape, size_mm in markers:
+        if shape == 's':
+            half = size_mm/2.0
+            size = (units.length(size_mm), units.length(size_mm))
+            for x0, y0 in zip(units.coords(sx - half), units.coords(sy - half)):
+                layer_markers.add(dwg.rect(insert=(x0, y0), size=size, **marker_style))
+        elif shape == '^':
+            # vértices (arriba, abajo-izq, abajo-der) de todos los triángulos, en unidades de usuario
+            vx, vy = triangle_vertices(sx, sy, size_mm)
+            for tx, ty in zip(vx, vy):
+                layer_markers.add(dwg.polygon(points=units.polygon_points(tx, ty), **marker_style))
+        else:
+            r = units.length(size_mm/2.0, "{:.3f}")
+            for cx, cy in zip(units.coords(sx), units.coords(sy)):
+                layer_markers.add(dwg.circle(center=(cx, cy), r=r, **marker_style))
+    return layer_markers
+
+def build_ticks_layer(dwg, params):
+    units = SvgUnits(params)
+    axis_stroke_mm = params.get("axis_stroke_mm", 0.6)
+    style = {"stroke": "#000000", "stroke_width": units.length(axis_stroke_mm)}
+    layer_ticks = make_layer(dwg, "ticks", "Ticks", **units.layer_style(style))
+    add_segments(dwg, layer_ticks, *tick_segments(params), units=units, merge=merge_segments(params),
+                 **units.element_style(style))
+    return layer_ticks
+
+BRAILLE_DOT_STYLE = {"fill": "#000000", "stroke": "none"}
+
+def braille_cell_symbol(dwg, symbol_id, mask, dot_diameter_mm, dot_spacing_mm, fill_color="#000000",
+                        units=None):
+    """Celda Braille (máscara de 6 bits) como grupo de círculos relativo al origen de la celda."""
+    units = units or SvgUnits({})
+    symbol = dwg.g(id=symbol_id)
+    r = units.length(dot_diameter_mm/2.0, "{:.3f}")
+    style = units.element_style({"fill": fill_color, "stroke": "none"})
+    cxs, cys = cell_dot_offsets(mask, dot_spacing_mm)
+    for cx, cy in zip(cxs, cys):
+        symbol.add(dwg.circle(center=(units.length(cx), units.length(cy)), r=r, **style))
+    return symbol
+
+def braille_cell_id(mask, dot_diameter_mm, dot_spacing_mm):
+    return def_id("braille_cell", f"{mask:02d}", float(dot_diameter_mm), float(dot_spacing_mm))
+
+def braille_cell_defs(dwg, specs, units=None):
+    """
+    <defs> con un símbolo por celda distinta usada en specs: solo se definen, una vez
+    por capa, las celdas de las 64 que realmente aparecen.
+    """
+    defs = new_defs(dwg)
+    defined = set()
+    for spec in specs:
+        for mask, _, _ in braille_cell_layout(spec["text"], spec["char_spacing_mm"], spec["line_spacing_mm"]):
+            symbol_id = braille_cell_id(mask, spec["dot_diameter_mm"], spec["dot_spacing_mm"])
+            if symbol_id not in defined:
+                defs.add(braille_cell_symbol(dwg, symbol_id, mask, spec["dot_diameter_mm"],
+                                             spec["dot_spacing_mm"], units=units))
+                defined.add(symbol_id)
+    return defs
+
+def render_braille_uses_to_group(dwg, text, dot_diameter_mm=1.5, dot_spacing_mm=2.5,
+                                 char_spacing_mm=3.0, line_spacing_mm=4.0, units=None):
+    """Como render_braille_to_group, pero cada celda es un <use> de su símbolo (ver braille_cell_defs)."""
+    units = units or SvgUnits({})
+    g = dwg.g()
+    cells = braille_cell_layout(text, char_spacing_mm, line_spacing_mm)
+    render_profile.count(points=len(cells))
+    for mask, x, y in cells:
+        symbol_id = braille_cell_id(mask, dot_diameter_mm, dot_spacing_mm)
+        g.add(dwg.use(f"#{symbol_id}", insert=(units.length(x), units.length(y))))
+    return g
+
+# Caracteres que se conservan en el id de una etiqueta (válidos en un nombre XML)
+_LABEL_ID_CHAR = re.compile(r"[\w.\-]")
+
+def braille_label_id(text):
+    """
+    Id de la sub-capa de una etiqueta: los espacios pasan a "_" y cualquier otro
+    carácter que no vale en un nombre XML a u<código hex> ("f(x)" -> braille_fu28xu29),
+    así cualquier texto da un id válido, igual con svgwrite que con el escritor en streaming.
+    """
+    return "braille_" + "".join(c if _LABEL_ID_CHAR.match(c) else "_" if c == " " else f"u{ord(c):x}"
+                                for c in text)
+
+def build_braille_layer(dwg, params):
+    """Cada etiqueta como sub-grupo (trasladado a coordenadas SVG absolutas)."""
+    units = SvgUnits(params)
+    layer_braille = make_layer(dwg, "braille", "Braille", **units.layer_style(BRAILLE_DOT_STYLE))
+    instancing = use_instancing(params)
+    specs = braille_label_specs(params)
+    if instancing:
+        layer_braille.add(braille_cell_defs(dwg, specs, units))
+    for spec in specs:
+        text = spec["text"]
         # create sub-group for label
-        sub_id = f"braille_{text.replace(' ', '_')}"
-        sub = dwg.g(id=sub_id, **{"inkscape:groupmode":"layer", "inkscape:label":f"Braille: {text}"})
+        sub_id = braille_label_id(text)
+        sub = make_layer(dwg, sub_id, f"Braille: {text}")
         # render braille group (relative coords)
-        braille_group = render_braille_to_group(dwg, text,
-                                                origin_mm=(0.0, 0.0),
-                                                dot_diameter_mm=d_diam,
-                                                dot_spacing_mm=d_sp,
-                                                char_spacing_mm=c_sp,
-                                                line_spacing_mm=l_sp)
+        dot_kwargs = {"dot_diameter_mm": spec["dot_diameter_mm"],
+                      "dot_spacing_mm": spec["dot_spacing_mm"],
+                      "char_spacing_mm": spec["char_spacing_mm"],
+                      "line_spacing_mm": spec["line_spacing_mm"],
+                      "units": units}
+        if instancing:
+            braille_group = render_braille_uses_to_group(dwg, text, **dot_kwargs)
+        else:
+            braille_group = render_braille_to_group(dwg, text, origin_mm=(0.0, 0.0), **dot_kwargs)
         # translate group from centered coordinates to absolute svg coordinates
-        # compute transform: origin centered (-w/2..w/2) -> svg coord
-        ox_mm = pos[0] + fig_w_mm / 2.0   # center->svg x
-        oy_mm = fig_h_mm / 2.0 - pos[1]   # center->svg y (invert)
-        # append braille_group children into sub with translation
-        # simplest: wrap braille_group into <g transform="translate(ox,oy)">
-        trans = f"translate({ox_mm},{oy_mm})"
-        sub.add(dwg.g(braille_group.elements, transform=trans))
+        trans = units.translate(spec['ox'], spec['oy'])
+        moved = dwg.g(transform=trans)
+        moved.elements.extend(braille_group.elements)
+        sub.add(moved)
         layer_braille.add(sub)
-    dwg.add(layer_braille)
+    return layer_braille
+
+# Orden de las capas en el documento y claves de params de las que depende cada una
+# (la clave de caché de una capa solo cambia si cambia alguno de esos valores).
+FRAME_KEYS = ("fig_size_mm", "xlim", "ylim")
+# Claves de formato de salida (afectan a todas las capas)
+UNIT_KEYS = ("svg_units", "svg_precision_mm")
+LAYERS = [
+    ("plate",   build_plate_layer,   ("fig_size_mm",)),
+    ("grid",    build_grid_layer,    FRAME_KEYS + ("tick_step", "grid_stroke_mm", "merge_segments")),
+    ("axes",    build_axes_layer,    FRAME_KEYS + ("axis_stroke_mm", "merge_segments")),
+    ("curves",  build_curves_layer,  FRAME_KEYS + ("functions", "curve_styles", "n_curve_samples",
+                                                   "curve_sampling", "curve_tolerance_mm",
+                                                   "curve_stroke_mm")),
+    ("markers", build_markers_layer, FRAME_KEYS + ("functions", "marker_shapes", "marker_sizes_mm",
+                                                   "marker_xs", "marker_edge_stroke_mm",
+                                                   "marker_spacing_mm", "marker_overlap_spacing_mm",
+                                                   "marker_clearance_mm", "n_curve_samples",
+                                                   "curve_sampling", "curve_tolerance_mm",
+                                                   "svg_instancing")),
+    ("ticks",   build_ticks_layer,   FRAME_KEYS + ("tick_step", "axis_stroke_mm", "merge_segments")),
+    ("braille", build_braille_layer, ("fig_size_mm", "braille_labels", "svg_instancing")),
+]
+LAYERS = [(layer_id, builder, keys + UNIT_KEYS) for layer_id, builder, keys in LAYERS]
+
+# Subir al cambiar cualquier builder de capa: invalida los fragmentos cacheados antiguos
+LAYER_RENDER_VERSION = 12
+
+def layer_cache_key(layer_id, keys, params):
+    """Hash de contenido del subconjunto de params del que depende la capa."""
+    return content_key({
+        "layer": layer_id,
+        "version": LAYER_RENDER_VERSION,
+        "params": {k: params.get(k) for k in keys},
+    })
+
+def write_svg(dwg, fragments, fh):
+    """Escribe en fh el documento insertando los fragmentos de capa ya serializados (igual que dwg.save())."""
+    head, tail = dwg.tostring().rsplit("</svg>", 1)
+    fh.write(XML_DECLARATION)
+    fh.write(head)
+    for fragment in fragments:
+        fh.write(fragment)
+    fh.write("</svg>" + tail)
+
+def stream_svg(params, fh, cache=None):
+    """
+    Escribe el documento en fh capa a capa con StreamingDrawing, sin árbol de svgwrite:
+    cada elemento va al archivo en cuanto se genera. Los params se validan una sola vez
+    al inicio. La salida es idéntica a la de svgwrite, así que comparte la caché.
+    """
+    validate_params(params)
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    units = SvgUnits(params)
+    dwg = StreamingDrawing(f"{fig_w_mm}mm", f"{fig_h_mm}mm",
+                           viewbox=units.viewbox_value(fig_w_mm, fig_h_mm) if units.viewbox else None)
+    profile = render_profile.active_profile()
+    # con perfil activo se cuentan elementos y bytes de lo que cada capa escribe
+    out = ProfiledSink(fh, profile) if profile is not None else fh
+    fh.write(XML_DECLARATION)
+    fh.write(dwg.header())
+    for layer_id, builder, keys in LAYERS:
+        with render_profile.layer(layer_id):
+            fragment = None
+            if cache is not None:
+                with render_profile.stage("cache"):
+                    fragment = cache.get(layer_cache_key(layer_id, keys, params))
+            if fragment is not None:
+                render_profile.mark_cached()
+                out.write(fragment)
+                continue
+            # con caché hace falta el fragmento completo: se copia mientras se escribe
+            sink = TeeSink(out) if cache is not None else out
+            dwg.layer_sink = sink
+            with render_profile.stage("build"):
+                builder(dwg, params).close()
+            if cache is not None:
+                cache.put(layer_cache_key(layer_id, keys, params), sink.getvalue())
+    fh.write(dwg.footer())
 
-    # Save file
-    dwg.save()
+def write_svg_document(params, fh, cache=None):
+    """
+    Escribe el SVG de params en fh (cualquier objeto de texto con write), sin tocar
+    disco ni imprimir. Con cache (render_cache.LayerCache) las capas cuyo subconjunto
+    de params no cambió se reutilizan tal cual en lugar de recalcularse.
+    Con svg_writer="stream" se usa el escritor en streaming (ver stream_svg).
+    """
+    if params.get("svg_writer", "svgwrite") == "stream":
+        stream_svg(params, fh, cache=cache)
+        return
+
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+
+    # create svgwrite drawing with physical mm size
+    dwg = svgwrite.Drawing(size=(f"{fig_w_mm}mm", f"{fig_h_mm}mm"), profile='tiny')
+
+    # layers (groups) with inkscape-compatible attributes
+    # Inkscape(dwg) declara el namespace inkscape y registra sus atributos en el validador de svgwrite
+    Inkscape(dwg)
+    if SvgUnits(params).viewbox:
+        # 1 unidad de usuario = 1 mm exacto: el tamaño físico sale de width/height
+        dwg.viewbox(0, 0, fig_w_mm, fig_h_mm)
+
+    fragments = []
+    for layer_id, builder, keys in LAYERS:
+        with render_profile.layer(layer_id):
+            key = layer_cache_key(layer_id, keys, params) if cache is not None else None
+            fragment = None
+            if cache is not None:
+                with render_profile.stage("cache"):
+                    fragment = cache.get(key)
+            if fragment is None:
+                with render_profile.stage("build"):
+                    group = builder(dwg, params)
+                with render_profile.stage("serialize"):
+                    fragment = group.tostring()
+                if cache is not None:
+                    cache.put(key, fragment)
+            else:
+                render_profile.mark_cached()
+            render_profile.count_text(fragment)
+        fragments.append(fragment)
+
+    with render_profile.stage("save"):
+        write_svg(dwg, fragments, fh)
+
+def write_sink(sink, data):
+    """Copia data (bytes) en sink: una ruta (se escribe el archivo) o un objeto binario con write."""
+    if hasattr(sink, "write"):
+        sink.write(data)
+        return
+    with open(sink, "wb") as fh:
+        fh.write(data)
+
+def render_svg(params, cache=None, sink=None):
+    """
+    Renderiza params en memoria y retorna los bytes del SVG (UTF-8): sin archivos
+    intermedios ni prints, para notebooks, servicios y lotes de variantes.
+    output_svg se ignora; con sink (ruta u objeto binario) el resultado se copia allí.
+    """
+    buf = io.StringIO()
+    write_svg_document(params, buf, cache=cache)
+    data = buf.getvalue().encode("utf-8")
+    if sink is not None:
+        write_sink(sink, data)
+    return data
+
+def build_svg_from_params(params, cache=None, profile=None):
+    """
+    Genera el SVG de params en output_svg (ver write_svg_document). Se escribe
+    en un temporal junto al destino que reemplaza a output_svg solo si el render
+    termina: un error deja intacto el SVG anterior.
+    Con profile (render_profile.RenderProfile) se mide cada capa y etapa y se
+    retorna el resumen (también entregado a los hooks del perfil).
+    """
+    if profile is not None:
+        with profile.activate():
+            build_svg_from_params(params, cache=cache)
+        return profile.finish()
+
+    output_svg = params.get("output_svg", "output.svg")
+    # por proceso: en --batch y en el servicio varios workers pueden compartir directorio
+    tmp = f"{output_svg}.{os.getpid()}.tmp"
+    try:
+        fh = open(tmp, "w", encoding="utf-8")
+        try:
+            write_svg_document(params, fh, cache=cache)
+        finally:
+            with render_profile.stage("save"):
+                fh.close()
+        os.replace(tmp, output_svg)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
     print(f"SVG saved to: {output_svg}")
 
+# -----------------------
+# BATCH: muchos params.json en paralelo
+# -----------------------
+
+# Tope de procesos aunque la máquina tenga más núcleos (cada render es corto y usa poca memoria)
+MAX_BATCH_WORKERS = 8
+
+# Un JSON es un params.json si es un objeto con alguna de estas claves (así los
+# directorios pueden contener también manifiestos de libro, perfiles o benchmarks)
+PARAMS_FILE_KEYS = ("fig_size_mm", "xlim", "ylim", "functions", "braille_labels")
+
+def is_params_file(path):
+    """True si path es un JSON con forma de params (ver PARAMS_FILE_KEYS)."""
+    try:
+        with open(path, "r", encoding="utf8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    return isinstance(data, dict) and any(k in data for k in PARAMS_FILE_KEYS)
+
+def collect_params_files(specs):
+    """
+    Expande directorios (todos los *.json, recursivo) y patrones glob a una lista
+    ordenada de pares (params_path, raiz) sin duplicados. La raíz define la
+    estructura de salida relativa. De directorios y globs solo se toman los JSON
+    que son params (is_params_file); un archivo dado explícitamente siempre entra.
+    """
+    found = {}
+    for spec in specs:
+        spec_path = Path(spec)
+        if spec_path.is_dir():
+            for p in spec_path.rglob("*.json"):
+                if is_params_file(p):
+                    found.setdefault(p.resolve(), spec_path.resolve())
+        elif spec_path.is_file():
+            found.setdefault(spec_path.resolve(), spec_path.resolve().parent)
+        else:
+            matches = [Path(m).resolve() for m in glob.glob(spec, recursive=True)]
+            matches = [m for m in matches if m.is_file() and is_params_file(m)]
+            if not matches:
+                continue
+            root = Path(os.path.commonpath([str(m.parent) for m in matches]))
+            for m in matches:
+                found.setdefault(m, root)
+    return sorted(found.items())
+
+def batch_output_path(params_path, root, out_dir=None, prefix_root=False, suffix=".svg"):
+    """
+    Salida determinista: misma ruta relativa que el params, con extensión suffix.
+    Con prefix_root la ruta bajo out_dir empieza por el nombre de la raíz (varias raíces).
+    """
+    rel = Path(params_path).relative_to(root).with_suffix(suffix)
+    if out_dir is None:
+        return Path(root) / rel
+    if prefix_root:
+        rel = Path(Path(root).name) / rel
+    return Path(out_dir) / rel
+
+def batch_jobs(specs, out_dir=None, suffix=".svg"):
+    """
+    Pares (params_path, salida) del lote. Con out_dir y varias raíces, cada salida va
+    bajo el nombre de su raíz (a/fig.json y b/fig.json no se pisan). Lanza ParamsError
+    si aun así dos params irían al mismo archivo.
+    """
+    files = collect_params_files(specs)
+    prefix_root = out_dir is not None and len({root for _, root in files}) > 1
+    jobs = [(p, batch_output_path(p, root, out_dir, prefix_root, suffix)) for p, root in files]
+    seen = {}
+    for p, out in jobs:
+        if out in seen:
+            raise ParamsError(f"{seen[out]} y {p} se escribirían en el mismo archivo {out}")
+        seen[out] = p
+    return jobs
+
+def make_cache(cache_dir, cache_max_mb=None):
+    """LayerCache en cache_dir (None si no se pidió caché)."""
+    if cache_dir is None:
+        return None
+    if cache_max_mb is None:
+        return LayerCache(cache_dir)
+    return LayerCache(cache_dir, max_bytes=int(cache_max_mb * 1024 * 1024))
+
+def export_dxf(params, output_dxf=None):
+    """DXF con la misma geometría (import diferido: generate_dxf_from_params importa este módulo)."""
+    from generate_dxf_from_params import build_dxf_from_params
+    return build_dxf_from_params(params, output_dxf)
+
+def check_tactile(params):
+    """Puerta previa: lanza TactileCheckError si la figura no cumple las distancias táctiles."""
+    # import diferido: tactile_check importa este módulo
+    from tactile_check import require_tactile_ok
+    require_tactile_ok(params)
+
+def render_params_file(params_path, output_svg, cache_dir=None, cache_max_mb=None, with_dxf=False,
+                       overrides=None, profile=False, check=False):
+    """
+    Renderiza un params.json forzando la ruta de salida. Pensado para correr en un worker.
+    overrides: claves de params que fija la línea de comandos (svg_instancing, svg_writer).
+    Con check=True la figura no se renderiza si no pasa tactile_check.
+    Con profile=True retorna el resumen de render_profile de la figura; si no, None.
+    """
+    params = load_params(params_path)
+    params.update(overrides or {})
+    if check:
+        check_tactile(params)
+    params["output_svg"] = str(output_svg)
+    Path(output_svg).parent.mkdir(parents=True, exist_ok=True)
+    summary = build_svg_from_params(params, cache=make_cache(cache_dir, cache_max_mb),
+                                    profile=RenderProfile(str(params_path)) if profile else None)
+    if with_dxf:
+        export_dxf(params, str(Path(output_svg).with_suffix(".dxf")))
+    return summary
+
+def render_batch(specs, out_dir=None, workers=None, cache_dir=None, cache_max_mb=None, with_dxf=False,
+                 overrides=None, on_profile=None, check=False):
+    """
+    Renderiza todos los params encontrados en specs en un pool de procesos.
+    Retorna lista ordenada de (params_path, output_svg, error) con error=None si todo fue bien.
+    Con on_profile cada figura se perfila y su resumen se entrega a on_profile(summary)
+    en el proceso principal, en orden (para agregar estadísticas del lote).
+    """
+    jobs = batch_jobs(specs, out_dir)
+    if not jobs:
+        return []
+    n_workers = workers or os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, MAX_BATCH_WORKERS, len(jobs)))
+    results = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(render_params_file, str(p), str(out), cache_dir, cache_max_mb, with_dxf,
+                               overrides, on_profile is not None, check)
+                   for p, out in jobs]
+        for (p, out), fut in zip(jobs, futures):
+            try:
+                summary = fut.result()
+                results.append((str(p), str(out), None))
+                if on_profile is not None:
+                    on_profile(summary)
+            except Exception as exc:  # un fallo no detiene el resto del lote
+                results.append((str(p), str(out), f"{type(exc).__name__}: {exc}"))
+    return results
+
+def print_batch_summary(results):
+    """Imprime resumen por archivo; retorna número de fallos."""
+    failures = 0
+    for params_path, output_svg, error in results:
+        if error is None:
+            print(f"[OK]   {params_path} -> {output_svg}")
+        else:
+            failures += 1
+            print(f"[FAIL] {params_path}: {error}")
+    print(f"{len(results) - failures} ok, {failures} failed, {len(results)} total")
+    return failures
+
 # -----------------------
 # ENTRY POINT
 # -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera SVG con capas a partir de params.json")
+    parser.add_argument("params", nargs="+", help="params.json (o directorios/globs con --batch)")
+    parser.add_argument("--batch", action="store_true",
+                        help="renderizar todos los params de los directorios/globs dados en paralelo")
+    parser.add_argument("--out-dir", default=None,
+                        help="directorio de salida en modo batch (por defecto junto a cada params)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"procesos en modo batch (máximo {MAX_BATCH_WORKERS})")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directorio de caché de capas (reutiliza capas cuyos params no cambiaron)")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="tamaño máximo de la caché en MB (desalojo LRU)")
+    parser.add_argument("--dxf", action="store_true",
+                        help="exportar también el DXF (una capa por capa SVG) junto a cada SVG")
+    parser.add_argument("--flatten", action="store_true",
+                        help="sin <defs>/<use>: un elemento por punto Braille y por marcador")
+    parser.add_argument("--stream", action="store_true",
+                        help="escribir con el escritor en streaming (sin árbol de svgwrite, memoria plana)")
+    parser.add_argument("--merge-segments", action="store_true",
+                        help="Grid, Axes y Ticks como un <path> por estilo en lugar de un <line> por segmento (solo SVG)")
+    parser.add_argument("--viewbox", action="store_true",
+                        help="coordenadas sin unidad con viewBox en mm (salida compacta, ver svg_precision_mm)")
+    parser.add_argument("--check", action="store_true",
+                        help="validar antes las distancias táctiles (tactile_check); las figuras que fallan no se renderizan")
+    parser.add_argument("--watch", action="store_true",
+                        help="vigilar los params y reescribir el SVG al cambiar, recalculando solo las capas afectadas")
+    parser.add_argument("--profile", default=None, metavar="PERFIL.json",
+                        help="medir tiempo, elementos, puntos y bytes por capa y etapa y guardarlos en este JSON")
+    args = parser.parse_args(argv)
+    if len(args.params) > 1 and not (args.batch or args.watch):
+        parser.error("varios params solo con --batch (o --watch)")
+    if args.watch and args.profile:
+        parser.error("--profile no se puede combinar con --watch")
+
+    overrides = {}
+    if args.flatten:
+        overrides["svg_instancing"] = "flatten"
+    if args.stream:
+        overrides["svg_writer"] = "stream"
+    if args.viewbox:
+        overrides["svg_units"] = "viewbox"
+    if args.merge_segments:
+        overrides["merge_segments"] = True
+
+    if args.watch:
+        # import diferido: watch_params importa este módulo
+        from watch_params import ParamsWatcher
+        ParamsWatcher(args.params, overrides=overrides, cache=make_cache(args.cache_dir, args.cache_max_mb),
+                      with_dxf=args.dxf, check=args.check).run()
+        return 0
+
+    if not args.batch:
+        params = load_params(args.params[0])
+        params.update(overrides)
+        if args.check:
+            from tactile_check import check_params, print_report
+            violations = check_params(params)
+            print_report(args.params[0], violations)
+            if violations:
+                return 1
+        profile = RenderProfile(args.params[0]) if args.profile else None
+        build_svg_from_params(params, cache=make_cache(args.cache_dir, args.cache_max_mb), profile=profile)
+        if profile is not None:
+            profile.to_json(args.profile)
+            print(f"Profile saved to: {args.profile}")
+        if args.dxf:
+            export_dxf(params)
+        return 0
+
+    summaries = []
+    try:
+        results = render_batch(args.params, out_dir=args.out_dir, workers=args.workers,
+                               cache_dir=args.cache_dir, cache_max_mb=args.cache_max_mb, with_dxf=args.dxf,
+                               overrides=overrides, on_profile=summaries.append if args.profile else None,
+                               check=args.check)
+    except ParamsError as exc:  # dos params con la misma salida
+        print(f"ParamsError: {exc}")
+        return 1
+    if not results:
+        print("No params files found.")
+        return 1
+    if args.profile:
+        with open(args.profile, "w", encoding="utf-8") as fh:
+            json.dump({"totals": aggregate_profiles(summaries), "figures": summaries}, fh, indent=2)
+        print(f"Profile saved to: {args.profile}")
+    return 1 if print_batch_summary(results) else 0
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python generate_svg_from_params.py params.json")
-        sys.exit(1)
-    params_path = sys.argv[1]
-    params = load_params(params_path)
-    build_svg_from_params(params)
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+heightfield_mesh.py
+
+Motor de malla alternativo a los prismas solapados de generate_stl_from_params:
+rasteriza todos los relieves (placa, rejilla, ejes, curvas, marcadores con su
+altura de jerarquía y puntos Braille con dot_height_mm) en un mapa de alturas en
+mm de placa y lo triangula como un único sólido estanco, sin booleanas (el paso
+de unión que hoy se hace en Onshape).
+
+- Rasterizado vectorizado (rasterize_convex de generate_cws_from_params) de los
+  mismos prismas que el STL: el mapa guarda el índice de nivel de cada píxel.
+- Como todos los relieves son planos, la superficie superior es constante a
+  trozos: se decima de forma voraz en rectángulos de nivel constante (tramos de
+  cada fila fusionados con los idénticos de las filas siguientes). Las zonas
+  planas cuestan pocos triángulos y los bordes de los puntos quedan a la
+  resolución del mapa; frente a un quadtree da unas 40 veces menos caras en las
+  placas de ejemplo (las rayas finas de rejilla y ejes son un solo rectángulo).
+- Paredes verticales entre píxeles de distinto nivel, fusionadas en tramos.
+- Los píxeles que se tocan solo por una esquina (bloque 2x2 en diagonal) dejarían
+  una arista vertical compartida por 4 paredes: se sube el píxel bajo de cada
+  bloque así al nivel de la diagonal alta (conectividad a 4), de modo que la
+  malla queda 2-variedad.
+- Malla conforme: en cada arista de cada cara se insertan todos los vértices de
+  la malla que caen sobre ella (sin uniones en T) y las caras con vértices
+  insertados se triangulan en abanico desde su centro; cada arista queda
+  compartida por caras de orientación opuesta.
+
+Uso:
+    python heightfield_mesh.py params.json [-o salida.stl] [--resolution 0.05]
+    python generate_stl_from_params.py params.json --engine heightfield
+    python stl_check.py salida.stl --strict      # revisa que sea una 2-variedad cerrada
+"""
+
+import sys
+import math
+import argparse
+import numpy as np
+
+from generate_svg_from_params import load_params, plot_frame
+from generate_stl_from_params import (StlWriter, plate_prisms, default_stl_path, BATCH_SIZE,
+                                      HEIGHTFIELD_STL_HEADER)
+from generate_cws_from_params import rasterize_convex
+
+# -----------------------
+# PARÁMETROS POR DEFECTO
+# -----------------------
+
+# Lado del píxel del mapa de alturas (mm)
+RESOLUTION_MM = 0.05
+# Niveles distintos que caben en el mapa (uint8)
+MAX_LEVELS = 256
+
+# -----------------------
+# MAPA DE ALTURAS
+# -----------------------
+
+class HeightMap:
+    """
+    Niveles (ny, nx) uint8 con índices en heights_mm (heights_mm[0] = 0, fuera de
+    la placa) y tamaño de píxel (px, py) en mm; el píxel (fila, col) cubre
+    [col * px, (col + 1) * px] x [fila * py, (fila + 1) * py] en mm de placa (y hacia abajo).
+    """
+
+    def __init__(self, levels, heights_mm, px, py):
+        self.levels = levels
+        self.heights_mm = heights_mm
+        self.px = px
+        self.py = py
+
+def rasterize_heights(params, resolution_mm=RESOLUTION_MM):
+    """Rasteriza los prismas de plate_prisms en un HeightMap."""
+    fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+    nx = max(1, int(math.ceil(fig_w_mm / resolution_mm - 1e-9)))
+    ny = max(1, int(math.ceil(fig_h_mm / resolution_mm - 1e-9)))
+    px, py = fig_w_mm / nx, fig_h_mm / ny
+
+    groups = {}
+    for outlines, _, z1 in plate_prisms(params):
+        if len(outlines):
+            groups.setdefault(round(float(z1), 6), []).append(outlines)
+    heights = [0.0] + sorted(groups)
+    if len(heights) > MAX_LEVELS:
+        raise ValueError(f"demasiadas alturas distintas ({len(heights)}) para el mapa de niveles")
+
+    levels = np.zeros((ny, nx), dtype=np.uint8)
+    mask = np.zeros((ny, nx), dtype=bool)
+    # de menor a mayor altura: cada nivel pisa a los anteriores (unión = máximo)
+    for index, height in enumerate(heights[1:], start=1):
+        mask[:] = False
+        for outlines in groups[height]:
+            pixels = np.empty_like(outlines, dtype=float)
+            pixels[..., 0] = outlines[..., 0] / px
+            pixels[..., 1] = outlines[..., 1] / py
+            rasterize_convex(mask, pixels)
+        levels[mask] = index
+    fill_diagonal_contacts(levels)
+    return HeightMap(levels, np.array(heights), px, py)
+
+def fill_diagonal_contacts(levels):
+    """
+    Elimina in situ los contactos solo por esquina: en cada bloque 2x2 cuya
+    diagonal baja queda entera por debajo de la alta, el píxel de arriba de la
+    diagonal baja sube al mínimo de la diagonal alta. Se repite
+    hasta que no queda ninguno (subir un píxel puede crear otro al lado).
+    Retorna el número de píxeles subidos.
+    """
+    raised = 0
+    while True:
+        a, b = levels[:-1, :-1], levels[:-1, 1:]    # arriba: izquierda, derecha
+        c, d = levels[1:, :-1], levels[1:, 1:]      # abajo: izquierda, derecha
+        main_hi = np.minimum(a, d)
+        anti_hi = np.minimum(b, c)
+        main = main_hi > np.maximum(b, c)
+        anti = anti_hi > np.maximum(a, d)
+        if not (main.any() or anti.any()):
+            return raised
+        row, col = np.nonzero(main)
+        np.maximum.at(levels, (row, col + 1), main_hi[row, col])
+        raised += len(row)
+        row, col = np.nonzero(anti)
+        np.maximum.at(levels, (row, col), anti_hi[row, col])
+        raised += len(row)
+
+# -----------------------
+# DECIMACIÓN
+# -----------------------
+
+def _runs(code):
+    """Tramos de valor constante >= 0 por fila de code: (fila, inicio, fin incluido, valor)."""
+    rows = code.shape[0]
+    change = np.ones((rows, 1), dtype=bool)
+    start = (code >= 0) & np.concatenate([change, code[:, 1:] != code[:, :-1]], axis=1)
+    end = (code >= 0) & np.concatenate([code[:, :-1] != code[:, 1:], change], axis=1)
+    row, first = np.nonzero(start)
+    _, last = np.nonzero(end)
+    return row, first, last, code[row, first]
+
+def greedy_rectangles(levels):
+    """
+    Rectángulos de nivel constante que cubren el mapa: tramos de cada fila
+    fusionados con los tramos idénticos (mismo inicio, fin y nivel) de las filas
+    siguientes. Retorna (x0, y0, x1, y1, nivel) en píxeles, solo niveles > 0.
+    """
+    row, x0, x1, level = _runs(levels.astype(np.int32))
+    order = np.lexsort((row, level, x1, x0))
+    row, x0, x1, level = row[order], x0[order], x1[order] + 1, level[order]
+    new = np.ones(len(row), dtype=bool)
+    new[1:] = ((x0[1:] != x0[:-1]) | (x1[1:] != x1[:-1]) | (level[1:] != level[:-1])
+               | (row[1:] != row[:-1] + 1))
+    first = np.flatnonzero(new)
+    last = np.concatenate([first[1:], [len(row)]]) - 1
+    keep = level[first] > 0
+    first, last = first[keep], last[keep]
+    return x0[first], row[first], x1[first], row[last] + 1, level[first]
+
+def wall_faces(levels):
+    """
+    Paredes verticales entre píxeles vecinos de distinto nivel (y con el exterior,
+    nivel 0), fusionadas en tramos a lo largo de cada línea de la rejilla.
+    Retorna esquinas (P, 4, 3) enteras (gx, gy, nivel) ordenadas con la normal
+    hacia el lado bajo.
+    """
+    ring = np.pad(levels, 1).astype(np.int32)
+    faces = []
+
+    # líneas verticales gx = k: izquierda = columna k - 1, derecha = columna k
+    left, right = ring[1:-1, :-1].T, ring[1:-1, 1:].T        # (nx + 1, ny)
+    k, y0, y1, code = _runs(np.where(left != right, left * 256 + right, -1))
+    a, b = code // 256, code % 256
+    y1 = y1 + 1
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    plus = a > b  # sólido a la izquierda: normal +x
+    ya, yb = np.where(plus, y0, y1), np.where(plus, y1, y0)
+    faces.append(np.stack([
+        np.stack([k, ya, lo], axis=1), np.stack([k, yb, lo], axis=1),
+        np.stack([k, yb, hi], axis=1), np.stack([k, ya, hi], axis=1)], axis=1))
+
+    # líneas horizontales gy = k: arriba = fila k - 1, abajo = fila k
+    top, bottom = ring[:-1, 1:-1], ring[1:, 1:-1]            # (ny + 1, nx)
+    k, x0, x1, code = _runs(np.where(top != bottom, top * 256 + bottom, -1))
+    a, b = code // 256, code % 256
+    x1 = x1 + 1
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    plus = a > b  # sólido arriba (y menor): normal +y
+    xa, xb = np.where(plus, x1, x0), np.where(plus, x0, x1)
+    faces.append(np.stack([
+        np.stack([xa, k, lo], axis=1), np.stack([xb, k, lo], axis=1),
+        np.stack([xb, k, hi], axis=1), np.stack([xa, k, hi], axis=1)], axis=1))
+    return np.concatenate(faces)
+
+def plate_faces(levels):
+    """Caras planas: rectángulos de nivel constante (normal +z) y la base completa en nivel 0 (normal -z)."""
+    ny, nx = levels.shape
+    x0, y0, x1, y1, level = greedy_rectangles(levels)
+    tops = np.stack([np.stack([x0, y0, level], axis=1), np.stack([x1, y0, level], axis=1),
+                     np.stack([x1, y1, level], axis=1), np.stack([x0, y1, level], axis=1)], axis=1)
+    base = np.array([[[0, 0, 0], [0, ny, 0], [nx, ny, 0], [nx, 0, 0]]])
+    return np.concatenate([tops.astype(np.int64), base])
+
+# -----------------------
+# MALLA CONFORME
+# -----------------------
+
+def conform_faces(corners, shape):
+    """
+    Inserta en cada arista de cada cara (P, 4, 3) los vértices de la malla que caen
+    en su interior. Retorna (vértices (V, 3) enteros, contorno de cada cara como
+    índices planos, inicio de cada cara en ese contorno).
+    """
+    ny, nx = shape
+    n_levels = int(corners[..., 2].max()) + 1
+    gx, gy, gl = (corners[..., i].astype(np.int64) for i in range(3))
+    code = (gx * (ny + 1) + gy) * n_levels + gl
+    vertex_code, corner_index = np.unique(code, return_inverse=True)
+    corner_index = corner_index.reshape(corners.shape[:2])
+    vx = vertex_code // n_levels // (ny + 1)
+    vy = vertex_code // n_levels % (ny + 1)
+    vl = vertex_code % n_levels
+
+    # claves ordenadas de los vértices para cada dirección de arista
+    keys = (
+        ((vy * n_levels + vl) * (nx + 1) + vx, vx),                # aristas en x
+        ((vx * n_levels + vl) * (ny + 1) + vy, vy),                # aristas en y
+        (vertex_code, vl),                                         # aristas verticales
+    )
+    sorted_keys = []
+    for key, _ in keys:
+        order = np.argsort(key, kind="stable")
+        sorted_keys.append((key[order], order))
+
+    start = corner_index
+    end = np.roll(corner_index, -1, axis=1)
+    start, end = start.reshape(-1), end.reshape(-1)
+    count = np.zeros(len(start), dtype=np.int64)
+    lo = np.zeros(len(start), dtype=np.int64)
+    ascending = np.ones(len(start), dtype=bool)
+    direction = np.select([vx[start] != vx[end], vy[start] != vy[end]], [0, 1], 2)
+    for d, (key, coord) in enumerate(keys):
+        sel = np.flatnonzero(direction == d)
+        k_start, k_end = key[start[sel]], key[end[sel]]
+        first = np.searchsorted(sorted_keys[d][0], np.minimum(k_start, k_end), side="right")
+        last = np.searchsorted(sorted_keys[d][0], np.maximum(k_start, k_end), side="left")
+        count[sel] = last - first
+        lo[sel] = first
+        ascending[sel] = k_end > k_start
+
+    # contorno de cada cara: esquina de cada arista seguida de sus vértices insertados
+    entries = 1 + count
+    edge = np.repeat(np.arange(len(start)), entries)
+    pos = np.arange(len(edge)) - np.repeat(np.cumsum(entries) - entries, entries)
+    boundary = start[edge].copy()
+    inner = pos > 0
+    e_in, p_in = edge[inner], pos[inner] - 1
+    slot = np.where(ascending[e_in], lo[e_in] + p_in, lo[e_in] + count[e_in] - 1 - p_in)
+    for d in range(3):
+        sel = direction[e_in] == d
+        boundary[np.flatnonzero(inner)[sel]] = sorted_keys[d][1][slot[sel]]
+    face_size = entries.reshape(-1, 4).sum(axis=1)
+    face_start = np.concatenate([[0], np.cumsum(face_size)])
+    return np.stack([vx, vy, vl], axis=1), boundary, face_start
+
+def triangulate(boundary, face_start, n_vertices):
+    """
+    Triángulos como índices (T, 3): caras de 4 vértices en dos triángulos; el resto
+    en abanico desde un vértice nuevo en su centro (índices n_vertices + i, en el
+    orden de las caras retornadas). Retorna (triángulos, caras en abanico).
+    """
+    size = np.diff(face_start)
+    quad = np.flatnonzero(size == 4)
+    b = boundary[face_start[quad, None] + np.arange(4)]
+    tris = [b[:, [0, 1, 2]], b[:, [0, 2, 3]]]
+    fan = np.flatnonzero(size > 4)
+    if len(fan):
+        n = size[fan]
+        face = np.repeat(np.arange(len(fan)), n)
+        pos = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+        first = face_start[fan][face]
+        tris.append(np.stack([n_vertices + face, boundary[first + pos],
+                              boundary[first + (pos + 1) % n[face]]], axis=1))
+    return np.concatenate(tris), fan
+
+def heightfield_triangles(hmap):
+    """Triángulos (N, 3, 3) en mm (STL: y hacia arriba) del sólido descrito por hmap."""
+    levels = hmap.levels
+    ny = levels.shape[0]
+    faces = np.concatenate([plate_faces(levels), wall_faces(levels)])
+    vertices, boundary, face_start = conform_faces(faces, levels.shape)
+    tris, fan = triangulate(boundary, face_start, len(vertices))
+
+    def to_mm(grid):
+        xyz = np.empty(grid.shape, dtype=float)
+        xyz[..., 0] = grid[..., 0] * hmap.px
+        # y hacia abajo (mapa) -> y hacia arriba (STL)
+        xyz[..., 1] = (ny - grid[..., 1]) * hmap.py
+        xyz[..., 2] = hmap.heights_mm[grid[..., 2]]
+        return xyz
+
+    # centro de las caras en abanico: media de sus 4 esquinas (cara plana y convexa)
+    points = np.concatenate([to_mm(vertices), to_mm(faces[fan]).mean(axis=1)])
+    # el espejo en y invierte el sentido de giro: se intercambian dos vértices
+    return points[tris[:, [0, 2, 1]]]
+
+def write_heightfield_mesh(params, writer, resolution_mm=RESOLUTION_MM):
+    """Escribe en writer el sólido estanco de params; retorna el HeightMap usado."""
+    hmap = rasterize_heights(params, resolution_mm)
+    triangles = heightfield_triangles(hmap)
+    for start in range(0, len(triangles), BATCH_SIZE * 8):
+        writer.write(triangles[start:start + BATCH_SIZE * 8])
+    return hmap
+
+def build_heightfield_stl(params, output_stl=None, resolution_mm=None):
+    """Genera el STL por mapa de alturas; retorna (ruta, número de triángulos)."""
+    output_stl = output_stl or params.get("output_stl") or default_stl_path(params)
+    if resolution_mm is None:
+        resolution_mm = float(params.get("heightfield_resolution_mm", RESOLUTION_MM))
+    with StlWriter(output_stl, header=HEIGHTFIELD_STL_HEADER) as writer:
+        hmap = write_heightfield_mesh(params, writer, resolution_mm)
+    ny, nx = hmap.levels.shape
+    print(f"STL saved to: {output_stl} ({writer.count} triangles, {nx}x{ny} height map)")
+    return output_stl, writer.count
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="STL estanco de la placa táctil por mapa de alturas")
+    parser.add_argument("params", help="params.json")
+    parser.add_argument("-o", "--output", default=None, help="ruta del STL (por defecto output_stl o output_svg.stl)")
+    parser.add_argument("--resolution", type=float, default=None,
+                        help=f"lado del píxel del mapa en mm (por defecto {RESOLUTION_MM})")
+    args = parser.parse_args(argv)
+    build_heightfield_stl(load_params(args.params), args.output, args.resolution)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+marker_placement.py
+
+Colocación automática de marcadores a lo largo de las curvas, en mm de placa,
+según Instructions.md:
+ - un marcador cada 5–6 mm de longitud de arco (spacing_mm);
+ - donde chocaría con un marcador de otra curva, el paso se abre a 9–10 mm
+   (overlap_spacing_mm) y, si aún choca, se avanza hasta el primer hueco libre.
+
+Las distancias mínimas entre marcadores ya colocados se comprueban con una
+rejilla hash (solo se miran las 9 celdas vecinas), así que el coste crece
+linealmente con el número de marcadores. Sustituye a las tablas de segmentos y
+densidades hechas a mano de make_default_marker_xs / muestreo_adaptativo.
+"""
+
+import math
+import numpy as np
+
+MARKER_SPACING_MM = 5.5
+MARKER_OVERLAP_SPACING_MM = 9.5
+MARKER_CLEARANCE_MM = 1.0
+# Paso con que se buscan huecos libres a lo largo de la curva
+SEARCH_STEP_MM = 0.25
+
+class SpatialHash:
+    """Rejilla uniforme de celdas cell_mm x cell_mm con los marcadores colocados."""
+
+    def __init__(self, cell_mm):
+        self.cell_mm = float(cell_mm)
+        self.cells = {}
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_mm), math.floor(y / self.cell_mm))
+
+    def add(self, x, y, radius, owner):
+        self.cells.setdefault(self._cell(x, y), []).append((x, y, radius, owner))
+
+    def conflicts(self, x, y, radius, owner, clearance_mm):
+        """True si algún marcador de otra curva queda a menos de la distancia mínima."""
+        cx, cy = self._cell(x, y)
+        for ix in (cx - 1, cx, cx + 1):
+            for iy in (cy - 1, cy, cy + 1):
+                for ox, oy, orad, oowner in self.cells.get((ix, iy), ()):
+                    if oowner == owner:
+                        continue
+                    if math.hypot(x - ox, y - oy) < radius + orad + clearance_mm:
+                        return True
+        return False
+
+def arc_length(sx, sy):
+    """Longitud de arco acumulada (mm) en cada vértice de la polilínea."""
+    return np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(sx), np.diff(sy)))])
+
+def _candidate_arcs(s, px, py, radius, width_mm, height_mm):
+    """
+    Posiciones de arco candidatas (paso SEARCH_STEP_MM) solo sobre los tramos con
+    algún extremo en la placa: las partes de la curva que salen metros fuera de la
+    placa no generan candidatos.
+    """
+    inside = (px >= radius) & (px <= width_mm - radius) & (py >= radius) & (py <= height_mm - radius)
+    seg = inside[:-1] | inside[1:]
+    if not seg.any():
+        return np.empty(0)
+    # tramos contiguos de segmentos visibles: [inicio, fin) en índices de segmento
+    edges = np.diff(np.concatenate([[0], seg.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.concatenate([np.arange(s[a], s[b] + 1e-9, SEARCH_STEP_MM) for a, b in zip(starts, ends)])
+
+def place_markers_along_curves(curves, sizes_mm, width_mm, height_mm,
+                               spacing_mm=MARKER_SPACING_MM,
+                               overlap_spacing_mm=MARKER_OVERLAP_SPACING_MM,
+                               clearance_mm=MARKER_CLEARANCE_MM):
+    """
+    curves: por curva, lista de tramos (sx, sy) en mm (como curve_polylines).
+    sizes_mm: tamaño del marcador de cada curva.
+    Retorna por curva (sx, sy) arrays con los centros elegidos, solo los que
+    caben enteros en la placa.
+    """
+    max_size = max(sizes_mm) if len(sizes_mm) else 0.0
+    index = SpatialHash(max(max_size + clearance_mm, spacing_mm))
+    placed = []
+    for owner, pieces in enumerate(curves):
+        size = sizes_mm[owner] if owner < len(sizes_mm) else max_size
+        radius = size / 2.0
+        xs, ys = [], []
+        for px, py in pieces:
+            s = arc_length(px, py)
+            if s[-1] <= 0.0:
+                continue
+            cs = _candidate_arcs(s, px, py, radius, width_mm, height_mm)
+            if cs.size == 0:
+                continue
+            # candidatos densos a lo largo del arco (interpolación vectorizada)
+            cx = np.interp(cs, s, px)
+            cy = np.interp(cs, s, py)
+            on_plate = ((cx >= radius) & (cx <= width_mm - radius)
+                        & (cy >= radius) & (cy <= height_mm - radius))
+            last = None
+            i = 0
+            n = len(cs)
+            while i < n:
+                if not on_plate[i]:
+                    i += 1
+                    continue
+                if last is not None and cs[i] - last < spacing_mm - 1e-9:
+                    i = max(int(np.searchsorted(cs, last + spacing_mm - 1e-9)), i + 1)
+                    continue
+                x, y = float(cx[i]), float(cy[i])
+                if index.conflicts(x, y, radius, owner, clearance_mm):
+                    # zona de cruce: abrir el paso a overlap_spacing_mm y buscar el primer hueco
+                    target = cs[i] if last is None else max(cs[i], last + overlap_spacing_mm)
+                    j = int(np.searchsorted(cs, target - 1e-9))
+                    i = j if j > i else i + 1
+                    continue
+                index.add(x, y, radius, owner)
+                xs.append(x)
+                ys.append(y)
+                last = cs[i]
+                i += 1
+        placed.append((np.array(xs, dtype=float), np.array(ys, dtype=float)))
+    return placed
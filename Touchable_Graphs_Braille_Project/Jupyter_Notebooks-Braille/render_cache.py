@@ -0,0 +1,151 @@
+"""
+render_cache.py
+
+Caché en disco de fragmentos de capa ya renderizados (p. ej. el <g> de Grid o
+de Braille serializado), direccionada por contenido: la clave es un hash del
+subconjunto de params del que depende la capa.
+
+- Un archivo por clave dentro de cache_dir.
+- Escritura atómica (archivo temporal + os.replace), segura con varios procesos
+  del modo batch escribiendo a la vez.
+- Tamaño acotado: al superar max_bytes se borran las entradas usadas hace más
+  tiempo (LRU según mtime, que se actualiza en cada acierto).
+
+MemoryLayerCache tiene la misma interfaz pero vive en memoria (modo watch),
+opcionalmente delante de una LayerCache en disco.
+
+Uso:
+    cache = LayerCache(".render_cache", max_bytes=64 * 1024 * 1024)
+    frag = cache.get(key)
+    if frag is None:
+        frag = ...
+        cache.put(key, frag)
+"""
+
+import os
+import json
+from collections import OrderedDict
+import hashlib
+import tempfile
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_SUFFIX = ".frag"
+
+def content_key(obj):
+    """Hash SHA-256 estable de un objeto JSON-serializable (orden de claves normalizado)."""
+    payload = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=True, default=str)
+    return hashlib.sha256(payload.encode("utf8")).hexdigest()
+
+class LayerCache:
+    """Caché LRU en disco de fragmentos de texto indexados por content_key()."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key):
+        """Retorna el fragmento cacheado o None. Un acierto lo marca como usado recientemente."""
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf8") as fh:
+                fragment = fh.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # otro proceso pudo desalojarlo entre la lectura y el utime
+        self.hits += 1
+        return fragment
+
+    def put(self, key, fragment):
+        """Guarda el fragmento (escritura atómica) y aplica el límite de tamaño."""
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf8") as fh:
+                fh.write(fragment)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Borra las entradas menos recientes hasta quedar por debajo de max_bytes."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Vacía la caché."""
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+class MemoryLayerCache:
+    """
+    Caché LRU en memoria con la interfaz de LayerCache (get/put). Si se da backing
+    (una LayerCache), los fallos se buscan allí y lo nuevo se guarda en ambas.
+    """
+
+    def __init__(self, max_entries=256, backing=None):
+        self.max_entries = int(max_entries)
+        self.backing = backing
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        fragment = self.entries.get(key)
+        if fragment is None and self.backing is not None:
+            fragment = self.backing.get(key)
+            if fragment is not None:
+                self._store(key, fragment)
+        if fragment is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return fragment
+
+    def put(self, key, fragment):
+        self._store(key, fragment)
+        if self.backing is not None:
+            self.backing.put(key, fragment)
+
+    def _store(self, key, fragment):
+        self.entries[key] = fragment
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
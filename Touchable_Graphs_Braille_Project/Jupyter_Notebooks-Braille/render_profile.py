@@ -0,0 +1,181 @@
+"""
+render_profile.py
+
+Instrumentación opcional del render: por capa y por etapa registra tiempo,
+elementos emitidos, puntos emitidos y bytes escritos.
+
+Etapas que se registran:
+ - evaluate:  evaluación de las funciones (expression_engine)
+ - transform: paso de coordenadas de datos a mm de placa (data_to_svg_coords)
+ - build:     construcción de la capa (incluye evaluate/transform; con el escritor
+              en streaming incluye también la serialización)
+ - serialize: paso del árbol svgwrite a texto
+ - cache:     consulta a la caché de capas
+ - save:      escritura del documento (capa "document")
+
+Solo mide cuando hay un perfil activo (RenderProfile.activate()); si no, stage()
+y count() no hacen nada. Los hooks reciben el resumen (dict) de cada figura al
+terminar, así un driver de lotes puede agregar cientos de figuras
+(ver aggregate_profiles).
+
+Uso:
+    profile = RenderProfile("fig1", hooks=[print])
+    build_svg_from_params(params, profile=profile)
+    profile.to_json("fig1_profile.json")
+"""
+
+import json
+import time
+import contextlib
+import contextvars
+
+_ACTIVE = contextvars.ContextVar("render_profile", default=None)
+
+# Capa a la que se imputa lo que ocurre fuera de cualquier capa
+DOCUMENT_LAYER = "document"
+
+def _empty_layer():
+    return {"time_s": 0.0, "stages": {}, "elements": 0, "points": 0, "bytes": 0, "cached": False}
+
+class RenderProfile:
+    """Acumula tiempos y contadores de una figura, por capa y etapa."""
+
+    def __init__(self, name=None, hooks=()):
+        self.name = name
+        self.hooks = list(hooks)
+        self.layers = {}
+        self.total_s = 0.0
+        self._layer = DOCUMENT_LAYER
+        self._started = None
+
+    def _current(self):
+        return self.layers.setdefault(self._layer, _empty_layer())
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Activa el perfil para el código que corre dentro del bloque."""
+        token = _ACTIVE.set(self)
+        self._started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.total_s += time.perf_counter() - self._started
+            _ACTIVE.reset(token)
+
+    @contextlib.contextmanager
+    def layer(self, layer_id):
+        """Imputa a layer_id todo lo medido dentro del bloque."""
+        previous, self._layer = self._layer, layer_id
+        entry = self._current()
+        t0 = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["time_s"] += time.perf_counter() - t0
+            self._layer = previous
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage = self._current()["stages"].setdefault(name, {"time_s": 0.0, "calls": 0})
+            stage["time_s"] += time.perf_counter() - t0
+            stage["calls"] += 1
+
+    def count(self, elements=0, points=0, nbytes=0):
+        entry = self._current()
+        entry["elements"] += elements
+        entry["points"] += points
+        entry["bytes"] += nbytes
+
+    def count_text(self, text):
+        """Cuenta elementos (etiquetas de apertura) y bytes UTF-8 de un texto SVG ya serializado."""
+        self.count(elements=text.count("<") - text.count("</"), nbytes=len(text.encode("utf-8")))
+
+    def mark_cached(self):
+        self._current()["cached"] = True
+
+    def to_dict(self):
+        return {
+            "figure": self.name,
+            "total_s": round(self.total_s, 6),
+            "layers": {
+                layer_id: dict(entry, time_s=round(entry["time_s"], 6),
+                               stages={k: {"time_s": round(v["time_s"], 6), "calls": v["calls"]}
+                                       for k, v in entry["stages"].items()})
+                for layer_id, entry in self.layers.items()
+            },
+        }
+
+    def to_json(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    def finish(self):
+        """Entrega el resumen a los hooks y lo retorna."""
+        summary = self.to_dict()
+        for hook in self.hooks:
+            hook(summary)
+        return summary
+
+class ProfiledSink:
+    """Envoltorio de un sink de texto que cuenta lo que se escribe en la capa activa."""
+
+    def __init__(self, fh, profile):
+        self.fh = fh
+        self.profile = profile
+
+    def write(self, text):
+        self.profile.count_text(text)
+        self.fh.write(text)
+
+# -----------------------
+# API para el código instrumentado (no hace nada sin perfil activo)
+# -----------------------
+
+def active_profile():
+    return _ACTIVE.get()
+
+def stage(name):
+    profile = _ACTIVE.get()
+    return profile.stage(name) if profile is not None else contextlib.nullcontext()
+
+def layer(layer_id):
+    profile = _ACTIVE.get()
+    return profile.layer(layer_id) if profile is not None else contextlib.nullcontext()
+
+def count_text(text):
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.count_text(text)
+
+def mark_cached():
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.mark_cached()
+
+def count(elements=0, points=0, nbytes=0):
+    profile = _ACTIVE.get()
+    if profile is not None:
+        profile.count(elements, points, nbytes)
+
+def aggregate_profiles(summaries):
+    """Suma por capa y etapa los resúmenes de varias figuras (para informes de lote)."""
+    totals = {"figures": 0, "total_s": 0.0, "layers": {}}
+    for summary in summaries:
+        totals["figures"] += 1
+        totals["total_s"] += summary["total_s"]
+        for layer_id, entry in summary["layers"].items():
+            agg = totals["layers"].setdefault(layer_id, _empty_layer())
+            agg.pop("cached", None)
+            agg["time_s"] += entry["time_s"]
+            for key in ("elements", "points", "bytes"):
+                agg[key] += entry[key]
+            agg["cache_hits"] = agg.get("cache_hits", 0) + int(entry.get("cached", False))
+            for name, st in entry["stages"].items():
+                s = agg["stages"].setdefault(name, {"time_s": 0.0, "calls": 0})
+                s["time_s"] += st["time_s"]
+                s["calls"] += st["calls"]
+    return totals
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+render_service.py
+
+Servicio local de render: un proceso de larga vida con un pool de workers ya
+calientes (Python, NumPy, svgwrite y los generadores importados) que recibe
+params JSON por HTTP y devuelve los bytes del SVG, DXF o STL.
+
+- Escucha en localhost (TCP) o en un socket Unix (--socket).
+- Concurrencia acotada por el número de workers; las peticiones que no caben
+  esperan en cola hasta --max-pending, y a partir de ahí se responde 503.
+- Los renders se hacen en memoria (render_svg/render_dxf/render_stl), sin archivos
+  temporales.
+- Caché de resultados compartida en memoria (LRU por bytes) indexada por el
+  contenido de los params; peticiones idénticas simultáneas comparten un único
+  render. Con --cache-dir los workers comparten además la caché de capas en disco.
+
+API:
+    POST /render/svg | /render/dxf | /render/stl   cuerpo: params JSON
+        200 con los bytes; 400 si los params no son válidos; 503 si la cola está llena
+        Cabeceras: X-Render-Cache (hit/miss), X-Render-Time (s)
+    GET  /health                                   estado del pool y de la caché (JSON)
+
+Uso:
+    python render_service.py --port 8765 --workers 4 --cache-dir .render_cache
+    python render_service.py --socket /tmp/braille-render.sock
+
+    # desde el notebook o herramientas del laboratorio
+    from render_service import request_render
+    svg_bytes = request_render(params, "svg")
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import http.client
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from render_cache import content_key
+from expression_engine import ExpressionError
+from generate_svg_from_params import (LAYER_RENDER_VERSION, ParamsError, validate_params,
+                                      render_svg, make_cache)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Tope de workers aunque la máquina tenga más núcleos (como el modo batch)
+MAX_WORKERS = 8
+DEFAULT_MAX_PENDING = 64
+DEFAULT_RESULT_CACHE_MB = 128
+# Cuerpo máximo aceptado (params JSON)
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+CONTENT_TYPES = {
+    "svg": "image/svg+xml",
+    "dxf": "application/dxf",
+    "stl": "model/stl",
+}
+
+# -----------------------
+# WORKERS
+# -----------------------
+
+def warm_worker():
+    """Inicializador del pool: importa los generadores (y sus dependencias) una sola vez."""
+    import generate_dxf_from_params  # noqa: F401
+    import generate_stl_from_params  # noqa: F401
+
+def worker_pid(delay_s=0.0):
+    """Tarea mínima para comprobar que un worker está vivo (y ocuparlo delay_s)."""
+    time.sleep(delay_s)
+    return os.getpid()
+
+def render_bytes(fmt, params, cache_dir=None, cache_max_mb=None):
+    """
+    Renderiza params en memoria y retorna los bytes del documento.
+    Corre en un worker; las rutas de salida de params se ignoran.
+    """
+    from generate_dxf_from_params import render_dxf
+    from generate_stl_from_params import render_stl
+
+    validate_params(params)
+    if fmt == "svg":
+        return render_svg(params, cache=make_cache(cache_dir, cache_max_mb))
+    if fmt == "dxf":
+        return render_dxf(params)
+    return render_stl(params)
+
+def result_key(fmt, params):
+    """Clave de la caché de resultados (las rutas de salida no afectan a los bytes)."""
+    params = {k: v for k, v in params.items() if k not in ("output_svg", "output_dxf", "output_stl")}
+    return content_key({"format": fmt, "version": LAYER_RENDER_VERSION, "params": params})
+
+# -----------------------
+# CACHÉ DE RESULTADOS Y COLA
+# -----------------------
+
+class ResultCache:
+    """LRU en memoria de resultados (bytes) acotada por tamaño total."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+class QueueFull(Exception):
+    """No caben más peticiones en cola (se responde 503)."""
+
+class RenderPool:
+    """
+    Pool de workers calientes con cola acotada, caché de resultados y
+    agrupación de peticiones idénticas en curso.
+    """
+
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, cache_dir=None, cache_max_mb=None,
+                 result_cache_mb=DEFAULT_RESULT_CACHE_MB):
+        n_workers = workers or os.cpu_count() or 1
+        self.workers = max(1, min(n_workers, MAX_WORKERS))
+        self.max_pending = max(1, int(max_pending))
+        self.cache_dir = cache_dir
+        self.cache_max_mb = cache_max_mb
+        self.results = ResultCache(result_cache_mb * 1024 * 1024)
+        self.executor = self._new_executor()
+        self.pending = 0
+        self.rendered = 0
+        self.in_flight = {}
+        self._lock = threading.Lock()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+
+    def _replace_broken(self, executor):
+        """
+        Cambia un pool roto (un worker murió: OOM, señal...) por uno nuevo; sin esto
+        todas las peticiones siguientes fallarían. Llamar con el lock tomado.
+        """
+        if self.executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+
+    def warm_up(self):
+        """Arranca todos los workers ya (el pool puede crearlos bajo demanda) y espera a que importen."""
+        # cada tarea ocupa su worker un momento para que ninguno tome dos
+        futures = [self.executor.submit(worker_pid, 0.2) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def render(self, fmt, params):
+        """Retorna (bytes, cacheado). Lanza QueueFull, ParamsError o el error del worker."""
+        key = result_key(fmt, params)
+        data = self.results.get(key)
+        if data is not None:
+            return data, True
+        with self._lock:
+            future = self.in_flight.get(key)
+            submitted = future is None
+            if submitted:
+                if self.pending >= self.max_pending:
+                    raise QueueFull(f"{self.pending} renders pending")
+                try:
+                    future = self.executor.submit(render_bytes, fmt, params, self.cache_dir, self.cache_max_mb)
+                except BrokenProcessPool:
+                    self._replace_broken(self.executor)
+                    future = self.executor.submit(render_bytes, fmt, params, self.cache_dir, self.cache_max_mb)
+                future.executor = self.executor  # pool que la corre (por si se rompe)
+                self.pending += 1
+                self.in_flight[key] = future
+        if submitted:
+            # fuera del lock: si el render ya terminó, el callback corre en este mismo hilo
+            future.add_done_callback(lambda f, key=key: self._done(key, f))
+        try:
+            return future.result(), False
+        except BrokenProcessPool:
+            with self._lock:
+                self._replace_broken(future.executor)
+            raise
+
+    def _done(self, key, future):
+        if future.exception() is None:
+            self.results.put(key, future.result())
+        with self._lock:
+            self.in_flight.pop(key, None)
+            self.pending -= 1
+            self.rendered += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "rendered": self.rendered,
+                "result_cache": {"entries": len(self.results.entries), "bytes": self.results.size,
+                                 "hits": self.results.hits, "misses": self.results.misses},
+                "layer_cache_dir": self.cache_dir,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+# -----------------------
+# HTTP
+# -----------------------
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "BrailleRender/1.0"
+    # el pool lo fija make_server en una subclase
+    pool = None
+
+    def address_string(self):
+        # en sockets Unix client_address es una cadena vacía
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _reply(self, status, body, content_type="text/plain; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/health":
+            self._reply(200, json.dumps(self.pool.stats()), "application/json")
+        else:
+            self._reply(404, "not found\n")
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "render" or parts[1] not in CONTENT_TYPES:
+            self._reply(404, f"use POST /render/<{'|'.join(CONTENT_TYPES)}>\n")
+            return
+        fmt = parts[1]
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self._reply(413, "params too large\n")
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b"null")
+        except ValueError as exc:
+            self._reply(400, f"invalid JSON: {exc}\n")
+            return
+        if not isinstance(params, dict):
+            self._reply(400, "params must be a JSON object\n")
+            return
+        t0 = time.perf_counter()
+        try:
+            data, cached = self.pool.render(fmt, params)
+        except QueueFull as exc:
+            self._reply(503, f"queue full: {exc}\n", headers={"Retry-After": "1"})
+            return
+        except (ParamsError, ExpressionError) as exc:
+            self._reply(400, f"{exc}\n")
+            return
+        except Exception as exc:  # fallo del render: se informa y el servicio sigue
+            self._reply(500, f"{type(exc).__name__}: {exc}\n")
+            return
+        self._reply(200, data, CONTENT_TYPES[fmt], headers={
+            "X-Render-Cache": "hit" if cached else "miss",
+            "X-Render-Time": f"{time.perf_counter() - t0:.4f}",
+        })
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        UnixStreamServer.server_bind(self)
+        # atributos que BaseHTTPRequestHandler espera de un HTTPServer
+        self.server_name = "localhost"
+        self.server_port = 0
+
+def make_server(pool, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """Servidor HTTP (TCP en host:port o socket Unix en socket_path) atado a pool."""
+    handler = type("BoundRenderHandler", (RenderHandler,), {"pool": pool})
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# -----------------------
+# CLIENTE
+# -----------------------
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection sobre un socket Unix."""
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def request_render(params, fmt="svg", host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=60):
+    """Pide un render al servicio y retorna los bytes. Lanza RuntimeError si no responde 200."""
+    if socket_path is not None:
+        conn = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("POST", f"/render/{fmt}", body=json.dumps(params).encode("utf-8"),
+                     headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        body = response.read()
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"render service {response.status}: {body.decode('utf-8', 'replace').strip()}")
+    return body
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de render SVG/DXF/STL con workers calientes")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="dirección TCP (solo localhost por defecto)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="puerto TCP")
+    parser.add_argument("--socket", default=None, help="escuchar en este socket Unix en lugar de TCP")
+    parser.add_argument("--workers", type=int, default=None, help=f"procesos de render (máximo {MAX_WORKERS})")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="renders en curso o en cola antes de responder 503")
+    parser.add_argument("--cache-dir", default=None, help="caché de capas en disco compartida por los workers")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="tamaño máximo de la caché de capas en MB")
+    parser.add_argument("--result-cache-mb", type=float, default=DEFAULT_RESULT_CACHE_MB,
+                        help="tamaño de la caché de resultados en memoria (MB)")
+    args = parser.parse_args(argv)
+
+    pool = RenderPool(args.workers, args.max_pending, args.cache_dir, args.cache_max_mb, args.result_cache_mb)
+    pids = pool.warm_up()
+    server = make_server(pool, args.host, args.port, args.socket)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Render service on {where} ({len(pids)} warm workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+stl_check.py
+
+Lectura y revisión de STL de placas táctiles (los de STL-Braille_Project, los de
+Onshape o los de generate_stl_from_params.py):
+ - STL binario mapeado en memoria (np.memmap): los triángulos son una vista
+   (N, 3, 3) float32 del archivo, sin copiar ni parsear; cargar un ensamblaje
+   grande cuesta milisegundos. El STL ASCII se parsea como alternativa.
+ - Cierre: soldando vértices (tolerancia WELD_TOL_MM) cada arista debe
+   recorrerse tantas veces en un sentido como en el otro. Solo se llama estanca
+   a la malla cerrada que además no tiene aristas con más de 2 triángulos; con
+   --strict se exige eso (p. ej. a las mallas de heightfield_mesh.py), sin él
+   basta con que esté cerrada (los prismas solapados de
+   generate_stl_from_params.py comparten aristas).
+ - Planta de la placa (cara de apoyo) contra fig_size_mm de params.json.
+ - Histograma de alturas de los relieves: área de las caras horizontales hacia
+   arriba por altura sobre la cara superior de la placa (la de mayor área); con
+   params se comprueba que aparezcan las dot_height_mm de las etiquetas Braille.
+
+La placa se reorienta antes de medir (grosor en z, relieves hacia arriba), así
+que sirven también los STL exportados de pie o boca abajo.
+
+Una cabecera de 80 bytes a cero es normal (Onshape la deja así): el formato
+binario se reconoce porque el tamaño del archivo es 84 + 50 * número de triángulos.
+
+Uso:
+    python stl_check.py placa.stl [--params params.json] [--json informe.json] [--strict]   # código 1 si falla
+"""
+
+import re
+import sys
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+
+from generate_svg_from_params import load_params, plot_frame, braille_label_specs
+from generate_stl_from_params import STL_RECORD
+
+# -----------------------
+# PARÁMETROS POR DEFECTO
+# -----------------------
+
+# Distancia a la que dos vértices se consideran el mismo
+WELD_TOL_MM = 1e-3
+# Diferencia admitida entre la caja del STL y fig_size_mm
+BBOX_TOL_MM = 0.5
+# Resolución del histograma de alturas y tolerancia al buscar una altura esperada
+HEIGHT_STEP_MM = 0.01
+HEIGHT_TOL_MM = 0.02
+# Coseno mínimo entre la normal y +z para contar una cara como horizontal hacia arriba
+UP_COS = 0.999
+
+_ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+# -----------------------
+# LECTURA
+# -----------------------
+
+class StlMesh:
+    """Triángulos (N, 3, 3) de un STL; en binario son una vista del archivo mapeado."""
+
+    def __init__(self, path, triangles, fmt, header=b""):
+        self.path = str(path)
+        self.triangles = triangles
+        self.format = fmt
+        self.header = header
+
+    def __len__(self):
+        return len(self.triangles)
+
+def is_binary_stl(path):
+    """True si el tamaño cuadra con la cabecera binaria (aunque empiece por 'solid')."""
+    size = Path(path).stat().st_size
+    if size < 84:
+        return False
+    with open(path, "rb") as fh:
+        fh.seek(80)
+        count = int(np.frombuffer(fh.read(4), dtype="<u4")[0])
+    return size == 84 + 50 * count
+
+def read_stl(path):
+    """Lee un STL binario (memmap, sin copia) o ASCII; retorna StlMesh."""
+    path = Path(path)
+    if is_binary_stl(path):
+        with open(path, "rb") as fh:
+            header = fh.read(80)
+        count = (path.stat().st_size - 84) // 50
+        if count == 0:
+            return StlMesh(path, np.empty((0, 3, 3), dtype=np.float32), "binary", header)
+        records = np.memmap(path, dtype=STL_RECORD, mode="r", offset=84, shape=(count,))
+        return StlMesh(path, records["vertices"], "binary", header)
+    data = path.read_bytes()
+    if not data.lstrip().startswith(b"solid"):
+        raise ValueError(f"{path}: no es un STL binario ni ASCII")
+    coords = np.array(_ASCII_VERTEX.findall(data), dtype=np.float64)
+    if len(coords) % 3:
+        raise ValueError(f"{path}: STL ASCII con {len(coords)} vértices (no múltiplo de 3)")
+    return StlMesh(path, coords.reshape(-1, 3, 3).astype(np.float32), "ascii", data.split(b"\n", 1)[0])
+
+# -----------------------
+# ANÁLISIS
+# -----------------------
+
+def weld_vertices(points, tol=WELD_TOL_MM):
+    """Índice de vértice soldado para cada punto (M, 3); retorna (índices, número de vértices)."""
+    q = np.round(points / tol).astype(np.int64)
+    q -= q.min(axis=0)
+    span = q.max(axis=0) + 1
+    if np.prod(span.astype(float)) < 2.0 ** 62:
+        # clave entera única por celda: np.unique 1D es mucho más rápido que axis=0
+        keys = (q[:, 0] * span[1] + q[:, 1]) * span[2] + q[:, 2]
+        _, inverse = np.unique(keys, return_inverse=True)
+    else:
+        _, inverse = np.unique(q, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return inverse, int(inverse.max()) + 1 if len(inverse) else 0
+
+def manifold_report(triangles, tol=WELD_TOL_MM):
+    """
+    Cierre y estanqueidad de la malla. Cada arista soldada debe recorrerse tantas
+    veces en un sentido como en el otro (superficie cerrada y orientada, "closed");
+    las que no, son de borde (1 triángulo) o de orientación incoherente. Las
+    aristas con más de 2 triángulos (sólidos que se tocan, como los tramos
+    colineales de una curva) no abren la malla, pero la dejan fuera de la
+    2-variedad: "watertight" solo es cierto si está cerrada y no tiene ninguna.
+    """
+    n = len(triangles)
+    if n == 0:
+        return {"triangles": 0, "vertices": 0, "edges": 0, "degenerate": 0, "boundary_edges": 0,
+                "unbalanced_edges": 0, "nonmanifold_edges": 0, "closed": False, "watertight": False}
+    index, n_vertices = weld_vertices(np.asarray(triangles, dtype=np.float64).reshape(-1, 3), tol)
+    faces = index.reshape(n, 3)
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+    faces = faces[~degenerate]
+    a = faces.reshape(-1)
+    b = faces[:, [1, 2, 0]].reshape(-1)
+    _, edge, total = np.unique(np.minimum(a, b) * n_vertices + np.maximum(a, b),
+                               return_inverse=True, return_counts=True)
+    forward = np.bincount(edge.reshape(-1), weights=(a < b), minlength=len(total))
+    report = {
+        "triangles": n,
+        "vertices": n_vertices,
+        "edges": len(total),
+        "degenerate": int(degenerate.sum()),
+        "boundary_edges": int(np.sum(total == 1)),
+        "unbalanced_edges": int(np.sum(2 * forward != total)),
+        "nonmanifold_edges": int(np.sum(total > 2)),
+    }
+    report["closed"] = report["unbalanced_edges"] == 0
+    report["watertight"] = report["closed"] and report["nonmanifold_edges"] == 0
+    return report
+
+def face_areas(tris):
+    """(normales unitarias (N, 3), áreas (N,)) calculadas de los vértices (no de la normal guardada)."""
+    cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    length = np.linalg.norm(cross, axis=1)
+    normals = np.divide(cross, length[:, None], out=np.zeros_like(cross), where=length[:, None] > 0)
+    return normals, length / 2.0
+
+def to_plate_frame(triangles):
+    """
+    Copia float64 de los triángulos con el grosor de la placa en z y los relieves
+    hacia +z. Los STL de Onshape salen a menudo con la placa de pie (grosor en y)
+    o boca abajo; se elige como eje vertical el de menor extensión y como cara de
+    apoyo la plana de mayor área en un extremo. Solo rotaciones (las normales
+    calculadas de los vértices siguen apuntando hacia fuera).
+    """
+    tris = np.asarray(triangles, dtype=np.float64)
+    if len(tris) == 0:
+        return tris.reshape(0, 3, 3)
+    points = tris.reshape(-1, 3)
+    up = int(np.argmin(points.max(axis=0) - points.min(axis=0)))
+    if up != 2:
+        # permutación cíclica: conserva la orientación de la malla
+        tris = tris[..., [(up + 1) % 3, (up + 2) % 3, up]]
+    normals, area = face_areas(tris)
+    z = tris[..., 2].mean(axis=1)
+    lo, hi = tris[..., 2].min(), tris[..., 2].max()
+    tol = HEIGHT_STEP_MM
+    area_lo = area[(normals[:, 2] < -UP_COS) & (z - lo <= tol)].sum()
+    area_hi = area[(normals[:, 2] > UP_COS) & (hi - z <= tol)].sum()
+    if area_hi > area_lo:
+        # placa boca abajo: giro de 180° alrededor de x
+        tris = tris * np.array([1.0, -1.0, -1.0])
+    return tris
+
+def bbox_report(tris, params=None, tol=BBOX_TOL_MM):
+    """
+    Caja envolvente (en el marco de la placa, ver to_plate_frame) y planta de la
+    cara de apoyo; con params, si esa planta coincide con fig_size_mm. Se compara
+    la cara de apoyo y no la caja: los relieves en el borde sobresalen medio stroke.
+    """
+    points = tris.reshape(-1, 3)
+    lo = points.min(axis=0)
+    hi = points.max(axis=0)
+    report = {"size_mm": [round(float(v), 4) for v in hi - lo]}
+    normals, area = face_areas(tris)
+    bottom = tris[(normals[:, 2] < -UP_COS) & (tris[..., 2].mean(axis=1) - lo[2] <= HEIGHT_STEP_MM)]
+    if len(bottom) == 0:
+        bottom = tris
+    footprint = bottom[..., :2].reshape(-1, 2)
+    plate = footprint.max(axis=0) - footprint.min(axis=0)
+    report["plate_size_mm"] = [round(float(v), 4) for v in plate]
+    if params is not None:
+        fig_w_mm, fig_h_mm, _, _, _ = plot_frame(params)
+        report["fig_size_mm"] = [fig_w_mm, fig_h_mm]
+        report["size_ok"] = bool(abs(plate[0] - fig_w_mm) <= tol and abs(plate[1] - fig_h_mm) <= tol)
+        # placa girada 90° en el plano (el tamaño cuadra, solo cambia la orientación)
+        report["rotated"] = bool(not report["size_ok"] and abs(plate[0] - fig_h_mm) <= tol
+                                 and abs(plate[1] - fig_w_mm) <= tol)
+        report["size_ok"] = report["size_ok"] or report["rotated"]
+    return report
+
+def height_histogram(tris, step=HEIGHT_STEP_MM):
+    """
+    Área (mm²) de caras hacia arriba por altura sobre la cara superior de la placa
+    (la cota con más área hacia arriba), con tris en el marco de la placa.
+    Retorna (cota de la placa, {altura: área}) con alturas > 0 redondeadas a step.
+    """
+    if len(tris) == 0:
+        return 0.0, {}
+    normals, area = face_areas(tris)
+    up = normals[:, 2] > UP_COS
+    if not up.any():
+        return 0.0, {}
+    z = np.round((tris[up, :, 2].mean(axis=1) - tris[..., 2].min()) / step).astype(np.int64)
+    levels, inverse = np.unique(z, return_inverse=True)
+    level_area = np.bincount(inverse, weights=area[up])
+    base = levels[np.argmax(level_area)]
+    raised = levels > base
+    histogram = {round(float((lvl - base) * step), 4): round(float(a), 4)
+                 for lvl, a in zip(levels[raised], level_area[raised])}
+    return round(float(base * step), 4), histogram
+
+def expected_dot_heights(params):
+    """Alturas de punto Braille distintas que pide params."""
+    return sorted({round(float(spec["dot_height_mm"]), 4) for spec in braille_label_specs(params)})
+
+def check_stl(path, params=None, require_manifold=False):
+    """
+    Informe completo de un STL; report["ok"] resume cierre, caja y alturas de punto.
+    Con require_manifold la malla además debe ser estanca (sin aristas de más de
+    2 triángulos), como las de heightfield_mesh, que son un único sólido.
+    """
+    mesh = read_stl(path)
+    report = {"path": str(path), "format": mesh.format, "header_blank": not mesh.header.strip(b"\0 ")}
+    report["require_manifold"] = bool(require_manifold)
+    report["manifold"] = manifold_report(mesh.triangles)
+    tris = to_plate_frame(mesh.triangles)
+    report["bbox"] = bbox_report(tris, params)
+    base, histogram = height_histogram(tris)
+    report["plate_top_mm"] = base
+    report["heights_mm"] = histogram
+    ok = report["manifold"]["watertight" if require_manifold else "closed"]
+    if params is not None:
+        found = np.array(list(histogram), dtype=float)
+        missing = [h for h in expected_dot_heights(params)
+                   if not np.any(np.abs(found - h) <= HEIGHT_TOL_MM)]
+        report["dot_heights_mm"] = expected_dot_heights(params)
+        report["missing_dot_heights_mm"] = missing
+        ok = ok and report["bbox"]["size_ok"] and not missing
+    report["ok"] = bool(ok)
+    return report
+
+def print_report(report):
+    m, b = report["manifold"], report["bbox"]
+    status = "[OK]  " if report["ok"] else "[FAIL]"
+    print(f"{status} {report['path']} ({report['format']}, {m['triangles']} triangles)")
+    strict = " (--strict, must be 0)" if report["require_manifold"] else ""
+    print(f"       closed {m['closed']}, watertight {m['watertight']}: boundary {m['boundary_edges']}, "
+          f"unbalanced {m['unbalanced_edges']}, non-manifold {m['nonmanifold_edges']}{strict}, "
+          f"degenerate {m['degenerate']}")
+    line = (f"       size {b['size_mm'][0]} x {b['size_mm'][1]} x {b['size_mm'][2]} mm, "
+            f"plate {b['plate_size_mm'][0]} x {b['plate_size_mm'][1]} mm")
+    if "fig_size_mm" in b:
+        line += f" (fig_size_mm {b['fig_size_mm'][0]} x {b['fig_size_mm'][1]}: "
+        line += "ok)" if b["size_ok"] else ("rotated 90°)" if b["rotated"] else "MISMATCH)")
+    print(line)
+    print(f"       plate top {report['plate_top_mm']} mm above the base; raised heights (mm: area mm²):")
+    for height, area in report["heights_mm"].items():
+        print(f"         {height:>7}: {area}")
+    if "dot_heights_mm" in report:
+        missing = report["missing_dot_heights_mm"]
+        print(f"       Braille dot heights {report['dot_heights_mm']}: "
+              + (f"missing {missing}" if missing else "found"))
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Revisa STL de placas táctiles (estanqueidad, tamaño, alturas)")
+    parser.add_argument("stl", nargs="+", help="archivos STL (binario o ASCII)")
+    parser.add_argument("--params", default=None, help="params.json para comparar tamaño y alturas de punto")
+    parser.add_argument("--json", default=None, help="guardar los informes en este JSON")
+    parser.add_argument("--strict", action="store_true",
+                        help="exigir malla estanca: ninguna arista con más de 2 triángulos (heightfield_mesh)")
+    args = parser.parse_args(argv)
+
+    params = load_params(args.params) if args.params else None
+    reports = [check_stl(path, params, require_manifold=args.strict) for path in args.stl]
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(reports, fh, indent=2)
+    return 0 if all(r["ok"] for r in reports) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+svg_stream.py
+
+Escritor SVG en streaming, alternativo al árbol de objetos de svgwrite.
+
+StreamingDrawing ofrece las mismas fábricas que usan los builders de capa
+(g, line, rect, circle, polygon, path, use, más defs) pero cada elemento se
+serializa a texto en cuanto se añade a su padre: no se guarda ningún árbol ni
+se valida atributo por atributo (los params se validan una vez antes de empezar).
+
+La capa que se abre con open_layer() escribe directamente en el sink (archivo o
+buffer), así que la memoria no crece con el número de elementos de la capa.
+
+La salida es byte a byte la misma que produce svgwrite (perfil tiny): atributos
+ordenados, floats redondeados a 4 decimales, escapado de ElementTree y
+elementos vacíos como <tag />.
+"""
+
+SVG_NAMESPACES = (
+    ("xmlns", "http://www.w3.org/2000/svg"),
+    ("xmlns:ev", "http://www.w3.org/2001/xml-events"),
+    ("xmlns:inkscape", "http://www.inkscape.org/namespaces/inkscape"),
+    ("xmlns:sodipodi", "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd"),
+    ("xmlns:xlink", "http://www.w3.org/1999/xlink"),
+)
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8" ?>\n'
+
+def escape_attr(text):
+    """Escapado de valores de atributo (el mismo que aplica ElementTree)."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+def value_to_string(value):
+    """Como svgwrite en perfil tiny: los float se redondean a 4 decimales."""
+    if isinstance(value, float):
+        value = round(value, 4)
+    return str(value)
+
+def points_to_string(points):
+    """Lista de (x, y) -> 'x1,y1 x2,y2 ...' (formato de svgwrite)."""
+    return " ".join(f"{value_to_string(x)},{value_to_string(y)}" for x, y in points)
+
+def attr_name(key):
+    """stroke_width -> stroke-width, class_ -> class (reglas de svgwrite)."""
+    return key.rstrip("_").replace("_", "-")
+
+def start_tag(tag, attrs, empty=False):
+    """Etiqueta de apertura con los atributos ordenados; se omiten los None y los vacíos."""
+    parts = [tag]
+    for key, value in sorted(attrs.items()):
+        if value is None:
+            continue
+        value = value_to_string(value)
+        if value:
+            parts.append(f'{key}="{escape_attr(value)}"')
+    return "<" + " ".join(parts) + (" />" if empty else ">")
+
+class StreamElement:
+    """
+    Elemento SVG ligero. Los hijos se guardan ya serializados (texto) o, si el
+    elemento tiene sink, se escriben en él directamente.
+    """
+
+    def __init__(self, tag, attrs, sink=None):
+        self.tag = tag
+        self.attrs = attrs
+        self.elements = []
+        self.sink = sink
+        self._opened = False
+
+    def add(self, element):
+        text = element.tostring() if isinstance(element, StreamElement) else str(element)
+        if self.sink is None:
+            self.elements.append(text)
+            return element
+        if not self._opened:
+            self.sink.write(start_tag(self.tag, self.attrs))
+            self._opened = True
+        self.sink.write(text)
+        return element
+
+    def close(self):
+        """Cierra un elemento en streaming (escribe </tag> o <tag /> si quedó vacío)."""
+        if self._opened:
+            self.sink.write(f"</{self.tag}>")
+        else:
+            self.sink.write(start_tag(self.tag, self.attrs, empty=True))
+        self.sink = None
+
+    def tostring(self):
+        if not self.elements:
+            return start_tag(self.tag, self.attrs, empty=True)
+        return start_tag(self.tag, self.attrs) + "".join(self.elements) + f"</{self.tag}>"
+
+class StreamingDrawing:
+    """Documento SVG con tamaño físico en mm que se escribe en un sink (objeto con write)."""
+
+    def __init__(self, width, height, viewbox=None):
+        self.width = width
+        self.height = height
+        self.viewbox = viewbox
+        # sink de la próxima capa de primer nivel (lo consume make_layer)
+        self.layer_sink = None
+
+    def _element(self, tag, attrs, extra):
+        attrs = dict(attrs)
+        attrs.update((attr_name(k), v) for k, v in extra.items())
+        return StreamElement(tag, attrs)
+
+    # --- fábricas con la misma firma que svgwrite.Drawing ---
+
+    def g(self, **extra):
+        return self._element("g", {}, extra)
+
+    def defs(self, **extra):
+        return self._element("defs", {}, extra)
+
+    def line(self, start=(0, 0), end=(0, 0), **extra):
+        return self._element("line", {"x1": start[0], "y1": start[1], "x2": end[0], "y2": end[1]}, extra)
+
+    def rect(self, insert=(0, 0), size=(1, 1), **extra):
+        return self._element("rect", {"x": insert[0], "y": insert[1],
+                                      "width": size[0], "height": size[1]}, extra)
+
+    def circle(self, center=(0, 0), r=1, **extra):
+        return self._element("circle", {"cx": center[0], "cy": center[1], "r": r}, extra)
+
+    def polygon(self, points=(), **extra):
+        return self._element("polygon", {"points": points_to_string(points)}, extra)
+
+    def path(self, d=None, **extra):
+        return self._element("path", {"d": d}, extra)
+
+    def use(self, href, insert=None, **extra):
+        attrs = {"xlink:href": href}
+        if insert is not None:
+            attrs.update({"x": insert[0], "y": insert[1]})
+        return self._element("use", attrs, extra)
+
+    # --- documento ---
+
+    def header(self):
+        """<svg ...><defs /> tal como lo abre svgwrite con la extensión Inkscape."""
+        attrs = {"baseProfile": "tiny", "height": self.height, "version": "1.2", "width": self.width,
+                 "viewBox": self.viewbox}
+        attrs.update(SVG_NAMESPACES)
+        return start_tag("svg", attrs) + "<defs />"
+
+    def footer(self):
+        return "</svg>"
+
+    def open_layer(self, sink, layer_id, label, **style):
+        """Capa de Inkscape cuyos hijos se escriben en sink a medida que se añaden."""
+        attrs = {"id": layer_id, "inkscape:groupmode": "layer", "inkscape:label": label}
+        attrs.update((attr_name(k), v) for k, v in style.items())
+        return StreamElement("g", attrs, sink=sink)
+
+class TeeSink:
+    """Sink que escribe en fh y además guarda una copia (para la caché de capas)."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.parts = []
+
+    def write(self, text):
+        self.fh.write(text)
+        self.parts.append(text)
+
+    def getvalue(self):
+        return "".join(self.parts)
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+tactile_check.py
+
+Validación táctil previa a la impresión: comprueba sobre la geometría generada
+(la misma en mm que usan SVG / DXF / STL) las distancias de Instructions.md:
+ - marcadores de una misma curva a 5–6 mm (marker_spacing: distancia entre centros)
+ - marcadores de curvas distintas sin tocarse (marker_marker: hueco entre bordes)
+ - etiquetas Braille separadas de marcadores, curvas, marcas y ejes, y entre sí
+ - marcadores que pisan una marca de los ejes (marker_tick, desactivada por defecto)
+
+Cada elemento es un segmento con semiancho: curvas, ejes y marcas con medio
+stroke; cada columna de una celda Braille es el segmento entre su primer y su
+último punto con el radio del punto (la envolvente exacta de esos puntos); los
+marcadores son segmentos de longitud 0 con radio size/2 (para cualquier forma). Los candidatos a choque se buscan con una rejilla
+hash vectorizada (los segmentos largos se trocean al tamaño de celda) que solo
+empareja tramos de grupos distintos y de tipos con alguna regla, por bloques de
+PAIR_CHUNK pares: el coste y la memoria crecen linealmente con el número de elementos
+aunque las curvas se muestreen muy fino.
+
+Umbrales (hueco mínimo en mm, None desactiva la regla) sobreescribibles con
+params["tactile_min_gap_mm"], p. ej. {"braille_curve": 3.0, "marker_tick": 0.0}.
+
+Uso:
+    python tactile_check.py params.json [--json informe.json]     # código 1 si hay violaciones
+    python generate_svg_from_params.py --batch libro/ --check       # como puerta previa del lote
+"""
+
+import sys
+import json
+import argparse
+import numpy as np
+
+from generate_svg_from_params import (
+    ParamsError, load_params, validate_params, axes_segments, tick_segments, curve_polylines,
+    marker_positions, braille_label_specs, braille_cell_layout, dot_row_offset, DOT_ROW, DOT_COL,
+)
+
+# Tipos de elemento
+BRAILLE, MARKER, CURVE, TICK, AXIS = range(5)
+KIND_NAMES = ("braille", "marker", "curve", "tick", "axis")
+
+# Hueco mínimo por regla (mm). marker_spacing es distancia entre centros; el resto,
+# distancia entre bordes (negativa = solape)
+TACTILE_MIN_GAP_MM = {
+    "marker_spacing": 5.0,
+    "marker_marker": 1.0,
+    "braille_braille": 3.0,
+    "braille_marker": 2.0,
+    "braille_curve": 2.0,
+    "braille_tick": 1.5,
+    "braille_axis": 1.5,
+    # desactivada por defecto: las curvas cruzan los ejes y sus marcadores caen sobre las marcas
+    "marker_tick": None,
+}
+
+# Regla -> (tipo a, tipo b, mismo dueño). Mismo dueño: None = cualquiera,
+# True = solo del mismo (misma curva), False = solo de distinto (otra curva / etiqueta)
+RULES = {
+    "marker_spacing": (MARKER, MARKER, True),
+    "marker_marker": (MARKER, MARKER, False),
+    "braille_braille": (BRAILLE, BRAILLE, False),
+    "braille_marker": (BRAILLE, MARKER, None),
+    "braille_curve": (BRAILLE, CURVE, None),
+    "braille_tick": (BRAILLE, TICK, None),
+    "braille_axis": (BRAILLE, AXIS, None),
+    "marker_tick": (MARKER, TICK, None),
+}
+
+# Pares candidatos por bloque (acota la memoria en placas muy densas)
+PAIR_CHUNK = 1 << 20
+
+class TactileCheckError(ValueError):
+    """La figura no pasa la validación táctil (para usarla como puerta en lotes)."""
+
+def min_gaps(params):
+    """Umbrales efectivos: los de TACTILE_MIN_GAP_MM con los de params encima."""
+    overrides = params.get("tactile_min_gap_mm", {})
+    if not isinstance(overrides, dict):
+        raise ParamsError("tactile_min_gap_mm debe ser un objeto {regla: mm}")
+    unknown = sorted(set(overrides) - set(RULES))
+    if unknown:
+        raise ParamsError(f"tactile_min_gap_mm: reglas desconocidas {unknown} (opciones: {', '.join(RULES)})")
+    gaps = dict(TACTILE_MIN_GAP_MM, **overrides)
+    for rule, gap in gaps.items():
+        if gap is not None and (isinstance(gap, bool) or not isinstance(gap, (int, float))):
+            raise ParamsError(f"tactile_min_gap_mm.{rule} debe ser un número o null, no {gap!r}")
+    return gaps
+
+# -----------------------
+# ELEMENTOS
+# -----------------------
+
+class Features:
+    """Arrays paralelos de elementos: extremos, semiancho, tipo y dueño."""
+
+    def __init__(self):
+        self._parts = []
+
+    def add(self, kind, x1, y1, x2, y2, radius, owner):
+        x1, y1, x2, y2, radius, owner = np.broadcast_arrays(
+            *(np.asarray(a, dtype=float) for a in (x1, y1, x2, y2, radius)), np.asarray(owner))
+        if x1.size:
+            self._parts.append((x1.ravel(), y1.ravel(), x2.ravel(), y2.ravel(), radius.ravel(),
+                                np.full(x1.size, kind), owner.ravel().astype(int)))
+
+    def arrays(self):
+        if not self._parts:
+            empty = np.empty(0)
+            return empty, empty, empty, empty, empty, empty.astype(int), empty.astype(int)
+        return tuple(np.concatenate(col) for col in zip(*self._parts))
+
+def braille_column_segments(spec):
+    """
+    Por columna no vacía de cada celda de la etiqueta: (x, y_arriba, y_abajo) en mm
+    de placa, entre los centros de su primer y su último punto.
+    """
+    s = spec["dot_spacing_mm"]
+    xs, y0s, y1s = [], [], []
+    for mask, x, y in braille_cell_layout(spec["text"], spec["char_spacing_mm"], spec["line_spacing_mm"]):
+        for col in (0, 1):
+            dys = [dot_row_offset(DOT_ROW[d], s) for d in range(1, 7)
+                   if DOT_COL[d] == col and mask & (1 << (d - 1))]
+            if dys:
+                xs.append(spec["ox"] + x + (col - 0.5) * s)
+                y0s.append(spec["oy"] + y + min(dys))
+                y1s.append(spec["oy"] + y + max(dys))
+    return np.array(xs), np.array(y0s), np.array(y1s)
+
+def collect_features(params):
+    """Elementos táctiles de la figura en mm de placa (misma geometría que los backends)."""
+    features = Features()
+    axis_half = params.get("axis_stroke_mm", 0.6) / 2.0
+    curve_half = params.get("curve_stroke_mm", 0.9) / 2.0
+
+    for i, spec in enumerate(braille_label_specs(params)):
+        xs, y0s, y1s = braille_column_segments(spec)
+        features.add(BRAILLE, xs, y0s, xs, y1s, spec["dot_diameter_mm"] / 2.0, i)
+    for i, (sx, sy, _, size_mm) in enumerate(marker_positions(params)):
+        features.add(MARKER, sx, sy, sx, sy, size_mm / 2.0, i)
+    for i, pieces in enumerate(curve_polylines(params)):
+        for sx, sy in pieces:
+            features.add(CURVE, sx[:-1], sy[:-1], sx[1:], sy[1:], curve_half, i)
+    features.add(TICK, *tick_segments(params), axis_half, 0)
+    features.add(AXIS, *axes_segments(params), axis_half, 0)
+    return features.arrays()
+
+def split_segments(x1, y1, x2, y2, max_len):
+    """Trocea cada segmento en tramos de longitud <= max_len; retorna tramos e índice del original."""
+    n = np.maximum(1, np.ceil(np.hypot(x2 - x1, y2 - y1) / max_len)).astype(int)
+    parent = np.repeat(np.arange(len(x1)), n)
+    # fracción [t0, t1] de cada tramo dentro de su segmento
+    k = np.arange(parent.size) - np.repeat(np.cumsum(n) - n, n)
+    t0 = k / n[parent]
+    t1 = (k + 1) / n[parent]
+    dx = (x2 - x1)[parent]
+    dy = (y2 - y1)[parent]
+    return (x1[parent] + t0 * dx, y1[parent] + t0 * dy,
+            x1[parent] + t1 * dx, y1[parent] + t1 * dy, parent)
+
+# -----------------------
+# REJILLA HASH Y DISTANCIAS
+# -----------------------
+
+def candidate_pairs(x1, y1, x2, y2, reach, cell_mm, kind, group, kind_pairs):
+    """
+    Pares (i, j) de tramos cuyas cajas (ampliadas en reach) comparten alguna celda de
+    cell_mm, solo entre tipos de kind_pairs ((tipo a, tipo b) con a <= b) y de grupos
+    distintos: i es del tipo a (y del grupo menor si a == b), en bloques (k, 2) de
+    unos PAIR_CHUNK pares. Cada caja debe medir como mucho una celda, así que cubre
+    <= 2x2 celdas.
+    Las entradas se ordenan por (celda, tipo, grupo) y cada tramo del tipo a busca
+    con searchsorted el rango de sus compañeros en la misma celda: los tramos de un
+    mismo grupo (los cientos de una curva muestreada fina) y los tipos sin regla
+    (curva con curva) nunca se emparejan, así que el número de pares crece con el de
+    elementos, no con el cuadrado de la densidad de cada celda. Un par que comparte
+    varias celdas sale repetido (no afecta al resultado).
+    """
+    ix0 = np.floor((np.minimum(x1, x2) - reach) / cell_mm).astype(np.int64)
+    iy0 = np.floor((np.minimum(y1, y2) - reach) / cell_mm).astype(np.int64)
+    ix1 = np.floor((np.maximum(x1, x2) + reach) / cell_mm).astype(np.int64)
+    iy1 = np.floor((np.maximum(y1, y2) + reach) / cell_mm).astype(np.int64)
+    cells, entries = [], []
+    idx = np.arange(len(x1))
+    for ox in (0, 1):
+        for oy in (0, 1):
+            cx = ix0 + ox
+            cy = iy0 + oy
+            ok = (cx <= ix1) & (cy <= iy1)
+            cells.append((cx[ok] << 32) ^ (cy[ok] & 0xFFFFFFFF))
+            entries.append(idx[ok])
+    entries = np.concatenate(entries)
+    if entries.size == 0:
+        return
+    _, cell = np.unique(np.concatenate(cells), return_inverse=True)
+
+    # clave única (celda, tipo, grupo) ordenada
+    n_kinds = len(KIND_NAMES)
+    n_groups = int(group.max()) + 1
+    entry_kind = kind[entries]
+    key = (cell.astype(np.int64) * n_kinds + entry_kind) * n_groups + group[entries]
+    order = np.argsort(key, kind="stable")
+    key, entries, cell, entry_kind = key[order], entries[order], cell[order], entry_kind[order]
+
+    for kind_a, kind_b in kind_pairs:
+        left = np.flatnonzero(entry_kind == kind_a)
+        base = cell[left].astype(np.int64) * n_kinds + kind_b
+        if kind_a == kind_b:
+            # mismo tipo: solo grupos mayores que el propio
+            lo = np.searchsorted(key, base * n_groups + group[entries[left]] + 1)
+        else:
+            lo = np.searchsorted(key, base * n_groups)
+        hi = np.searchsorted(key, (base + 1) * n_groups)
+        count = hi - lo
+        end = np.cumsum(count)
+        total = int(end[-1]) if len(end) else 0
+        first, done = 0, 0
+        while done < total:
+            # tramos [first, last) con unos PAIR_CHUNK compañeros en total
+            last = max(int(np.searchsorted(end, done + PAIR_CHUNK, side="right")), first + 1)
+            n = count[first:last]
+            start = np.cumsum(n) - n
+            right = np.arange(n.sum()) - np.repeat(start, n) + np.repeat(lo[first:last], n)
+            yield np.column_stack((np.repeat(entries[left[first:last]], n), entries[right]))
+            first, done = last, int(end[last - 1])
+
+def point_segment_distance(px, py, x1, y1, x2, y2):
+    dx = x2 - x1
+    dy = y2 - y1
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length2 > 0, ((px - x1) * dx + (py - y1) * dy) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+def segment_distance(ax1, ay1, ax2, ay2, bx1, by1, bx2, by2):
+    """Distancia mínima entre segmentos (vectorizada); 0 si se cruzan."""
+    d = np.minimum.reduce([
+        point_segment_distance(ax1, ay1, bx1, by1, bx2, by2),
+        point_segment_distance(ax2, ay2, bx1, by1, bx2, by2),
+        point_segment_distance(bx1, by1, ax1, ay1, ax2, ay2),
+        point_segment_distance(bx2, by2, ax1, ay1, ax2, ay2),
+    ])
+
+    def orient(px, py, qx, qy, rx, ry):
+        return (qx - px) * (ry - py) - (qy - py) * (rx - px)
+
+    o1 = orient(ax1, ay1, ax2, ay2, bx1, by1)
+    o2 = orient(ax1, ay1, ax2, ay2, bx2, by2)
+    o3 = orient(bx1, by1, bx2, by2, ax1, ay1)
+    o4 = orient(bx1, by1, bx2, by2, ax2, ay2)
+    crossing = (o1 * o2 < 0) & (o3 * o4 < 0)
+    return np.where(crossing, 0.0, d)
+
+# -----------------------
+# VALIDACIÓN
+# -----------------------
+
+def _worst_per_group_pair(ra, rb, gap, group, n_groups):
+    """De los pares de tramos (ra, rb), el de menor hueco por par de grupos (empates: menor tramo)."""
+    pair_key = group[ra].astype(np.int64) * n_groups + group[rb]
+    order = np.lexsort((rb, ra, gap, pair_key))
+    first = order[np.concatenate([[True], pair_key[order][1:] != pair_key[order][:-1]])]
+    return ra[first], rb[first], gap[first]
+
+def check_params(params, features=None):
+    """
+    Lista de violaciones (dicts ordenados por gravedad): regla, elementos, hueco
+    medido y mínimo en mm, y posición (x, y) en mm de placa del punto más crítico.
+    Una entrada por par de elementos; cada etiqueta Braille y cada curva cuentan
+    como un solo elemento (p. ej. "etiqueta 2 demasiado cerca de la curva 0").
+    """
+    validate_params(params)
+    gaps = min_gaps(params)
+    rules = {name: rule for name, rule in RULES.items() if gaps[name] is not None}
+    x1, y1, x2, y2, radius, kind, owner = collect_features(params) if features is None else features
+    if not rules or x1.size == 0:
+        return []
+    # se informa por etiqueta Braille y por curva completas; el resto, elemento a elemento
+    whole = (kind == BRAILLE) | (kind == CURVE)
+    group_key = np.where(whole, -1 - (kind * (owner.max() + 1) + owner), np.arange(x1.size))
+    _, group = np.unique(group_key, return_inverse=True)
+    n_groups = int(group.max()) + 1
+
+    # solo hacen falta los tipos que aparecen en alguna regla activa
+    used = np.isin(kind, [k for a, b, _ in rules.values() for k in (a, b)])
+    ids = np.flatnonzero(used)
+    max_gap = max(gaps[name] for name in rules)
+    reach_extra = max(max_gap, 0.0) / 2.0
+    max_reach = float(radius[ids].max()) + reach_extra
+    # tramo + alcance a cada lado <= celda: cada caja cubre como mucho 2x2 celdas
+    cell_mm = max(4.0 * max_reach, 4.0)
+    sx1, sy1, sx2, sy2, parent = split_segments(x1[ids], y1[ids], x2[ids], y2[ids], cell_mm - 2.0 * max_reach)
+    parent = ids[parent]
+    # solo pares de grupos distintos y con alguna regla entre sus tipos; ya salen en
+    # orden canónico para casar con las reglas (a = tipo menor, o grupo menor si es el mismo)
+    kind_pairs = sorted({(min(kind_a, kind_b), max(kind_a, kind_b)) for kind_a, kind_b, _ in rules.values()})
+    worst = {name: [] for name in rules}
+    for pairs in candidate_pairs(sx1, sy1, sx2, sy2, radius[parent] + reach_extra, cell_mm,
+                                 kind[parent], group[parent], kind_pairs):
+        a, b = pairs[:, 0], pairs[:, 1]
+        pa, pb = parent[a], parent[b]
+        kind_pa, kind_pb = kind[pa], kind[pb]
+        same = owner[pa] == owner[pb]
+        for name, (kind_a, kind_b, same_owner) in rules.items():
+            sel = (kind_pa == kind_a) & (kind_pb == kind_b)
+            if same_owner is True:
+                sel &= same
+            elif same_owner is False:
+                sel &= ~same
+            if not sel.any():
+                continue
+            ra, rb = a[sel], b[sel]
+            dist = segment_distance(sx1[ra], sy1[ra], sx2[ra], sy2[ra], sx1[rb], sy1[rb], sx2[rb], sy2[rb])
+            if name == "marker_spacing":
+                gap = dist
+            else:
+                gap = dist - radius[parent[ra]] - radius[parent[rb]]
+            bad = gap < gaps[name] - 1e-9
+            if bad.any():
+                worst[name].append(_worst_per_group_pair(ra[bad], rb[bad], gap[bad], group[parent], n_groups))
+
+    violations = []
+    for name, parts in worst.items():
+        if not parts:
+            continue
+        # un resultado por par de grupos (el peor de sus tramos en todos los bloques)
+        ra, rb, gap = _worst_per_group_pair(*(np.concatenate(col) for col in zip(*parts)),
+                                            group[parent], n_groups)
+        for i, j, g in zip(ra.tolist(), rb.tolist(), gap.tolist()):
+            fa, fb = parent[i], parent[j]
+            at_x = (sx1[i] + sx2[i] + sx1[j] + sx2[j]) / 4.0
+            at_y = (sy1[i] + sy2[i] + sy1[j] + sy2[j]) / 4.0
+            violations.append({
+                "rule": name,
+                "a": {"kind": KIND_NAMES[kind[fa]], "owner": int(owner[fa])},
+                "b": {"kind": KIND_NAMES[kind[fb]], "owner": int(owner[fb])},
+                "gap_mm": round(g, 3),
+                "min_gap_mm": gaps[name],
+                "overlap": g < 0,
+                "at_mm": [round(float(at_x), 2), round(float(at_y), 2)],
+            })
+    violations.sort(key=lambda v: (v["gap_mm"] - v["min_gap_mm"], v["rule"]))
+    return violations
+
+def summarize(violations):
+    """{regla: {"count", "overlaps", "worst_gap_mm", "at_mm"}} para informes cortos."""
+    summary = {}
+    for v in violations:
+        entry = summary.setdefault(v["rule"], {"count": 0, "overlaps": 0, "worst_gap_mm": v["gap_mm"],
+                                               "min_gap_mm": v["min_gap_mm"], "at_mm": v["at_mm"]})
+        entry["count"] += 1
+        entry["overlaps"] += int(v["overlap"])
+        if v["gap_mm"] < entry["worst_gap_mm"]:
+            entry["worst_gap_mm"] = v["gap_mm"]
+            entry["at_mm"] = v["at_mm"]
+    return summary
+
+def require_tactile_ok(params):
+    """Lanza TactileCheckError con el resumen si la figura tiene violaciones."""
+    violations = check_params(params)
+    if violations:
+        parts = [f"{rule} x{s['count']} (peor {s['worst_gap_mm']} < {s['min_gap_mm']} mm en {s['at_mm']})"
+                 for rule, s in summarize(violations).items()]
+        raise TactileCheckError("; ".join(parts))
+
+def print_report(path, violations):
+    if not violations:
+        print(f"[OK]   {path}: no tactile violations")
+        return
+    print(f"[FAIL] {path}: {len(violations)} tactile violation(s)")
+    for rule, s in summarize(violations).items():
+        print(f"       {rule:<16} {s['count']:>5} (overlaps {s['overlaps']}), worst gap "
+              f"{s['worst_gap_mm']} mm < {s['min_gap_mm']} mm at {s['at_mm']}")
+
+# -----------------------
+# ENTRY POINT
+# -----------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida distancias táctiles de params.json antes de imprimir")
+    parser.add_argument("params", nargs="+", help="params.json a validar")
+    parser.add_argument("--json", default=None, help="guardar todas las violaciones en este JSON")
+    args = parser.parse_args(argv)
+
+    report = {}
+    failures = 0
+    for path in args.params:
+        violations = check_params(load_params(path))
+        report[path] = violations
+        print_report(path, violations)
+        failures += bool(violations)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+watch_params.py
+
+Modo watch de generate_svg_from_params.py: vigila uno o varios params.json y,
+cada vez que uno cambia, reescribe su SVG recalculando solo las capas afectadas.
+
+- Las capas afectadas salen de comparar los params anteriores con los nuevos
+  contra las claves de cada capa en LAYERS (las mismas de la caché de capas).
+- Las capas no afectadas salen de una MemoryLayerCache compartida por todos los
+  archivos vigilados (con --cache-dir, respaldada por la caché en disco).
+- Los params se validan antes de escribir: un params.json a medio editar o con
+  errores solo se informa, el SVG anterior queda intacto. Con check=True (--check)
+  lo mismo ocurre si la figura no pasa tactile_check.
+- build_svg_from_params escribe el SVG en un temporal y lo reemplaza de una vez,
+  así el visor nunca lee un archivo a medias.
+
+Se detecta el cambio por sondeo de mtime/tamaño (sin dependencias extra).
+
+Uso:
+    python generate_svg_from_params.py params.json --watch
+    python generate_svg_from_params.py fig1.json fig2.json --watch --stream --cache-dir .render_cache
+"""
+
+import os
+import io
+import time
+import contextlib
+from pathlib import Path
+
+from render_cache import MemoryLayerCache
+from generate_svg_from_params import (LAYERS, load_params, validate_params, build_svg_from_params,
+                                      export_dxf, check_tactile)
+
+# Intervalo de sondeo en segundos
+POLL_INTERVAL_S = 0.25
+
+def changed_keys(old, new):
+    """Claves de primer nivel cuyo valor difiere entre dos params."""
+    return {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
+
+def affected_layers(old, new):
+    """Ids de las capas que hay que recalcular al pasar de old a new (todas si old es None)."""
+    if old is None:
+        return [layer_id for layer_id, _, _ in LAYERS]
+    keys = changed_keys(old, new)
+    return [layer_id for layer_id, _, layer_keys in LAYERS if keys.intersection(layer_keys)]
+
+def file_signature(path):
+    """(mtime_ns, tamaño) del archivo, o None si no existe."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+class ParamsWatcher:
+    """
+    Vigila params.json y reconstruye sus SVG de forma incremental.
+    overrides: claves fijadas por la línea de comandos (como en el modo batch).
+    check: no escribir las figuras que no pasan tactile_check (puerta de --check).
+    """
+
+    def __init__(self, paths, overrides=None, cache=None, with_dxf=False, check=False, log=print):
+        self.paths = [str(p) for p in paths]
+        self.overrides = dict(overrides or {})
+        self.cache = MemoryLayerCache(backing=cache)
+        self.with_dxf = with_dxf
+        self.check = check
+        self.log = log
+        # último estado renderizado con éxito por archivo
+        self.signatures = {p: None for p in self.paths}
+        self.rendered = {p: None for p in self.paths}
+
+    def poll(self):
+        """Reconstruye los archivos que cambiaron desde la última llamada; retorna sus rutas."""
+        rebuilt = []
+        for path in self.paths:
+            signature = file_signature(path)
+            if signature is None or signature == self.signatures[path]:
+                continue
+            self.signatures[path] = signature
+            if self.rebuild(path):
+                rebuilt.append(path)
+        return rebuilt
+
+    def rebuild(self, path):
+        """Renderiza path si sus params cambiaron. Retorna True si se escribió el SVG."""
+        t0 = time.perf_counter()
+        try:
+            params = load_params(path)
+            params.update(self.overrides)
+            validate_params(params)
+            if self.check:
+                check_tactile(params)
+        except (OSError, ValueError) as exc:  # JSON inválido, ParamsError o TactileCheckError
+            self.log(f"[WATCH] {path}: {type(exc).__name__}: {exc}")
+            return False
+        previous = self.rendered[path]
+        if previous == params:
+            return False
+        layers = affected_layers(previous, params)
+        output_svg = params.get("output_svg", "output.svg")
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_svg_from_params(params, cache=self.cache)
+                if self.with_dxf:
+                    export_dxf(params)
+        except Exception as exc:  # el watch sigue vivo; el SVG anterior queda intacto
+            self.log(f"[WATCH] {path}: {type(exc).__name__}: {exc}")
+            return False
+        self.rendered[path] = params
+        elapsed = time.perf_counter() - t0
+        self.log(f"[WATCH] {path} -> {output_svg}: {', '.join(layers) or 'no layers'} "
+                 f"rebuilt in {elapsed:.2f}s")
+        return True
+
+    def run(self, interval=POLL_INTERVAL_S):
+        """Bucle de vigilancia hasta Ctrl+C."""
+        missing = [p for p in self.paths if not Path(p).exists()]
+        for path in missing:
+            self.log(f"[WATCH] {path}: not found (waiting for it)")
+        self.log(f"[WATCH] watching {len(self.paths)} file(s), Ctrl+C to stop")
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.log("[WATCH] stopped")